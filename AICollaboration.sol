@@ -16,10 +16,28 @@ contract AICollaboration {
     // Mapping per Round to allow automation without conflict
     mapping(uint256 => mapping(address => Contribution)) public contributions;
 
+    // Merkle commit mode: instead of one submitUpdate per participant, the coordinator
+    // anchors one root of all the round's update hashes (3 storage slots per round)
+    struct RoundCommit {
+        bytes32 root;
+        uint128 reward;         // Wei paid per leaf, funded by commitRoot
+        uint64 leafCount;
+        uint64 claimed;         // Leaves paid (leafCount once the rest is swept)
+        uint64 claimDeadline;   // Claims close at this timestamp, then sweepUnclaimed
+    }
+    // Time participants have to claim a committed round before its funds can be swept
+    uint256 public constant CLAIM_WINDOW = 30 days;
+    mapping(uint256 => RoundCommit) public roundCommits;
+    // Claimed leaves, bit-packed: bit (index % 256) of word (index / 256)
+    mapping(uint256 => mapping(uint256 => uint256)) private claimedBitmap;
+
     event HashSubmitted(uint256 indexed round, address indexed participant, bytes32 modelHash);
     event RewardPaid(uint256 indexed round, address indexed participant, uint256 amount);
+    event PaymentSkipped(uint256 indexed round, address indexed participant);
     event TrainingStarted(uint256 round);
     event TrainingFinished(uint256 round);
+    event RootCommitted(uint256 indexed round, bytes32 root, uint256 leafCount, uint256 reward);
+    event UnclaimedSwept(uint256 indexed round, uint256 leaves, uint256 amount);
 
     constructor() { coordinator = msg.sender; }
 
@@ -51,12 +69,111 @@ contract AICollaboration {
     }
 
     function validateAndPay(address payable _participant) public payable onlyCoordinator {
-        require(contributions[currentRound][_participant].modelHash != bytes32(0), "Aucune contribution trouvee");
-        require(!contributions[currentRound][_participant].isPaid, "Deja paye");
-        contributions[currentRound][_participant].isValidated = true;
-        contributions[currentRound][_participant].isPaid = true;
-        (bool success, ) = _participant.call{value: msg.value}("");
+        _validateAndPay(_participant, msg.value);
+    }
+
+    // Batched version: one transaction pays N participants, msg.value is split equally.
+    // Entries already paid or without contribution (stale view of the caller), and
+    // recipients whose transfer fails (e.g. a contract rejecting ETH), are skipped, not
+    // reverted, and their share is refunded: one entry does not block the batch.
+    function validateAndPayMany(address payable[] calldata _participants) public payable onlyCoordinator {
+        require(_participants.length > 0, "Liste vide");
+        require(msg.value % _participants.length == 0, "Montant non divisible");
+        uint256 reward = msg.value / _participants.length;
+        uint256 refund = 0;
+        for (uint256 i = 0; i < _participants.length; i++) {
+            address payable participant = _participants[i];
+            Contribution storage c = contributions[currentRound][participant];
+            if (c.modelHash == bytes32(0) || c.isPaid) {
+                refund += reward;
+                emit PaymentSkipped(currentRound, participant);
+                continue;
+            }
+            c.isValidated = true;
+            c.isPaid = true;
+            (bool success, ) = participant.call{value: reward}("");
+            if (!success) {
+                c.isValidated = false;
+                c.isPaid = false;
+                refund += reward;
+                emit PaymentSkipped(currentRound, participant);
+                continue;
+            }
+            emit RewardPaid(currentRound, participant, reward);
+        }
+        if (refund > 0) {
+            (bool success, ) = payable(msg.sender).call{value: refund}("");
+            require(success, "Echec remboursement");
+        }
+    }
+
+    function _validateAndPay(address payable _participant, uint256 _amount) internal {
+        Contribution storage c = contributions[currentRound][_participant];
+        require(c.modelHash != bytes32(0), "Aucune contribution trouvee");
+        require(!c.isPaid, "Deja paye");
+        c.isValidated = true;
+        c.isPaid = true;
+        (bool success, ) = _participant.call{value: _amount}("");
+        require(success, "Echec transfert");
+        emit RewardPaid(currentRound, _participant, _amount);
+    }
+
+    // --- Merkle commit mode ---
+    // Leaf: keccak256(abi.encodePacked(round, index, participant, modelHash)).
+    // Parent: keccak256 of the two children, smaller first (a lone last node moves up unchanged).
+
+    function commitRoot(uint256 _round, bytes32 _root, uint64 _leafCount) public payable onlyCoordinator {
+        require(_round > 0 && _round <= currentRound, "Round invalide");
+        require(roundCommits[_round].root == bytes32(0), "Racine deja publiee");
+        require(_root != bytes32(0) && _leafCount > 0, "Racine invalide");
+        require(msg.value % _leafCount == 0, "Montant non divisible");
+        uint256 reward = msg.value / _leafCount;
+        roundCommits[_round] = RoundCommit({root: _root, reward: uint128(reward), leafCount: _leafCount, claimed: 0,
+                                            claimDeadline: uint64(block.timestamp + CLAIM_WINDOW)});
+        emit RootCommitted(_round, _root, _leafCount, reward);
+    }
+
+    function isClaimed(uint256 _round, uint256 _index) public view returns (bool) {
+        return (claimedBitmap[_round][_index >> 8] >> (_index & 0xff)) & 1 == 1;
+    }
+
+    // Anyone may submit the claim (e.g. a relayer): the reward always goes to _participant
+    function claimReward(uint256 _round, uint256 _index, address payable _participant, bytes32 _modelHash,
+                         bytes32[] calldata _proof) public {
+        RoundCommit memory rc = roundCommits[_round];
+        require(rc.root != bytes32(0), "Aucune racine pour ce round");
+        require(_index < rc.leafCount, "Index invalide");
+        require(block.timestamp <= rc.claimDeadline, "Delai de reclamation expire");
+        uint256 word = claimedBitmap[_round][_index >> 8];
+        uint256 bit = 1 << (_index & 0xff);
+        require(word & bit == 0, "Deja paye");
+
+        bytes32 node = keccak256(abi.encodePacked(_round, _index, _participant, _modelHash));
+        for (uint256 i = 0; i < _proof.length; i++) {
+            bytes32 sibling = _proof[i];
+            node = node < sibling ? keccak256(abi.encodePacked(node, sibling)) : keccak256(abi.encodePacked(sibling, node));
+        }
+        require(node == rc.root, "Preuve invalide");
+
+        claimedBitmap[_round][_index >> 8] = word | bit;
+        roundCommits[_round].claimed = rc.claimed + 1;
+        (bool success, ) = _participant.call{value: rc.reward}("");
+        require(success, "Echec transfert");
+        emit RewardPaid(_round, _participant, rc.reward);
+    }
+
+    // After the claim window, the rewards nobody claimed go back to the coordinator
+    // (otherwise they stay locked in the contract); later claims are refused.
+    function sweepUnclaimed(uint256 _round) public onlyCoordinator {
+        RoundCommit storage rc = roundCommits[_round];
+        require(rc.root != bytes32(0), "Aucune racine pour ce round");
+        require(block.timestamp > rc.claimDeadline, "Delai de reclamation en cours");
+        require(rc.claimed < rc.leafCount, "Rien a recuperer");
+        uint256 leaves = rc.leafCount - rc.claimed;
+        uint256 amount = leaves * rc.reward;
+        rc.claimed = rc.leafCount;
+        (bool success, ) = payable(msg.sender).call{value: amount}("");
         require(success, "Echec transfert");
-        emit RewardPaid(currentRound, _participant, msg.value);
+        emit UnclaimedSwept(_round, leaves, amount);
     }
-}
\ No newline at end of file
+}
@@ -1,16 +1,19 @@
-import hashlib
 import time
-import joblib
 import requests
 import os
 from web3 import Web3
-import pandas as pd
-from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import StandardScaler
 import os
 from dotenv import load_dotenv
+from weights_format import FILE_EXTENSION, DeltaEncoder, encode_model, update_hash
+from model_distribution import ModelCache
+from contract_reads import ContractReader
+from feature_stats import ScalerClient, chunked_stats
+from dataset_cache import load_dataset
+from local_training import make_trainer, train_local
+from merkle_commit import MERKLE_ABI, fetch_and_claim, sign_commit
 
 
 load_dotenv()
@@ -20,6 +23,17 @@ MY_PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 RPC_URL = os.getenv("RPC_URL")
 CONTRACT_ADDR = os.getenv("CONTRACT_ADDRESS")
 SERVER_URL = os.getenv("SERVER_URL")
+# "full" (default), or a compressed delta against the global model: "float16" / "int8"
+UPDATE_ENCODING = os.getenv("UPDATE_ENCODING", "full")
+UPDATE_TOP_K = float(os.getenv("UPDATE_TOP_K", "0")) or None  # Fraction of weights sent (top-k)
+# Local training: NumPy mini-batch SGD ("sgd", default) or the sklearn lbfgs fit ("lbfgs")
+LOCAL_TRAINER = os.getenv("LOCAL_TRAINER", "sgd")
+LOCAL_EPOCHS = int(os.getenv("LOCAL_EPOCHS", "5"))
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_BATCH_SIZE", "32"))
+LOCAL_LR = float(os.getenv("LOCAL_LR", "0.1"))
+FEDPROX_MU = float(os.getenv("FEDPROX_MU", "0"))  # > 0: FedProx proximal term towards the global model
+# Must match the server: "tx" (submitUpdate per round) or "merkle" (signed upload, reward claimed later)
+COMMIT_MODE = os.getenv("COMMIT_MODE", "tx")
 # Web3 Initialization
 # Web3 Initialization
 web3 = Web3(Web3.HTTPProvider(RPC_URL))
@@ -30,34 +44,65 @@ ABI = [
     {"inputs": [],"name": "trainingActive","outputs": [{"internalType": "bool","name": "","type": "bool"}],"stateMutability": "view","type": "function"},
     {"inputs": [],"name": "currentRound","outputs": [{"internalType": "uint256","name": "","type": "uint256"}],"stateMutability": "view","type": "function"},
     {"inputs": [{"type": "uint256"}, {"type": "address"}], "name": "contributions", "outputs": [{"type": "bytes32", "name": "modelHash"}, {"type": "bool", "name": "isValidated"}, {"type": "bool", "name": "isPaid"}], "stateMutability": "view", "type": "function"}
-]
+] + MERKLE_ABI
 
 contract = web3.eth.contract(address=CONTRACT_ADDR, abi=ABI)
+# Contract view calls: batched, cached for a second
+reader = ContractReader(contract)
+
+# Local copy of the global model, refreshed with conditional/delta downloads
+model_cache = ModelCache(SERVER_URL)
+
+# Global scaler published by the server (federated feature statistics)
+scaler_client = ScalerClient(SERVER_URL)
+
+# Keeps the compression error between rounds (error feedback)
+delta_encoder = DeltaEncoder(UPDATE_ENCODING, UPDATE_TOP_K) if UPDATE_ENCODING != "full" else None
+
+def load_local_data():
+    """Local dataset SPECIFIC to the client, memory-mapped from the dataset cache (parsed once)."""
+    return load_dataset("datasets/client_A.csv", rows=600)
+
+def share_feature_stats():
+    """Sends the local feature statistics (count, sum, sum of squares) for the global scaler."""
+    try:
+        data = load_local_data()
+        scaler_client.submit(MY_WALLET, chunked_stats(data.chunks(), data.columns))
+        print("📐 Statistiques locales envoyées pour le scaler global.")
+    except Exception as e:
+        print(f"ℹ️ Statistiques locales non envoyées ({e}) : scaler local.")
+
+def get_scaler(X):
+    """Global scaler of the session, or a local StandardScaler when none is published."""
+    try:
+        scaler = scaler_client.fetch()
+        if scaler is not None:
+            return scaler
+    except Exception:
+        pass
+    return StandardScaler().fit(X)
 
 def download_global_model():
-    """Downloads the latest version of the aggregated model."""
-    url = f"{SERVER_URL}/static/global_model.joblib"
+    """Latest aggregated model, from the local cache when it did not change (304) or via a delta."""
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            with open("base_model.joblib", "wb") as f:
-                f.write(response.content)
-            print("📥 Modèle global téléchargé.")
-            return joblib.load("base_model.joblib")
-    except:
-        print("ℹ️ Initialisation : nouveau modèle créé.")
+        model = model_cache.fetch()
+        if model is not None:
+            print(f"📥 Modèle global du Round {model.fl_round_} prêt.")
+            return model
+    except Exception:
+        pass
+    print("ℹ️ Initialisation : nouveau modèle créé.")
     return None
 
 def train_and_automate(round_number):
     print(f"\n┏━━ 🚀 ROUND {round_number} ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓")
     
-    # 1. Security Check
-    if not contract.functions.trainingActive().call():
+    # 1. Security Check + 2. Check if already contributed on-chain (one batched request)
+    active, contrib = reader.read_many([("trainingActive", ()), ("contributions", (round_number, MY_WALLET))])
+    if not active:
         print("┃ ❌ Erreur : L'entraînement n'est pas actif sur la blockchain.")
         return False
-        
-    # 2. Check if already contributed on-chain
-    contrib = contract.functions.contributions(round_number, MY_WALLET).call()
+
     # contrib = (modelHash, isValidated, isPaid)
     if int.from_bytes(contrib[0], 'big') != 0:
         print(f"┃ ✅ Déjà contribué pour le Round {round_number} (Hash sur chaine). Skip.")
@@ -66,13 +111,12 @@ def train_and_automate(round_number):
     # 3. PREPARATION AND LOCAL TRAINING
     try:
         # Loading the local dataset SPECIFIC to the client
-        df = pd.read_csv("datasets/client_A.csv")
-        df = df.head(600)
-        X = df.drop(['Churn', 'customerID'], axis=1)
-        y = df['Churn']
+        data = load_local_data()
+        X, y = data.X, data.y
 
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # Same feature space as the other participants (global scaler), when published
+        scaler = get_scaler(X)
+        X_scaled = (X - scaler.mean_) / scaler.scale_
 
         
         # Split locally to have an internal validation set
@@ -81,60 +125,52 @@ def train_and_automate(round_number):
         # Download the Global Model
         global_model = download_global_model()
         
-        print("┃ 🤖 Entraînement local (LogisticRegression)...")
-        # We use warm_start=True to potentially reuse weights (simulated)
-        # Note: For a real FedAvg with sklearn, we initialize coefficients if possible
-        local_model = LogisticRegression(max_iter=1000, warm_start=True)
-        
+        print(f"┃ 🤖 Entraînement local ({LOCAL_TRAINER})...")
+        local_model = make_trainer(LOCAL_TRAINER, epochs=LOCAL_EPOCHS, batch_size=LOCAL_BATCH_SIZE, lr=LOCAL_LR,
+                                   mu=FEDPROX_MU)
+
         # MERGE / INITIALIZATION : Global -> Local (FedAvg step 1: Broadcast)
+        global_weights = None
         if global_model:
             print(f"┃    ↳ 📥 Initialisation avec les poids du modèle global")
-            try:
-                # We must 'trick' sklearn to accept manual initialization
-                # 1. Set attributes
-                local_model.coef_ = global_model.coef_
-                local_model.intercept_ = global_model.intercept_
-                local_model.classes_ = global_model.classes_
-            except Exception as e:
-                print(f"⚠️ Erreur init poids : {e}")
-        
-        # Local training (will refine weights if warm_start works well with the default solver)
-        local_model.fit(X_train, y_train)
-        
+            global_weights = (global_model.coef_, global_model.intercept_, global_model.classes_)
+
+        # Local epochs starting from the global weights
+        train_local(local_model, X_train, y_train, global_weights)
+
         acc = accuracy_score(y_test, local_model.predict(X_test))
-        filename = f'model_weights_{MY_WALLET}.joblib'
-        joblib.dump(local_model, filename)
+        # Compact pickle-free update (weights + small header), see weights_format.py
+        base_round = getattr(global_model, "fl_round_", None)
+        if delta_encoder is not None and base_round is not None:
+            # Only what changed since the global model, compressed
+            payload = delta_encoder.encode_model(local_model, global_model, base_round, n_samples=len(X_train))
+        else:
+            # base_round tells the server how stale the update is (asynchronous rounds)
+            payload = encode_model(local_model, n_samples=len(X_train),
+                                   extra={"base_round": base_round} if base_round is not None else None)
+        filename = f'model_weights_{MY_WALLET}{FILE_EXTENSION}'
+        with open(filename, "wb") as f:
+            f.write(payload)
         print(f"┃    ↳ 📊 Précision : {acc * 100:.2f}%")
-        print(f"┃    ↳ 💾 Modèle sauvegardé : {filename}")
+        print(f"┃    ↳ 💾 Modèle sauvegardé : {filename} ({len(payload)} octets)")
 
-        # 3. CALCULATE HASH
-        sha256_hash = hashlib.sha256()
-        with open(filename, "rb") as f:
-            sha256_hash.update(f.read())
-        hash_result = "0x" + sha256_hash.hexdigest()
+        # 3. CALCULATE HASH (over the canonical bytes, no re-read)
+        hash_result = update_hash(payload)
         # print(f"┃    ↳ #️⃣ Hash : {hash_result[:10]}...")
 
         # 4. BLOCKCHAIN
-        print("┃ 🔗 Envoi du hash sur Sepolia...")
-        nonce = web3.eth.get_transaction_count(MY_WALLET, 'pending')
-        tx = contract.functions.submitUpdate(hash_result).build_transaction({
-            'from': MY_WALLET, 'nonce': nonce, 'gas': 200000, 'gasPrice': web3.eth.gas_price
-        })
-        signed_tx = web3.eth.account.sign_transaction(tx, MY_PRIVATE_KEY)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        
-        print(f"┃    ↳ ✔️ Tx envoyée : {web3.to_hex(tx_hash)[:20]}...")
-        print("┃    ↳ ⏩ Envoi immédiat (Confirmation asynchrone par le Bot)...")
-        
-        # web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300) 
-        # print("┃    ↳ ✅ Preuve ancrée sur la Blockchain.")
+        data = {"participant_address": MY_WALLET, "accuracy": acc, "n_samples": len(X_train)}
+        if COMMIT_MODE == "merkle":
+            # No transaction: the signed hash goes with the upload, the server anchors one root per round
+            data["signature"] = sign_commit(MY_PRIVATE_KEY, round_number, hash_result)
+            print("┃ ✍️ Hash signé (engagement Merkle, pas de transaction)")
+        else:
+            submit_hash(hash_result)
 
         # 5. SEND TO SERVER
         print("┃ 📤 Transfert du fichier au coordinateur...")
-        with open(filename, "rb") as f:
-            files = {"file": f}
-            data = {"participant_address": MY_WALLET, "accuracy": acc}
-            requests.post(f"{SERVER_URL}/upload", files=files, data=data)
+        files = {"file": (filename, payload, "application/octet-stream")}
+        requests.post(f"{SERVER_URL}/upload", files=files, data=data).raise_for_status()
         
         print(f"┗━━ 🏁 Round {round_number} Terminé ! ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛")
         return True
@@ -144,9 +180,46 @@ def train_and_automate(round_number):
         print("┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛")
         return False
 
+def submit_hash(hash_result):
+    """tx mode: anchors the update hash with submitUpdate (confirmed by the bot)."""
+    print("┃ 🔗 Envoi du hash sur Sepolia...")
+    nonce = web3.eth.get_transaction_count(MY_WALLET, 'pending')
+    tx = contract.functions.submitUpdate(hash_result).build_transaction({
+        'from': MY_WALLET, 'nonce': nonce, 'gas': 200000, 'gasPrice': web3.eth.gas_price
+    })
+    signed_tx = web3.eth.account.sign_transaction(tx, MY_PRIVATE_KEY)
+    tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    
+    print(f"┃    ↳ ✔️ Tx envoyée : {web3.to_hex(tx_hash)[:20]}...")
+    print("┃    ↳ ⏩ Envoi immédiat (Confirmation asynchrone par le Bot)...")
+    
+    # web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300) 
+    # print("┃    ↳ ✅ Preuve ancrée sur la Blockchain.")
+
+def claim_pending_rewards(rounds):
+    """Merkle mode: claims the rewards of the rounds whose root is on chain. Returns the rounds still pending."""
+    still_pending = []
+    for round_number in rounds:
+        try:
+            status = fetch_and_claim(web3, contract, SERVER_URL, round_number, MY_WALLET, MY_PRIVATE_KEY)
+        except Exception as e:
+            print(f"⚠️ Réclamation du Round {round_number} impossible : {e}")
+            status = "pending"
+        if status == "pending":
+            still_pending.append(round_number)
+        elif status == "claimed":
+            print(f"💰 Récompense du Round {round_number} réclamée (preuve Merkle)")
+        elif status == "invalid":
+            print(f"🚨 Preuve du Round {round_number} incohérente avec la racine on-chain : non réclamée")
+        elif status == "expired":
+            print(f"⌛ Délai de réclamation du Round {round_number} expiré : récompense perdue")
+    return still_pending
+
 def monitor_mode():
     print("🛰️ Mode automatique activé. En attente des rounds...")
+    share_feature_stats()
     last_processed_round = -1
+    unclaimed_rounds = []  # Merkle mode: rounds uploaded, reward not claimed yet
     while True:
         try:
             # Ask the server if there is an active round
@@ -154,6 +227,10 @@ def monitor_mode():
             if res["training_active"] and res["current_round"] > last_processed_round:
                 if train_and_automate(res["current_round"]):
                     last_processed_round = res["current_round"]
+                    if COMMIT_MODE == "merkle":
+                        unclaimed_rounds.append(last_processed_round)
+            if unclaimed_rounds:
+                unclaimed_rounds = claim_pending_rewards(unclaimed_rounds)
         except Exception as e:
             print("⚠️ Serveur injoignable, nouvelle tentative...")
         time.sleep(2)
@@ -0,0 +1,198 @@
+"""
+Aggregation rules, selectable per session (POST /control/start_auto?aggregator=...).
+
+Every rule reduces a stacked (n_participants, n_weights) float64 matrix, one
+flattened [coef, intercept] row per participant, to one row:
+
+    fedavg        weighted mean (the only rule that can use running sums)
+    trimmed_mean  coordinate-wise mean after dropping the trim_ratio lowest/highest values
+    median        coordinate-wise median
+    krum          the update closest to its n - f - 2 nearest neighbours (f = byzantine)
+    multi_krum    weighted mean of the `select` best-scored updates (default n - f)
+
+The weights (sample counts, times the staleness discount in async mode) are
+used by fedavg and by the final mean of krum / multi_krum. trimmed_mean and
+median are unweighted on purpose: every participant counts once, so a client
+cannot pull the robust statistic towards its update by claiming a large
+n_samples. Their weights are validated, then ignored.
+
+Order statistics are computed on column blocks with np.partition (O(n) per
+coordinate, temporaries of O(n * COLUMN_BLOCK)). Krum needs all pairwise
+distances (O(n^2 * d)): they are computed row block by row block with one
+BLAS product per block, and each block is reduced to Krum scores right away,
+so memory stays O(n * d + block_size * n) instead of O(n^2 * d).
+"""
+import numpy as np
+
+COLUMN_BLOCK = 1 << 12    # Coordinates reduced together by the order-statistic rules
+DEFAULT_BLOCK_SIZE = 256  # Rows per pairwise-distance block (Krum)
+
+
+def _check_updates(updates, weights):
+    updates = np.asarray(updates, dtype=np.float64)
+    if updates.ndim != 2 or updates.shape[0] == 0:
+        raise ValueError("Expected a non-empty (n_participants, n_weights) matrix")
+    n = updates.shape[0]
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    if weights.shape != (n,) or np.any(weights <= 0):
+        raise ValueError("Update weights must be a positive vector, one per update")
+    return updates, weights
+
+
+class Aggregator:
+    """Base class: aggregate(updates, weights) -> (n_weights,) vector."""
+
+    name = None
+    streaming = False  # True if the rule only needs weighted running sums (no stacked matrix)
+
+    def __init__(self):
+        self.last_selected = None  # Rows used by the last aggregate() (None: all of them)
+
+    def min_participants(self):
+        return 1
+
+    def params(self):
+        return {}
+
+    def describe(self):
+        """JSON-friendly {"name", **params}, stored in the session state."""
+        return {"name": self.name, **self.params()}
+
+    def aggregate(self, updates, weights=None):
+        raise NotImplementedError
+
+
+class WeightedFedAvg(Aggregator):
+    name = "fedavg"
+    streaming = True
+
+    def aggregate(self, updates, weights=None):
+        updates, weights = _check_updates(updates, weights)
+        self.last_selected = None
+        return weights @ updates / weights.sum()
+
+
+class TrimmedMean(Aggregator):
+    """Unweighted: weights are validated but every update counts once (see module docstring)."""
+
+    name = "trimmed_mean"
+
+    def __init__(self, trim_ratio=0.1):
+        super().__init__()
+        if not 0 <= trim_ratio < 0.5:
+            raise ValueError(f"trim_ratio must be in [0, 0.5), got {trim_ratio}")
+        self.trim_ratio = float(trim_ratio)
+
+    def params(self):
+        return {"trim_ratio": self.trim_ratio}
+
+    def aggregate(self, updates, weights=None):
+        updates, _ = _check_updates(updates, weights)
+        n, d = updates.shape
+        k = int(self.trim_ratio * n)
+        self.last_selected = None
+        if k == 0:
+            return updates.mean(axis=0)
+        out = np.empty(d)
+        for start in range(0, d, COLUMN_BLOCK):
+            block = np.partition(updates[:, start:start + COLUMN_BLOCK], [k, n - k - 1], axis=0)
+            # Rows k..n-k-1 hold the kept values (unordered between the two pivots)
+            out[start:start + COLUMN_BLOCK] = block[k:n - k].mean(axis=0)
+        return out
+
+
+class CoordinateMedian(Aggregator):
+    """Unweighted: weights are validated but every update counts once (see module docstring)."""
+
+    name = "median"
+
+    def aggregate(self, updates, weights=None):
+        updates, _ = _check_updates(updates, weights)
+        d = updates.shape[1]
+        self.last_selected = None
+        out = np.empty(d)
+        for start in range(0, d, COLUMN_BLOCK):
+            out[start:start + COLUMN_BLOCK] = np.median(updates[:, start:start + COLUMN_BLOCK], axis=0)
+        return out
+
+
+def krum_scores(updates, n_closest, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Sum of the squared distances of each row to its n_closest nearest other rows.
+    Distances come from ||a||^2 + ||b||^2 - 2 a.b on mean-centred rows (the
+    updates of a round are close to each other: centring avoids cancellation).
+    """
+    n = updates.shape[0]
+    centred = updates - updates.mean(axis=0)
+    sq_norms = np.einsum("ij,ij->i", centred, centred)
+    scores = np.empty(n)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        dist = centred[start:stop] @ centred.T  # (block, n), one GEMM
+        dist *= -2
+        dist += sq_norms[start:stop, None]
+        dist += sq_norms[None, :]
+        np.maximum(dist, 0, out=dist)
+        dist[np.arange(stop - start), np.arange(start, stop)] = np.inf  # Not its own neighbour
+        scores[start:stop] = np.partition(dist, n_closest - 1, axis=1)[:, :n_closest].sum(axis=1)
+    return scores
+
+
+class Krum(Aggregator):
+    """
+    Krum (select=1) and Multi-Krum (select=m, default n - byzantine).
+    Tolerates `byzantine` bad updates as long as n >= 2 * byzantine + 3.
+    """
+
+    name = "krum"
+
+    def __init__(self, byzantine=1, select=1, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__()
+        if byzantine < 0:
+            raise ValueError(f"byzantine must be >= 0, got {byzantine}")
+        if select is not None and select < 1:
+            raise ValueError(f"select must be >= 1, got {select}")
+        self.byzantine = int(byzantine)
+        self.select = select
+        self.block_size = max(1, int(block_size))
+
+    def min_participants(self):
+        return 2 * self.byzantine + 3
+
+    def params(self):
+        return {"byzantine": self.byzantine, "select": self.select}
+
+    def aggregate(self, updates, weights=None):
+        updates, weights = _check_updates(updates, weights)
+        n = updates.shape[0]
+        if n < self.min_participants():
+            raise ValueError(f"Krum with byzantine={self.byzantine} needs at least "
+                             f"{self.min_participants()} updates, got {n}")
+        scores = krum_scores(updates, n - self.byzantine - 2, self.block_size)
+        select = n - self.byzantine if self.select is None else min(self.select, n)
+        selected = np.sort(np.argsort(scores, kind="stable")[:select])
+        self.last_selected = selected
+        w = weights[selected]
+        return w @ updates[selected] / w.sum()
+
+
+class MultiKrum(Krum):
+    name = "multi_krum"
+
+    def __init__(self, byzantine=1, select=None, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__(byzantine, select, block_size)
+
+
+AGGREGATORS = {cls.name: cls for cls in (WeightedFedAvg, TrimmedMean, CoordinateMedian, Krum, MultiKrum)}
+
+
+def make_aggregator(name="fedavg", **params):
+    """Builds a rule from its name and parameters (as stored by Aggregator.describe())."""
+    try:
+        cls = AGGREGATORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown aggregator {name!r}, expected one of {sorted(AGGREGATORS)}") from None
+    try:
+        return cls(**{k: v for k, v in params.items() if v is not None})
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for aggregator {name!r}: {e}") from None
@@ -1,71 +1,564 @@
+import io
 import joblib
 import os
+import time
 import numpy as np
 from sklearn.linear_model import LogisticRegression
+from aggregators import WeightedFedAvg
+from model_store import GLOBAL_OWNER
+from weights_format import DeltaUpdate, StaleUpdateError, load_any
 
-def aggregate_and_publish(file_list, output_path="static/global_model.joblib", round_num=None):
+# Number of models loaded and reduced together. Memory stays O(chunk_size * n_weights)
+# whatever the number of participants in the round.
+DEFAULT_CHUNK_SIZE = 64
+
+
+class FedAvgAccumulator:
     """
-    Merges Logistic Regression models using FedAvg (Average of weights).
+    Running (weighted) sum of Logistic Regression weights.
+    Updates are folded in one at a time or by stacked chunks, so the memory
+    used does not depend on the number of participants.
+    Delta updates (see weights_format.DeltaUpdate) are scattered into the same
+    sum; the base global model is added back once, weighted, in result().
     """
-    if not file_list:
-        print("❌ Liste de fichiers vide. Agrégation impossible.")
-        return
 
-    print(f"🔄 Agrégation (FedAvg) de {len(file_list)} modèles LR en cours...")
-    
-    # 1. Load all models
-    models = [joblib.load(f) for f in file_list]
-    
-    # Basic validation to ensure they are compatible
-    # We assume all models were trained on the same features/classes
-    
-    # 2. Initialize accumulators for weights and intercepts
-    # We take the first model as a reference for shape
-    ref_model = models[0]
-    avg_coef = np.zeros_like(ref_model.coef_)
-    avg_intercept = np.zeros_like(ref_model.intercept_)
-    
-    # 3. Sum of weights
-    for m in models:
-        avg_coef += m.coef_
-        avg_intercept += m.intercept_
-    
-    # 4. Average
-    avg_coef /= len(models)
-    avg_intercept /= len(models)
-    
-    # 5. Create the Global model
+    def __init__(self):
+        self.coef_sum = None
+        self.intercept_sum = None
+        self._flat_sum = None       # coef_sum and intercept_sum are views of this vector
+        self.total_weight = 0.0
+        self.count = 0
+        self.n_iter_sum = 0.0
+        # Base global model of the delta updates
+        self.base_coef = None
+        self.base_intercept = None
+        self.base_round = None
+        self.base_weight = 0.0
+        # Metadata copied from the first update (all participants share features/classes)
+        self.classes_ = None
+        self.feature_names_in_ = None
+
+    def _init_from(self, coef, intercept):
+        coef_shape, intercept_shape = np.shape(coef), np.shape(intercept)
+        n_coef = int(np.prod(coef_shape))
+        self._flat_sum = np.zeros(n_coef + int(np.prod(intercept_shape)), dtype=np.float64)
+        self.coef_sum = self._flat_sum[:n_coef].reshape(coef_shape)
+        self.intercept_sum = self._flat_sum[n_coef:].reshape(intercept_shape)
+
+    def _check_shape(self, coef, intercept):
+        if np.shape(coef) != self.coef_sum.shape or np.shape(intercept) != self.intercept_sum.shape:
+            raise ValueError(
+                f"Incompatible update shape {np.shape(coef)} / {np.shape(intercept)}, "
+                f"expected {self.coef_sum.shape} / {self.intercept_sum.shape}"
+            )
+
+    def set_base(self, coef, intercept, base_round):
+        """Global model the delta updates of this round must be based on."""
+        self.base_coef = np.asarray(coef, dtype=np.float64)
+        self.base_intercept = np.asarray(intercept, dtype=np.float64)
+        self.base_round = base_round
+
+    def add(self, coef, intercept, weight=1.0, n_iter=0.0):
+        """Folds a single update into the running sum."""
+        if weight <= 0:
+            raise ValueError(f"Update weight must be positive, got {weight}")
+        if self.coef_sum is None:
+            self._init_from(coef, intercept)
+        self._check_shape(coef, intercept)
+
+        # In-place multiply-add: no temporary of the size of the model is kept
+        self.coef_sum += weight * np.asarray(coef, dtype=np.float64)
+        self.intercept_sum += weight * np.asarray(intercept, dtype=np.float64)
+        self.total_weight += weight
+        self.count += 1
+        self.n_iter_sum += float(np.mean(n_iter))
+
+    def add_batch(self, coefs, intercepts, weights=None, n_iters=None):
+        """
+        Folds a stacked chunk of updates with one NumPy reduction.
+        coefs: (n, n_classes, n_features), intercepts: (n, n_classes), weights: (n,)
+        """
+        coefs = np.asarray(coefs, dtype=np.float64)
+        intercepts = np.asarray(intercepts, dtype=np.float64)
+        n = coefs.shape[0]
+        if n == 0:
+            return
+        weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        if weights.shape != (n,) or np.any(weights <= 0):
+            raise ValueError("Update weights must be a positive vector, one per update")
+        if self.coef_sum is None:
+            self._init_from(coefs[0], intercepts[0])
+        self._check_shape(coefs[0], intercepts[0])
+
+        # Weighted sum over the participant axis (single BLAS call per tensor)
+        self.coef_sum += np.tensordot(weights, coefs, axes=1)
+        self.intercept_sum += weights @ intercepts
+        self.total_weight += float(weights.sum())
+        self.count += n
+        if n_iters is not None:
+            self.n_iter_sum += float(np.sum(n_iters))
+
+    def check_delta_base(self, delta):
+        """Raises StaleUpdateError unless delta is based on the base model of this accumulator."""
+        if self.base_coef is None or delta.base_round != self.base_round:
+            raise StaleUpdateError(
+                f"Delta based on round {delta.base_round}, expected round {self.base_round}")
+
+    def add_delta(self, delta, weight=1.0, n_iter=0.0):
+        """
+        Folds a DeltaUpdate without rebuilding the participant's full model:
+        its (sparse) values are scattered into the running sum.
+        """
+        if weight <= 0:
+            raise ValueError(f"Update weight must be positive, got {weight}")
+        self.check_delta_base(delta)
+        if self.coef_sum is None:
+            self._init_from(self.base_coef, self.base_intercept)
+        if tuple(delta.shape) != self.coef_sum.shape:
+            raise ValueError(f"Incompatible delta shape {delta.shape}, expected {self.coef_sum.shape}")
+
+        values = delta.dequantized()
+        values *= weight
+        if delta.indices is None:
+            self._flat_sum += values
+        else:
+            self._flat_sum[delta.indices] += values  # Indices are unique (validated on decode)
+        self.base_weight += weight
+        self.total_weight += weight
+        self.count += 1
+        self.n_iter_sum += float(np.mean(n_iter))
+
+    def add_delta_batch(self, deltas, weights=None, n_iters=None):
+        """
+        Folds a stacked chunk of dense deltas (n, n_weights), already checked with
+        check_delta_base, with one weighted reduction (see DeltaUpdate.dequantize_into).
+        """
+        deltas = np.asarray(deltas, dtype=np.float64)
+        n = deltas.shape[0]
+        if n == 0:
+            return
+        weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        if weights.shape != (n,) or np.any(weights <= 0):
+            raise ValueError("Update weights must be a positive vector, one per update")
+        if self.base_coef is None:
+            raise StaleUpdateError("Delta updates need the base model of the round")
+        if self.coef_sum is None:
+            self._init_from(self.base_coef, self.base_intercept)
+        if deltas.shape[1] != self._flat_sum.size:
+            raise ValueError(f"Incompatible delta size {deltas.shape[1]}, expected {self._flat_sum.size}")
+
+        self._flat_sum += weights @ deltas
+        total = float(weights.sum())
+        self.base_weight += total
+        self.total_weight += total
+        self.count += n
+        if n_iters is not None:
+            self.n_iter_sum += float(np.sum(n_iters))
+
+    def add_model(self, model, weight=1.0):
+        """Folds a fitted sklearn LogisticRegression."""
+        self.add(model.coef_, model.intercept_, weight, getattr(model, "n_iter_", 0.0))
+        self.set_metadata(model.classes_, getattr(model, "feature_names_in_", None))
+
+    def add_update(self, update, weight=1.0):
+        """Folds a decoded WeightUpdate or DeltaUpdate (see weights_format)."""
+        if isinstance(update, DeltaUpdate):
+            self.add_delta(update, weight, update.header.get("n_iter", 0.0))
+        else:
+            self.add(update.coef, update.intercept, weight, update.header.get("n_iter", 0.0))
+        self.set_metadata(update.classes, update.feature_names)
+
+    def set_metadata(self, classes, feature_names=None):
+        if self.classes_ is None:
+            self.classes_ = np.asarray(classes)
+        if self.feature_names_in_ is None and feature_names is not None and len(feature_names):
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    def result(self):
+        """Returns the averaged (coef, intercept)."""
+        if self.count == 0:
+            raise ValueError("No update was accumulated")
+        coef_sum, intercept_sum = self.coef_sum, self.intercept_sum
+        if self.base_weight:
+            # Every delta stands for base + delta
+            coef_sum = coef_sum + self.base_weight * self.base_coef
+            intercept_sum = intercept_sum + self.base_weight * self.base_intercept
+        return coef_sum / self.total_weight, intercept_sum / self.total_weight
+
+    def to_model(self):
+        """Builds the global LogisticRegression from the accumulated weights."""
+        avg_coef, avg_intercept = self.result()
+        return build_model(avg_coef, avg_intercept, self.classes_, self.feature_names_in_,
+                           self.n_iter_sum / self.count)
+
+
+class UpdateStack(FedAvgAccumulator):
+    """
+    Keeps every update of the round as one flattened [coef, intercept] row of a
+    (n, n_weights) matrix, for the rules that need all of them (see aggregators).
+    Delta updates are materialized against the base model; rows are appended
+    into a buffer that doubles when full, so folding stays amortized O(n_weights).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = None
+        self.weights = np.empty(0)
+        self.n_iters = np.empty(0)
+
+    def _append_row(self, weight, n_iter):
+        if self.rows is None:
+            self.rows = np.empty((8, self._flat_sum.size))
+            self.weights = np.empty(8)
+            self.n_iters = np.empty(8)
+        elif self.count == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.empty_like(self.rows)])
+            self.weights = np.concatenate([self.weights, np.empty_like(self.weights)])
+            self.n_iters = np.concatenate([self.n_iters, np.empty_like(self.n_iters)])
+        self.weights[self.count] = weight
+        self.n_iters[self.count] = np.mean(n_iter)
+        row = self.rows[self.count]
+        self.count += 1
+        self.total_weight += weight
+        self.n_iter_sum += float(np.mean(n_iter))
+        return row
+
+    def add(self, coef, intercept, weight=1.0, n_iter=0.0):
+        if weight <= 0:
+            raise ValueError(f"Update weight must be positive, got {weight}")
+        if self.coef_sum is None:
+            self._init_from(coef, intercept)
+        self._check_shape(coef, intercept)
+        row = self._append_row(weight, n_iter)
+        n_coef = self.coef_sum.size
+        row[:n_coef] = np.ravel(coef)
+        row[n_coef:] = np.ravel(intercept)
+
+    def add_batch(self, coefs, intercepts, weights=None, n_iters=None):
+        weights = np.ones(len(coefs)) if weights is None else weights
+        n_iters = np.zeros(len(coefs)) if n_iters is None else n_iters
+        for coef, intercept, weight, n_iter in zip(coefs, intercepts, weights, n_iters):
+            self.add(coef, intercept, weight, n_iter)
+
+    def add_delta(self, delta, weight=1.0, n_iter=0.0):
+        if weight <= 0:
+            raise ValueError(f"Update weight must be positive, got {weight}")
+        self.check_delta_base(delta)
+        coef, intercept = delta.apply(self.base_coef, self.base_intercept)
+        self.add(coef, intercept, weight, n_iter)
+
+    def add_delta_batch(self, deltas, weights=None, n_iters=None):
+        if self.base_coef is None:
+            raise StaleUpdateError("Delta updates need the base model of the round")
+        # Every row is materialized against the base model
+        base = np.concatenate([np.ravel(self.base_coef), np.ravel(self.base_intercept)])
+        n_coef = self.base_coef.size
+        weights = np.ones(len(deltas)) if weights is None else weights
+        n_iters = np.zeros(len(deltas)) if n_iters is None else n_iters
+        for delta, weight, n_iter in zip(deltas, weights, n_iters):
+            flat = base + delta
+            self.add(flat[:n_coef].reshape(self.base_coef.shape), flat[n_coef:], weight, n_iter)
+
+    def stacked(self):
+        """(updates, weights): the (n, n_weights) matrix and one weight per row."""
+        if self.count == 0:
+            raise ValueError("No update was accumulated")
+        return self.rows[:self.count], self.weights[:self.count]
+
+    def to_model(self, rule=None):
+        """Global LogisticRegression of the rule applied to the stacked updates (default: FedAvg)."""
+        rule = rule or WeightedFedAvg()
+        updates, weights = self.stacked()
+        flat = rule.aggregate(updates, weights)
+        n_coef = self.coef_sum.size
+        selected = slice(None) if rule.last_selected is None else rule.last_selected
+        return build_model(flat[:n_coef].reshape(self.coef_sum.shape), flat[n_coef:].reshape(self.intercept_sum.shape),
+                           self.classes_, self.feature_names_in_, float(np.mean(self.n_iters[:self.count][selected])))
+
+
+def build_model(coef, intercept, classes, feature_names=None, n_iter=0.0):
+    """Global LogisticRegression from aggregated weights (no fit)."""
     global_model = LogisticRegression()
     # We must define attributes manually because we do not fit
-    global_model.coef_ = avg_coef
-    global_model.intercept_ = avg_intercept
-    global_model.classes_ = ref_model.classes_
-    global_model.n_iter_ = np.mean([m.n_iter_ for m in models]) # Just for info
-    
-    # 6. Copy feature metadata (to avoid sklearn Warning)
-    if hasattr(ref_model, 'feature_names_in_'):
-        global_model.feature_names_in_ = ref_model.feature_names_in_
-    if hasattr(ref_model, 'n_features_in_'):
-        global_model.n_features_in_ = ref_model.n_features_in_
-    
-    # Note: For the model to be usable for predict, we often need to simulate a fit
-    # or ensure all necessary properties are there.
-    # Hack for sklearn: we set is_fitted via check_is_fitted or simply by having coef_
-    
+    global_model.coef_ = coef
+    global_model.intercept_ = intercept
+    global_model.classes_ = classes
+    global_model.n_iter_ = n_iter  # Just for info
+
+    # Copy feature metadata (to avoid sklearn Warning)
+    if feature_names is not None:
+        global_model.feature_names_in_ = feature_names
+    global_model.n_features_in_ = coef.shape[1]
+    return global_model
+
+
+def accumulate_files(file_list, sample_counts=None, chunk_size=DEFAULT_CHUNK_SIZE, accumulator=None,
+                     base_model=None, base_round=None, allow_pickle=False):
+    """
+    Streams the participant updates of file_list (.flw or .joblib) into a FedAvgAccumulator.
+    At most chunk_size models are alive at the same time; each chunk is reduced
+    with a single weighted tensordot. Delta updates are decoded into their own stacked
+    chunk (one weighted sum per chunk too) and must be based on base_model (the
+    global model of base_round).
+    Legacy .joblib files are unpickled only with allow_pickle=True (trusted files).
+    On .joblib files unpickling dominates: streaming then trades some latency (up to
+    ~1.3x the load-everything loop) for constant memory. .flw files are memory-mapped
+    and several times faster (benchmarks/bench_aggregation.py).
+    """
+    if sample_counts is not None and len(sample_counts) != len(file_list):
+        raise ValueError("sample_counts must have one entry per file")
+    acc = accumulator if accumulator is not None else FedAvgAccumulator()
+    if base_model is not None:
+        acc.set_base(base_model.coef_, base_model.intercept_, base_round)
+    chunk_size = max(1, int(chunk_size))
+
+    coef_buf = intercept_buf = delta_buf = None
+    for start in range(0, len(file_list), chunk_size):
+        chunk = file_list[start:start + chunk_size]
+        n_iters = np.zeros(len(chunk))
+        weights = np.ones(len(chunk))
+        if sample_counts is not None:
+            weights[:] = sample_counts[start:start + chunk_size]
+        delta_weights, delta_iters = np.empty(len(chunk)), np.empty(len(chunk))
+        n = m = 0  # Full-weight and delta updates buffered in this chunk
+        for i, path in enumerate(chunk):
+            # .flw updates are memory-mapped (no unpickling); legacy .joblib only with allow_pickle
+            update = load_any(path, allow_pickle)
+            acc.set_metadata(update.classes, update.feature_names)
+            if isinstance(update, DeltaUpdate):
+                acc.check_delta_base(update)
+                if delta_buf is None:
+                    delta_buf = np.empty((chunk_size, update.size), dtype=np.float64)
+                if update.size != delta_buf.shape[1]:
+                    raise ValueError(f"Incompatible delta shape in {path}: {update.shape}")
+                update.dequantize_into(delta_buf[m])
+                delta_weights[m] = weights[i]
+                delta_iters[m] = np.mean(update.header.get("n_iter", 0.0))
+                m += 1
+                continue
+            if coef_buf is None:
+                # Pre-allocated once, reused by every chunk
+                coef_buf = np.empty((chunk_size,) + update.coef.shape, dtype=np.float64)
+                intercept_buf = np.empty((chunk_size,) + update.intercept.shape, dtype=np.float64)
+            if update.coef.shape != coef_buf.shape[1:]:
+                raise ValueError(f"Incompatible model shape in {path}: {update.coef.shape}")
+            coef_buf[n] = update.coef
+            intercept_buf[n] = update.intercept
+            n_iters[n] = np.mean(update.header.get("n_iter", 0.0))
+            weights[n] = weights[i]
+            n += 1
+            del update
+
+        if n:
+            acc.add_batch(coef_buf[:n], intercept_buf[:n], weights[:n], n_iters[:n])
+        if m:
+            acc.add_delta_batch(delta_buf[:m], delta_weights[:m], delta_iters[:m])
+    return acc
+
+
+class OnlineRoundAggregator:
+    """
+    Online aggregation for one round: each verified update is folded as soon as
+    it is verified. With FedAvg (default rule) only running sums are kept, so
+    closing the round is a division + publish; the robust rules of aggregators
+    (trimmed mean, median, Krum) keep the stacked updates instead.
+    Folding is idempotent per participant (duplicate/late webhooks are no-ops).
+    """
+
+    def __init__(self, round_num, base_model=None, base_round=None, rule=None):
+        self.round_num = round_num
+        self.rule = rule or WeightedFedAvg()
+        self.participants = {}  # participant -> fold order
+        if self.rule.streaming:
+            # Uniform and sample-weighted sums are both kept: the weighted average is
+            # only used if every participant reported its sample count.
+            self.uniform = FedAvgAccumulator()
+            self.weighted = FedAvgAccumulator()
+        else:
+            # One matrix, two weight vectors
+            self.uniform = UpdateStack()
+            self.weighted = None
+            self.sample_counts = []
+        self.all_weighted = True
+        if base_model is not None:
+            # Delta updates of this round are relative to this global model
+            for acc in (self.uniform, self.weighted):
+                if acc is not None:
+                    acc.set_base(base_model.coef_, base_model.intercept_, base_round)
+
+    def __len__(self):
+        return len(self.participants)
+
+    def fold(self, participant, update, n_samples=0):
+        """Adds a WeightUpdate. Returns False if this participant was already folded."""
+        if participant in self.participants:
+            return False
+        self.uniform.add_update(update)
+        if n_samples <= 0:
+            self.all_weighted = False
+        elif self.weighted is not None:
+            self.weighted.add_update(update, weight=n_samples)
+        if self.weighted is None:
+            self.sample_counts.append(n_samples)
+        self.participants[participant] = len(self.participants)
+        return True
+
+    def to_model(self):
+        if self.weighted is not None:
+            acc = self.weighted if self.all_weighted else self.uniform
+            return acc.to_model()
+        if self.all_weighted:
+            self.uniform.weights[:self.uniform.count] = self.sample_counts
+        return self.uniform.to_model(self.rule)
+
+    def excluded_participants(self):
+        """Participants left out by the rule at the last to_model() (Krum selection)."""
+        selected = self.rule.last_selected
+        if selected is None:
+            return []
+        kept = set(int(i) for i in selected)
+        return [p for p, i in self.participants.items() if i not in kept]
+
+
+class BufferedAggregator:
+    """
+    Buffered asynchronous aggregation (FedBuff). Verified updates are folded as
+    model deltas (update - global model it was trained from), whatever the round
+    they were trained in, with weight n_samples / (1 + staleness) ** staleness_exponent.
+    The server flushes when the buffer holds enough updates or its deadline passes:
+    new global = current global + rule(deltas). Memory is O(buffer size * n_weights).
+    """
+
+    def __init__(self, base_model=None, base_round=None, rule=None, staleness_exponent=0.5):
+        self.base_model = base_model  # Global model the flushed deltas are added to
+        self.base_round = base_round
+        self.rule = rule or WeightedFedAvg()
+        self.staleness_exponent = staleness_exponent
+        self.stack = UpdateStack()
+        self.participants = {}  # (round, participant) -> fold order
+        self.staleness = {}     # (round, participant) -> staleness
+        self.sample_counts = []
+        self.all_weighted = True
+        self.opened_at = None   # time.monotonic() of the first fold: start of the deadline
+
+    def __len__(self):
+        return len(self.participants)
+
+    def staleness_weight(self, staleness):
+        return (1.0 + staleness) ** -self.staleness_exponent
+
+    def fold(self, key, update, n_samples=0, update_base=None, staleness=0):
+        """
+        Adds a WeightUpdate/DeltaUpdate trained from update_base (a global model,
+        None before the first one), `staleness` global models ago.
+        Returns False if this (round, participant) was already folded.
+        """
+        if key in self.participants:
+            return False
+        n_iter = update.header.get("n_iter", 0.0)
+        if isinstance(update, DeltaUpdate):
+            n_rows, n_features = update.shape
+            coef, intercept = update.apply(np.zeros((n_rows, n_features)), np.zeros(n_rows))
+        elif update_base is not None:
+            coef = np.asarray(update.coef, dtype=np.float64) - update_base.coef_
+            intercept = np.asarray(update.intercept, dtype=np.float64) - update_base.intercept_
+        else:
+            coef, intercept = update.coef, update.intercept
+        # Real weights are set in to_model(), once we know if every sample count is known
+        self.stack.add(coef, intercept, 1.0, n_iter)
+        self.stack.set_metadata(update.classes, update.feature_names)
+        self.sample_counts.append(n_samples)
+        if n_samples <= 0:
+            self.all_weighted = False
+        self.staleness[key] = staleness
+        self.participants[key] = len(self.participants)
+        if self.opened_at is None:
+            self.opened_at = time.monotonic()
+        return True
+
+    def expired(self, deadline_s):
+        return self.opened_at is not None and time.monotonic() - self.opened_at >= deadline_s
+
+    def to_model(self):
+        """New global model: base + aggregated (staleness-weighted) deltas."""
+        n = len(self.participants)
+        weights = np.array([self.staleness_weight(s) for s in self.staleness.values()])
+        if self.all_weighted:
+            weights *= self.sample_counts
+        self.stack.weights[:n] = weights
+        updates, weights = self.stack.stacked()
+        flat = self.rule.aggregate(updates, weights)
+        n_coef = self.stack.coef_sum.size
+        coef = flat[:n_coef].reshape(self.stack.coef_sum.shape)
+        intercept = flat[n_coef:].reshape(self.stack.intercept_sum.shape)
+        if self.base_model is not None:
+            coef = coef + self.base_model.coef_
+            intercept = intercept + self.base_model.intercept_
+        selected = slice(None) if self.rule.last_selected is None else self.rule.last_selected
+        return build_model(coef, intercept, self.stack.classes_, self.stack.feature_names_in_,
+                           float(np.mean(self.stack.n_iters[:n][selected])))
+
+    def excluded_participants(self):
+        """(round, participant) keys left out by the rule at the last to_model()."""
+        selected = self.rule.last_selected
+        if selected is None:
+            return []
+        kept = set(int(i) for i in selected)
+        return [key for key, i in self.participants.items() if i not in kept]
+
+
+def publish_global_model(global_model, output_path="static/global_model.joblib", round_num=None, history=None):
+    """Writes the global model (latest + round history). history: a model_store.ModelStore, else flat static/ files."""
     # Ensure the 'static' folder exists
     if not os.path.exists("static"):
         os.makedirs("static")
-    
+
+    # Round id travels with the model: participants send it back as the base of their deltas
+    if round_num is not None:
+        global_model.fl_round_ = round_num
+
     # Save the aggregated model (Latest version)
     joblib.dump(global_model, output_path)
-    
+
     # Save history (Round Version)
     if round_num is not None:
-        history_path = f"static/global_model_round_{round_num}.joblib"
-        joblib.dump(global_model, history_path)
+        if history is not None:
+            buffer = io.BytesIO()
+            joblib.dump(global_model, buffer)
+            history_path = history.put(round_num, GLOBAL_OWNER, buffer.getvalue(), ".joblib")
+        else:
+            history_path = f"static/global_model_round_{round_num}.joblib"
+            joblib.dump(global_model, history_path)
         print(f"📜 Historique sauvegardé : {history_path}")
-    
+
+
+def aggregate_and_publish(file_list, output_path="static/global_model.joblib", round_num=None,
+                          sample_counts=None, chunk_size=DEFAULT_CHUNK_SIZE, base_model=None, base_round=None,
+                          rule=None, allow_pickle=False):
+    """
+    Merges Logistic Regression models using FedAvg (Average of weights).
+    Models are streamed in chunks into a running accumulator; when sample_counts
+    is given, each model is weighted by its number of training samples.
+    Delta updates are aggregated against base_model (global model of base_round);
+    stale deltas raise StaleUpdateError.
+    rule: another aggregators.Aggregator (trimmed mean, median, Krum); the
+    updates are then stacked in memory instead of summed.
+    """
+    if not file_list:
+        print("❌ Liste de fichiers vide. Agrégation impossible.")
+        return
+
+    rule = rule or WeightedFedAvg()
+    print(f"🔄 Agrégation ({rule.name}) de {len(file_list)} modèles LR en cours...")
+
+    acc = accumulate_files(file_list, sample_counts=sample_counts, chunk_size=chunk_size,
+                           accumulator=None if rule.streaming else UpdateStack(),
+                           base_model=base_model, base_round=base_round, allow_pickle=allow_pickle)
+    global_model = acc.to_model() if rule.streaming else acc.to_model(rule)
+    publish_global_model(global_model, output_path, round_num)
+
+    print("-" * 30)
+    print(f"🚀 NOUVEAU MODÈLE FL ({rule.name}) PUBLIÉ : {output_path}")
+    print(f"Poids moyennés sur {acc.count} participants.")
     print("-" * 30)
-    print(f"🚀 NOUVEAU MODÈLE FL (FedAvg) PUBLIÉ : {output_path}")
-    print(f"Poids moyennés sur {len(models)} participants.")
-    print("-" * 30)
\ No newline at end of file
+    return global_model
@@ -0,0 +1,172 @@
+"""
+Benchmark: wall-clock time to a target global accuracy with synchronous rounds
+(barrier on every expected participant) vs asynchronous buffered rounds (FedBuff,
+/control/start_auto?mode=async), on the bench_federation harness: test chain,
+coordinator bot and server_coordinator.app. Participants train continuously, one
+contribution per contract round; a fraction of them are stragglers.
+
+Each mode runs in its own process (the server is configured at import time).
+
+Usage (from the repository root):
+    python benchmarks/bench_async_rounds.py --participants 20 --stragglers 0.2 --artifact contract.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_federation import SOLC_VERSION, Stages, bot_pass, participant_round, setup  # noqa: E402
+
+
+def participant_loop(ctx, i, sc, stop, errors):
+    """Train_Participant.monitor_mode: contributes once to every new round."""
+    done_round = -1
+    while not stop.is_set() and sc.state["training_active"]:
+        round_num = sc.state["current_round"]
+        if round_num <= done_round:
+            time.sleep(0.01)
+            continue
+        try:
+            done_round = participant_round(ctx, i, round_num)
+        except Exception as e:
+            errors.append(repr(e))
+            done_round = round_num
+
+
+def bot_loop(ctx, bot, sc, stop):
+    """coordinator_bot.start_bot, without the polling interval."""
+    matcher = bot.UploadHashMatcher()
+    cursors = {"block": ctx["w3"].eth.block_number + 1, "uploads": 0}
+    while not stop.is_set():
+        round_num = sc.state["current_round"]
+        if not bot_pass(ctx, bot, matcher, cursors, round_num):
+            time.sleep(0.01)
+        matcher.prune(round_num)
+
+
+def run_mode(args):
+    stages = Stages()
+    sc, bot, ctx = setup(args, stages)
+    rng = np.random.default_rng(args.seed)
+    delays = rng.exponential(args.delay, size=args.participants)
+    delays[rng.permutation(args.participants)[:int(args.stragglers * args.participants)]] += args.straggler_delay
+    ctx["delays"] = delays.tolist()
+
+    # Accuracy curve: one point per published global model
+    curve = []
+    evaluate = sc.evaluate_global_model
+
+    def timed_evaluate(model=None):
+        metrics = evaluate(model)
+        if metrics:
+            curve.append({"round": sc.state["current_round"], "t_s": time.perf_counter() - session_t0,
+                          "accuracy": metrics["accuracy"]})
+        return metrics
+    sc.evaluate_global_model = timed_evaluate
+
+    params = {"rounds": args.max_rounds, "participants": args.participants, "mode": args.mode}
+    if args.mode == "async":
+        params.update(buffer_size=args.buffer_size or max(1, args.participants // 2),
+                      buffer_deadline=args.buffer_deadline, staleness_exponent=args.staleness_exponent,
+                      max_staleness=args.max_staleness)
+
+    from fastapi.testclient import TestClient
+    errors, stop = [], threading.Event()
+    with TestClient(sc.app) as client:
+        bot.notify_server = lambda addr, current_round, timeout=5: client.post(
+            "/webhook/verify_contribution", json={"participant_address": addr, "round": current_round})
+        ctx["client"] = client
+        client.post("/control/start_auto", params=params).raise_for_status()
+        session_t0 = time.perf_counter()
+        threads = [threading.Thread(target=bot_loop, args=(ctx, bot, sc, stop), daemon=True)]
+        threads += [threading.Thread(target=participant_loop, args=(ctx, i, sc, stop, errors), daemon=True)
+                    for i in range(args.participants)]
+        for t in threads:
+            t.start()
+
+        reached = None
+        while sc.state["training_active"] and time.perf_counter() - session_t0 < args.time_limit:
+            if curve and curve[-1]["accuracy"] >= args.target_accuracy:
+                reached = curve[-1]
+                break
+            time.sleep(0.05)
+        client.post("/control/stop")
+        stop.set()
+        for t in threads:
+            t.join(timeout=60)
+
+    updates = [m for m in sc.state.metrics if m["participant"] != sc.GLOBAL_PARTICIPANT]
+    staleness = [m["staleness"] for m in updates if "staleness" in m]
+    return {
+        "mode": args.mode, "participants": args.participants, "params": params,
+        "target_accuracy": args.target_accuracy,
+        "time_to_target_s": reached["t_s"] if reached else None,
+        "rounds_to_target": len(curve) if reached else None,
+        "session_s": time.perf_counter() - session_t0,
+        "global_models": len(curve),
+        "best_accuracy": max((p["accuracy"] for p in curve), default=None),
+        "uploads": len(updates),
+        "verified": sum(1 for m in updates if m.get("verified")),
+        "mean_staleness": float(np.mean(staleness)) if staleness else None,
+        "participant_errors": len(errors),
+        "curve": curve,
+        "stages": stages.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=120, help="Rows of client data per participant")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--target-accuracy", type=float, default=0.8)
+    parser.add_argument("--max-rounds", type=int, default=100)
+    parser.add_argument("--time-limit", type=float, default=300, help="Seconds per mode")
+    parser.add_argument("--delay", type=float, default=0.2, help="Mean extra compute time of a participant (s)")
+    parser.add_argument("--stragglers", type=float, default=0.2, help="Fraction of slow participants")
+    parser.add_argument("--straggler-delay", type=float, default=3.0, help="Extra seconds of a straggler")
+    parser.add_argument("--buffer-size", type=int, default=None, help="Async K (default: participants // 2)")
+    parser.add_argument("--buffer-deadline", type=float, default=5.0)
+    parser.add_argument("--staleness-exponent", type=float, default=0.5)
+    parser.add_argument("--max-staleness", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--artifact", help="Precompiled contract JSON (skips solc)")
+    parser.add_argument("--solc-version", default=SOLC_VERSION)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)  # Child process
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    if args.mode:
+        # Logs of the server, the bot and the payment callbacks (still running after
+        # run_mode returns) go to stderr; stdout only carries the result
+        sys.stdout = sys.stderr
+        result = run_mode(args)
+        sys.__stdout__.write(json.dumps(result) + "\n")
+        sys.__stdout__.flush()
+        return
+
+    results = []
+    for mode in args.modes:
+        child = [a for a in sys.argv[1:] if a != "--json"] + ["--mode", mode]
+        out = subprocess.run([sys.executable, os.path.abspath(__file__)] + child, check=True,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        ttt = f"{r['time_to_target_s']:.1f}s" if r["time_to_target_s"] is not None else "not reached"
+        staleness = f"{r['mean_staleness']:.2f}" if r["mean_staleness"] is not None else "-"
+        print(f"{r['mode']:<5} | target {r['target_accuracy']:.2f}: {ttt} | {r['global_models']} global models "
+              f"in {r['session_s']:.1f}s | best acc {r['best_accuracy']} | "
+              f"{r['verified']}/{r['uploads']} updates verified | mean staleness {staleness}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: loading datasets with pd.read_csv + drop (previous server start and
+participant round) vs the memory-mapped .npy cache of dataset_cache.py, on the
+server test set and on a synthetic partition of --rows rows resampled from
+datasets/client_*.csv.
+
+Cold start runs in a fresh interpreter (imports included) and reports its peak
+memory (Linux); the per-round load is what Train_Participant.py pays every round (first
+--client-rows rows); feature statistics stream over the whole partition.
+
+Usage (from the repository root):
+    python benchmarks/bench_dataset_cache.py --rows 500000
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from dataset_cache import build_cache, load_dataset  # noqa: E402
+from feature_stats import DROP_COLUMNS, chunked_stats, local_stats  # noqa: E402
+
+# Run in a fresh interpreter: prints {"seconds", "load_seconds", "peak_mb"}; t1 marks the end of the imports.
+# Memory-mapped pages count in the peak RSS.
+COLD_START = {
+    "read_csv": """
+        import pandas as pd
+        from sklearn.preprocessing import StandardScaler
+        t1 = time.perf_counter()
+        df = pd.read_csv(PATH)
+        X = StandardScaler().fit_transform(df.drop(["Churn", "customerID"], axis=1))
+        y = df["Churn"]
+    """,
+    "cache": """
+        from sklearn.preprocessing import StandardScaler
+        from dataset_cache import load_dataset
+        t1 = time.perf_counter()
+        data = load_dataset(PATH, cache_dir=CACHE_DIR)
+        X = StandardScaler().fit_transform(data.X)
+        y = data.y
+    """,
+}
+STATS = {
+    "read_csv": """
+        import pandas as pd
+        from feature_stats import local_stats
+        t1 = time.perf_counter()
+        local_stats(pd.read_csv(PATH).drop(["Churn", "customerID"], axis=1))
+    """,
+    "cache": """
+        from dataset_cache import load_dataset
+        from feature_stats import chunked_stats
+        t1 = time.perf_counter()
+        data = load_dataset(PATH, cache_dir=CACHE_DIR)
+        chunked_stats(data.chunks(), data.columns)
+    """,
+}
+
+
+def run_fresh(snippet, path, cache_dir):
+    # VmHWM: peak RSS of this process (ru_maxrss would report the forking parent's peak)
+    code = "import time\nt0 = time.perf_counter()\n" + textwrap.dedent(snippet) + textwrap.dedent("""
+        import json
+        with open("/proc/self/status") as f:
+            peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+        t2 = time.perf_counter()
+        print(json.dumps({"seconds": t2 - t0, "load_seconds": t2 - t1, "peak_mb": peak_kb / 1024}))
+    """)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", f"PATH, CACHE_DIR = {path!r}, {cache_dir!r}\n" + code],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def make_partition(path, rows, seed):
+    """rows rows resampled from the client CSVs, written as one CSV."""
+    df = pd.concat([pd.read_csv(f) for f in sorted(glob.glob(os.path.join(ROOT, "datasets", "client_*.csv")))])
+    rng = np.random.default_rng(seed)
+    df.iloc[rng.integers(0, len(df), rows)].to_csv(path, index=False)
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500000, help="Rows of the synthetic partition")
+    parser.add_argument("--client-rows", type=int, default=600, help="Rows used per round (Train_Participant.py)")
+    parser.add_argument("--repeat", type=int, default=20, help="Per-round loads timed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        partition = os.path.join(tmp, "partition.csv")
+        make_partition(partition, args.rows, args.seed)
+        files = {"server_test": os.path.join(ROOT, "datasets", "server_test.csv"), "partition": partition}
+        for name, path in files.items():
+            t0 = time.perf_counter()
+            entry = build_cache(path, cache_dir)
+            convert_s = time.perf_counter() - t0
+            rows = args.client_rows
+
+            def baseline_round():
+                df = pd.read_csv(path).head(rows)
+                return df.drop(DROP_COLUMNS, axis=1).to_numpy(dtype=np.float64), df["Churn"].to_numpy()
+
+            def cache_round():
+                data = load_dataset(path, rows=rows, cache_dir=cache_dir)
+                return np.array(data.X), np.array(data.y)  # Materialized, as training reads every row
+
+            assert np.array_equal(baseline_round()[0], cache_round()[0])
+            full = load_dataset(path, cache_dir=cache_dir)
+            assert np.allclose(chunked_stats(full.chunks(), full.columns)["sumsq"],
+                               local_stats(pd.read_csv(path).drop(DROP_COLUMNS, axis=1))["sumsq"])
+            results[name] = {
+                "rows": len(full),
+                "csv_mb": os.path.getsize(path) / 2 ** 20,
+                "cache_mb": sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry)) / 2 ** 20,
+                "convert_once_s": convert_s,
+                "cold_start": {k: run_fresh(v, path, cache_dir) for k, v in COLD_START.items()},
+                "stats": {k: run_fresh(v, path, cache_dir) for k, v in STATS.items()},
+                "round_load_ms": {"read_csv": 1000 * timed(baseline_round, args.repeat),
+                                  "cache": 1000 * timed(cache_round, args.repeat)},
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, r in results.items():
+        cold, stats, load = r["cold_start"], r["stats"], r["round_load_ms"]
+        print(f"{name}: {r['rows']} rows | CSV {r['csv_mb']:.1f} MB -> cache {r['cache_mb']:.1f} MB "
+              f"(converted once in {r['convert_once_s']:.2f}s)")
+        for label, runs in (("cold start (load + scaler)", cold), ("feature stats (full file) ", stats)):
+            base, new = runs["read_csv"], runs["cache"]
+            print(f"  {label} : read_csv {1000 * base['load_seconds']:7.1f} ms ({base['seconds']:.2f}s with imports, "
+                  f"{base['peak_mb']:.0f} MB) | cache {1000 * new['load_seconds']:6.1f} ms ({new['seconds']:.2f}s, "
+                  f"{new['peak_mb']:.0f} MB) | x{base['load_seconds'] / new['load_seconds']:.1f}")
+        print(f"  per-round load ({args.client_rows} rows)    : read_csv {load['read_csv']:.2f} ms | "
+              f"cache {load['cache']:.3f} ms | x{load['read_csv'] / load['cache']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
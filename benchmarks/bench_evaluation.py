@@ -0,0 +1,87 @@
+"""
+Benchmark: server-side validation of many uploaded models, one sklearn
+predict/predict_proba + 5 metric calls per model vs one batched
+EvaluationEngine.evaluate_many GEMM. Also checks that both give the same metrics.
+
+Usage:
+    python benchmarks/bench_evaluation.py --models 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, log_loss, precision_score, recall_score
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import EvaluationEngine  # noqa: E402
+
+
+def sklearn_metrics(model, X, y):
+    """Reference: the previous calculate_metrics."""
+    y_pred = model.predict(X)
+    y_prob = model.predict_proba(X)
+    return {
+        "accuracy": float(accuracy_score(y, y_pred)),
+        "loss": float(log_loss(y, y_prob)),
+        "precision": float(precision_score(y, y_pred, average="macro", zero_division=0)),
+        "recall": float(recall_score(y, y_pred, average="macro", zero_division=0)),
+        "f1": float(f1_score(y, y_pred, average="macro", zero_division=0)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--models", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--features", type=int, default=19)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.samples, args.features))
+    y = (X[:, 0] + 0.5 * rng.normal(size=args.samples) > 0).astype(int)
+    coefs = rng.normal(scale=0.3, size=(args.models, 1, args.features))
+    intercepts = rng.normal(scale=0.1, size=(args.models, 1))
+    classes = [0, 1]
+
+    models = []
+    for i in range(args.models):
+        m = LogisticRegression()
+        m.coef_, m.intercept_, m.classes_ = coefs[i], intercepts[i], np.array(classes)
+        models.append(m)
+
+    t0 = time.perf_counter()
+    ref = [sklearn_metrics(m, X, y) for m in models]
+    t_sklearn = time.perf_counter() - t0
+
+    engine = EvaluationEngine(X, y)
+    t0 = time.perf_counter()
+    batched = engine.evaluate_many(coefs, intercepts, classes)
+    t_batched = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    engine.evaluate_many(coefs, intercepts, classes)
+    t_cached = time.perf_counter() - t0
+
+    for a, b in zip(ref, batched):
+        for k in a:
+            assert abs(a[k] - b[k]) < 1e-9, (k, a[k], b[k])
+
+    results = {
+        "models": args.models, "samples": args.samples, "features": args.features,
+        "sklearn_s": t_sklearn, "batched_s": t_batched, "cached_s": t_cached,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"sklearn per model : {t_sklearn:.3f}s")
+    print(f"batched GEMM      : {t_batched:.4f}s  (x{t_sklearn / t_batched:.0f})")
+    print(f"memoized re-run   : {t_cached:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
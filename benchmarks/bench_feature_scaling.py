@@ -0,0 +1,111 @@
+"""
+Benchmark: rounds to a target global accuracy with per-party StandardScaler refits
+(every client and the server fit their own scaler) vs the federated global scaler
+(feature_stats.py: merged count / sum / sum of squares), FedAvg in process.
+
+Clients train like Train_Participant.py (LogisticRegression warm-started from the
+global weights, --max-iter local iterations). With --skew > 0 the rows are
+dealt out sorted by one feature (tenure by default), so the clients' feature
+distributions and therefore their local scalers differ, as they do across
+real data silos.
+
+Usage (from the repository root):
+    python benchmarks/bench_feature_scaling.py --participants 20 --rounds 30 --skew 1 --max-iter 5
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from aggregators import WeightedFedAvg  # noqa: E402
+from evaluation import EvaluationEngine  # noqa: E402
+from feature_stats import DROP_COLUMNS, local_stats, merge_stats, scaler_from_stats  # noqa: E402
+
+
+def load_partitions(n_participants, skew, sort_by, seed):
+    """Raw (X, y) per client. skew=0: random split, skew=1: contiguous ranges of sort_by."""
+    df = pd.concat([pd.read_csv(f) for f in sorted(glob.glob(os.path.join(ROOT, "datasets", "client_*.csv")))])
+    rng = np.random.default_rng(seed)
+    # Sort key: the feature, blended with noise (skew = share of the feature in the key)
+    feature = df[sort_by].rank(pct=True).to_numpy()
+    order = np.argsort(skew * feature + (1 - skew) * rng.random(len(df)), kind="stable")
+    X = df.drop(DROP_COLUMNS, axis=1)
+    y = df["Churn"].to_numpy()
+    return [(X.iloc[idx], y[idx]) for idx in np.array_split(order, n_participants)]
+
+
+def run(partitions, X_server, y_server, scaling, rounds, max_iter, target):
+    if scaling == "federated":
+        scaler = scaler_from_stats(merge_stats(local_stats(X) for X, _ in partitions))
+        client_data = [(scaler.transform(X), y) for X, y in partitions]
+        X_eval = scaler.transform(X_server)
+    else:
+        client_data = [(StandardScaler().fit_transform(X), y) for X, y in partitions]
+        X_eval = StandardScaler().fit_transform(X_server)
+    engine = EvaluationEngine(X_eval, y_server)
+    weights = np.array([len(y) for _, y in client_data], dtype=np.float64)
+    fedavg = WeightedFedAvg()
+
+    coef = intercept = None
+    classes = np.array([0, 1])
+    curve, reached = [], None
+    for round_num in range(1, rounds + 1):
+        updates = []
+        for X, y in client_data:
+            model = LogisticRegression(max_iter=max_iter, warm_start=True)
+            if coef is not None:
+                model.coef_, model.intercept_, model.classes_ = coef.copy(), intercept.copy(), classes
+            model.fit(X, y)
+            updates.append(np.concatenate([model.coef_.ravel(), model.intercept_]))
+        flat = fedavg.aggregate(np.vstack(updates), weights)
+        coef, intercept = flat[:-1].reshape(1, -1), flat[-1:]
+        accuracy = engine.evaluate(coef, intercept, classes)["accuracy"]
+        curve.append(accuracy)
+        if reached is None and accuracy >= target:
+            reached = round_num
+    return {"scaling": scaling, "rounds_to_target": reached, "final_accuracy": curve[-1],
+            "best_accuracy": max(curve), "curve": curve}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--skew", type=float, default=1.0, help="0 = IID split, 1 = sorted by --sort-by")
+    parser.add_argument("--sort-by", default="tenure")
+    parser.add_argument("--max-iter", type=int, default=5, help="Local solver iterations per round")
+    parser.add_argument("--target-accuracy", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    partitions = load_partitions(args.participants, args.skew, args.sort_by, args.seed)
+    server = pd.read_csv(os.path.join(ROOT, "datasets", "server_test.csv"))
+    X_server, y_server = server.drop(DROP_COLUMNS, axis=1), server["Churn"].to_numpy()
+    results = [run(partitions, X_server, y_server, scaling, args.rounds, args.max_iter, args.target_accuracy)
+               for scaling in ("local", "federated")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.participants} participants | skew {args.skew} ({args.sort_by}) | max_iter {args.max_iter} | "
+          f"target {args.target_accuracy}")
+    for r in results:
+        rounds = r["rounds_to_target"] if r["rounds_to_target"] is not None else f"> {args.rounds}"
+        print(f"{r['scaling']:<9} | rounds to target: {rounds:>5} | final acc {r['final_accuracy']:.3f} | "
+              f"best {r['best_accuracy']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
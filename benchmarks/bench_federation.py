@@ -0,0 +1,373 @@
+"""
+End-to-end load test: N simulated participants run full rounds against
+server_coordinator.app, the coordinator_bot verification logic and an in-process
+test chain (eth-tester) with AICollaboration deployed. Participants are partitioned
+from datasets/client_*.csv. Reports per-stage latencies (download, train, hash,
+submit, upload, validate, verify per bot batch, aggregate, publish, evaluate,
+round switch), round throughput and peak memory.
+
+Requires eth-tester[py-evm] and httpx. The contract is the committed
+build/AICollaboration.json (build_contract.py), another {"abi": [...], "bytecode":
+"0x..."} file passed with --artifact, or AICollaboration.sol compiled with py-solc-x
+(--solc-version, solc is installed on first use).
+
+Usage (from the repository root):
+    python benchmarks/bench_federation.py --participants 200 --rounds 3 --json > federation.json
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_upload_latency import ROOT, load_server, percentiles  # noqa: E402
+
+sys.path.insert(0, ROOT)
+import build_contract  # noqa: E402
+
+PARTICIPANT_FUNDING_WEI = 10 ** 18
+
+
+class Stages:
+    """Thread-safe per-stage duration samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - t0)
+        return timed
+
+    def report(self):
+        return {stage: percentiles(values) for stage, values in self.samples.items()}
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+# --- Test chain ---------------------------------------------------------------
+
+def compile_contract(artifact=None, solc_version=None):
+    """(abi, bytecode) of AICollaboration: AICollaboration.sol compiled with py-solc-x
+    when solc_version is given, else --artifact (default build/AICollaboration.json)."""
+    if solc_version:
+        contract = build_contract.compile_solidity(solc_version)
+        return contract["abi"], contract["bytecode"]
+    return build_contract.load_artifact(artifact or build_contract.ARTIFACT)
+
+
+def start_chain():
+    """In-process chain. eth-tester is not thread-safe and is shared by the participants,
+    the server and the bot, so every RPC call is serialized."""
+    from web3 import EthereumTesterProvider, Web3
+
+    class LockedTesterProvider(EthereumTesterProvider):
+        def __init__(self):
+            super().__init__()
+            self._rpc_lock = threading.Lock()
+
+        def make_request(self, method, params):
+            with self._rpc_lock:
+                return super().make_request(method, params)
+
+    w3 = Web3(LockedTesterProvider())
+    keys = w3.provider.ethereum_tester.backend.account_keys
+    return w3, [(k.public_key.to_checksum_address(), str(k)) for k in keys]
+
+
+def create_participants(w3, funder, n):
+    """n fresh funded accounts: list of (address, private key)."""
+    accounts = []
+    for _ in range(n):
+        acct = w3.eth.account.create()
+        w3.provider.ethereum_tester.add_account(acct.key.hex())
+        w3.eth.send_transaction({"from": funder, "to": acct.address, "value": PARTICIPANT_FUNDING_WEI})
+        accounts.append((acct.address, acct.key))
+    return accounts
+
+
+# --- Participant data ---------------------------------------------------------
+
+def load_partitions(n_participants, rows_per_participant, seed=0):
+    """
+    Splits datasets/client_*.csv between the participants (participant i uses
+    file i % n_files). Each file is scaled once; when there are more participants
+    than disjoint windows, windows wrap around and overlap.
+    """
+    files = sorted(glob.glob(os.path.join(ROOT, "datasets", "client_*.csv")))
+    data = []
+    for path in files:
+        df = pd.read_csv(path)
+        X = StandardScaler().fit_transform(df.drop(["Churn", "customerID"], axis=1))
+        data.append((X, df["Churn"].to_numpy()))
+
+    rng = np.random.default_rng(seed)
+    partitions = []
+    for i in range(n_participants):
+        X, y = data[i % len(files)]
+        rows = min(rows_per_participant, len(X))
+        start = (i // len(files)) * rows % max(1, len(X) - rows + 1)
+        idx = rng.permutation(np.arange(start, start + rows))
+        split = int(rows * 0.8)
+        partitions.append((X[idx[:split]], y[idx[:split]], X[idx[split:]], y[idx[split:]]))
+    return partitions
+
+
+# --- Simulation ---------------------------------------------------------------
+
+def participant_round(ctx, i, round_num):
+    """
+    One participant round, as Train_Participant.train_and_automate does it.
+    ctx["delays"][i] (optional) is extra compute time of a slow device, in seconds.
+    Returns the contract round the hash was submitted to.
+    """
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from weights_format import encode_model, update_hash
+
+    stages, client, w3, contract = ctx["stages"], ctx["client"], ctx["w3"], ctx["contract"]
+    address, key = ctx["accounts"][i]
+    X_train, y_train, X_test, y_test = ctx["partitions"][i]
+
+    t0 = time.perf_counter()
+    res = client.get("/static/global_model.joblib")
+    global_model = joblib.load(io.BytesIO(res.content)) if res.status_code == 200 else None
+    t1 = time.perf_counter()
+    local_model = LogisticRegression(max_iter=1000, warm_start=True)
+    if global_model is not None:
+        local_model.coef_ = global_model.coef_
+        local_model.intercept_ = global_model.intercept_
+        local_model.classes_ = global_model.classes_
+    local_model.fit(X_train, y_train)
+    acc = float((local_model.predict(X_test) == y_test).mean())
+    if ctx.get("delays"):
+        time.sleep(ctx["delays"][i])
+    t2 = time.perf_counter()
+    base_round = getattr(global_model, "fl_round_", None)
+    payload = encode_model(local_model, n_samples=len(X_train),
+                           extra={"base_round": base_round} if base_round is not None else None)
+    model_hash = update_hash(payload)
+    t3 = time.perf_counter()
+    submitted_round = contract.functions.currentRound().call()
+    tx = contract.functions.submitUpdate(model_hash).build_transaction({
+        "from": address, "nonce": w3.eth.get_transaction_count(address, "pending"),
+        "gas": 200000, "gasPrice": w3.eth.gas_price,
+    })
+    w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx, key).raw_transaction)
+    t4 = time.perf_counter()
+    res = client.post("/upload", data={"participant_address": address, "accuracy": acc, "n_samples": len(X_train)},
+                      files={"file": ("update.flw", payload, "application/octet-stream")})
+    t5 = time.perf_counter()
+    res.raise_for_status()
+
+    for stage, seconds in (("download", t1 - t0), ("train", t2 - t1), ("hash", t3 - t2),
+                           ("submit", t4 - t3), ("upload", t5 - t4)):
+        stages.add(stage, seconds)
+    return submitted_round
+
+
+def bot_pass(ctx, bot, matcher, cursors, round_num):
+    """One coordinator_bot cycle (events, upload feed, mined payments, batched verification)."""
+    w3, contract, client = ctx["w3"], ctx["contract"], ctx["client"]
+    latest = w3.eth.block_number
+    if latest >= cursors["block"]:
+        for event in bot.fetch_contract_events(cursors["block"], latest, w3, contract):
+            if event["event"] == "HashSubmitted":
+                args = event["args"]
+                matcher.add_hash(args["round"], args["participant"], w3.to_hex(args["modelHash"]))
+        cursors["block"] = latest + 1
+    data = client.get("/uploads", params={"since": cursors["uploads"]}).json()
+    cursors["uploads"] = data["cursor"]
+    for u in data["uploads"]:
+        matcher.add_upload(u["round"], u["participant"], u["file"], u["hash"])
+
+    confirmed = bot.settle_payments(matcher)
+    ready = matcher.ready_for(round_num)
+    if not ready:
+        return len(confirmed)
+    items = [(addr, os.path.join("received_models", filename), file_hash)
+             for _, (addr, filename, file_hash) in ready]
+    t0 = time.perf_counter()
+    settled, paying = bot.verify_and_pay_batch(items, round_num)
+    ctx["stages"].add("verify", time.perf_counter() - t0)
+    settled, paying = set(settled), set(paying)
+    for key, (addr, _, _) in ready:
+        if addr in settled:
+            matcher.done(key)
+        elif addr in paying:
+            matcher.begin_payment(key)
+    return len(confirmed) + len(settled) + len(paying)
+
+
+def setup(args, stages):
+    """
+    Test chain with the contract deployed, server and bot wired to it (stage
+    timers installed), funded participants and their data partitions.
+    Returns (sc, bot, ctx); ctx is what participant_round and bot_pass need,
+    except the HTTP client.
+    """
+    abi, bytecode = compile_contract(args.artifact, args.solc_version)
+    w3, tester_accounts = start_chain()
+    coord_address, coord_key = tester_accounts[0]
+
+    # The modules read their configuration at import time
+    workdir = tempfile.mkdtemp(prefix="fl_federation_")
+    os.environ.update({"WALLET_ADDRESS": coord_address, "PRIVATE_KEY": coord_key,
+                       "CONTRACT_ADDRESS": "0x" + "11" * 20})
+    sc = load_server(workdir)
+    import coordinator_bot as bot
+    from tx_manager import TransactionManager
+
+    # Shared coordinator key: server (startNewRound) and bot (payments) use one nonce sequence
+    tx_manager = TransactionManager(w3, coord_address, coord_key, poll_interval=0.05)
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    receipt = tx_manager.send_and_wait(factory.constructor(), gas=3000000, label="deploy")
+    contract = w3.eth.contract(address=receipt["contractAddress"], abi=abi)
+    sc.web3, sc.contract, sc.tx_manager = w3, contract, tx_manager
+    bot.web3, bot.contract, bot.tx_manager = w3, contract, tx_manager
+    from contract_reads import ContractReader
+    sc.reader = ContractReader(contract)
+    bot.reader = ContractReader(contract, ttl=bot.reader.ttl)
+
+    sc.validate_upload = stages.wrap("validate", sc.validate_upload)
+    sc.fold_participant = stages.wrap("aggregate", sc.fold_participant)
+    sc.publish_global_model = stages.wrap("publish", sc.publish_global_model)
+    sc.evaluate_global_model = stages.wrap("evaluate", sc.evaluate_global_model)
+    sc.sync_blockchain_round = stages.wrap("round_switch", sc.sync_blockchain_round)
+
+    accounts = create_participants(w3, tester_accounts[1][0], args.participants)
+    partitions = load_partitions(args.participants, args.rows)
+    return sc, bot, {"stages": stages, "w3": w3, "contract": contract, "accounts": accounts,
+                     "partitions": partitions}
+
+
+def run(args):
+    stages = Stages()
+    t0 = time.perf_counter()
+    sc, bot, ctx = setup(args, stages)
+    w3, contract = ctx["w3"], ctx["contract"]
+    setup_s = time.perf_counter() - t0
+
+    from fastapi.testclient import TestClient
+    results = {"participants": args.participants, "rounds": [], "setup_s": setup_s}
+    with TestClient(sc.app) as client:
+        bot.notify_server = lambda addr, current_round, timeout=5: client.post(
+            "/webhook/verify_contribution", json={"participant_address": addr, "round": current_round})
+        ctx["client"] = client
+        matcher = bot.UploadHashMatcher()
+        cursors = {"block": w3.eth.block_number + 1, "uploads": 0}
+        session_block = cursors["block"]
+
+        client.post("/control/start_auto", params={"rounds": args.rounds, "participants": args.participants})
+        session_t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            while sc.state["training_active"]:
+                round_num = sc.state["current_round"]
+                round_t0 = time.perf_counter()
+                for f in [pool.submit(participant_round, ctx, i, round_num) for i in range(args.participants)]:
+                    f.result()
+                uploaded_s = time.perf_counter() - round_t0
+
+                deadline = time.perf_counter() + args.round_timeout
+                while not sc.state.is_aggregated(round_num):
+                    if time.perf_counter() > deadline:
+                        raise TimeoutError(f"Round {round_num} not aggregated after {args.round_timeout}s")
+                    if not bot_pass(ctx, bot, matcher, cursors, round_num):
+                        time.sleep(0.01)
+                while sc.round_queue.depth:
+                    time.sleep(0.01)
+                matcher.prune(round_num + 1)
+
+                global_entry = sc.state.query(round_min=round_num, round_max=round_num,
+                                              participant=sc.GLOBAL_PARTICIPANT)[0]
+                results["rounds"].append({
+                    "round": round_num,
+                    "wall_s": time.perf_counter() - round_t0,
+                    "uploads_done_s": uploaded_s,
+                    "global_accuracy": global_entry[-1]["accuracy"] if global_entry else None,
+                })
+        session_s = time.perf_counter() - session_t0
+
+    # Last payments are settled asynchronously by the transaction manager; the log
+    # scan (slow on the test chain) runs once they are all mined
+    updates = args.participants * len(results["rounds"])
+    deadline = time.perf_counter() + 60
+    while sc.tx_manager.pending and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    paid = contract.events.RewardPaid().get_logs(from_block=session_block)
+    results.update({
+        "session_s": session_s,
+        "throughput": {"rounds_per_min": 60 * len(results["rounds"]) / session_s,
+                       "updates_per_s": updates / session_s},
+        "rewards_paid": len(paid),
+        "bot_contract_reads": dict(bot.reader.stats),
+        "peak_rss_mb": peak_memory_mb(),
+        "stages": stages.report(),
+        "chain": {"blocks": w3.eth.block_number, "contract": contract.address},
+    })
+    assert len(paid) == updates, f"{len(paid)} rewards paid for {updates} updates"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=120, help="Rows of client data per participant")
+    parser.add_argument("--concurrency", type=int, default=8, help="Participants running at the same time")
+    parser.add_argument("--round-timeout", type=float, default=600)
+    parser.add_argument("--artifact", help="Compiled contract JSON (default build/AICollaboration.json)")
+    parser.add_argument("--solc-version", help="Compile AICollaboration.sol with this solc instead")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    # Server and bot logs go to stderr so that --json output stays parseable
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.participants} participants | {len(results['rounds'])} rounds | setup {results['setup_s']:.1f}s")
+    for r in results["rounds"]:
+        print(f"round {r['round']}: {r['wall_s']:.2f}s (uploads done at {r['uploads_done_s']:.2f}s), "
+              f"global acc {r['global_accuracy']:.3f}")
+    t = results["throughput"]
+    print(f"throughput: {t['rounds_per_min']:.2f} rounds/min, {t['updates_per_s']:.1f} updates/s | "
+          f"rewards paid {results['rewards_paid']} | peak RSS {results['peak_rss_mb']} MB")
+    reads = results["bot_contract_reads"]
+    print(f"bot contract reads: {reads['hits'] + reads['misses']} ({reads['hits']} cached) in "
+          f"{reads['requests']} RPC requests ({reads['batches']} batches)")
+    for stage, p in results["stages"].items():
+        print(f"  {stage:<13} n={p['count']:<6} p50 {p['p50_ms']:8.2f} ms | p99 {p['p99_ms']:8.2f} ms | "
+              f"max {p['max_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: local training per round, sklearn LogisticRegression warm start (lbfgs,
+max_iter=1000, the previous participant fit) vs the NumPy mini-batch SGD trainer
+(local_training.py) for several local epoch counts and FedProx mu, FedAvg in process.
+
+Reports the mean local fit time per client and round, and the global accuracy
+reached (clients and server scaled with the federated scaler). --skew > 0 deals
+the rows out sorted by one feature, as in bench_feature_scaling.py.
+
+Usage (from the repository root):
+    python benchmarks/bench_local_training.py --participants 20 --rounds 20 --skew 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from aggregators import WeightedFedAvg  # noqa: E402
+from bench_feature_scaling import load_partitions  # noqa: E402
+from evaluation import EvaluationEngine  # noqa: E402
+from feature_stats import DROP_COLUMNS, local_stats, merge_stats, scaler_from_stats  # noqa: E402
+from local_training import make_trainer, train_local  # noqa: E402
+
+CONFIGS = [
+    ("lbfgs", {}),
+    ("sgd", {"epochs": 1}),
+    ("sgd", {"epochs": 5}),
+    ("sgd", {"epochs": 5, "mu": 0.1}),
+    ("sgd", {"epochs": 20}),
+]
+
+
+def run(client_data, engine, kind, params, rounds, target, seed):
+    weights = np.array([len(y) for _, y in client_data], dtype=np.float64)
+    fedavg = WeightedFedAvg()
+    global_weights = None
+    curve, reached, fit_seconds = [], None, 0.0
+    for round_num in range(1, rounds + 1):
+        updates = []
+        for i, (X, y) in enumerate(client_data):
+            model = make_trainer(kind, **params, seed=seed + 1000 * round_num + i)  # seed ignored by lbfgs
+            t0 = time.perf_counter()
+            train_local(model, X, y, global_weights)
+            fit_seconds += time.perf_counter() - t0
+            updates.append(np.concatenate([model.coef_.ravel(), model.intercept_]))
+        flat = fedavg.aggregate(np.vstack(updates), weights)
+        global_weights = (flat[:-1].reshape(1, -1), flat[-1:], np.array([0, 1]))
+        accuracy = engine.evaluate(*global_weights)["accuracy"]
+        curve.append(accuracy)
+        if reached is None and accuracy >= target:
+            reached = round_num
+    label = kind + "".join(f" {k}={v}" for k, v in params.items())
+    return {"trainer": label, "fit_ms": 1000 * fit_seconds / (rounds * len(client_data)),
+            "rounds_to_target": reached, "final_accuracy": curve[-1], "best_accuracy": max(curve), "curve": curve}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--skew", type=float, default=1.0, help="0 = IID split, 1 = sorted by --sort-by")
+    parser.add_argument("--sort-by", default="tenure")
+    parser.add_argument("--target-accuracy", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    partitions = load_partitions(args.participants, args.skew, args.sort_by, args.seed)
+    scaler = scaler_from_stats(merge_stats(local_stats(X) for X, _ in partitions))
+    client_data = [(np.ascontiguousarray(scaler.transform(X)), y) for X, y in partitions]
+    server = pd.read_csv(os.path.join(ROOT, "datasets", "server_test.csv"))
+    engine = EvaluationEngine(scaler.transform(server.drop(DROP_COLUMNS, axis=1)), server["Churn"].to_numpy())
+
+    results = [run(client_data, engine, kind, params, args.rounds, args.target_accuracy, args.seed)
+               for kind, params in CONFIGS]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results[0]["fit_ms"]
+    print(f"{args.participants} participants | {args.rounds} rounds | skew {args.skew} ({args.sort_by}) | "
+          f"target {args.target_accuracy}")
+    for r in results:
+        rounds = r["rounds_to_target"] if r["rounds_to_target"] is not None else f"> {args.rounds}"
+        print(f"{r['trainer']:<20} | fit {r['fit_ms']:7.2f} ms/client ({baseline / r['fit_ms']:5.1f}x) | "
+              f"rounds to target: {rounds:>5} | final acc {r['final_accuracy']:.3f} | best {r['best_accuracy']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: on-chain cost of a round, per-participant transactions (submitUpdate
++ validateAndPayMany, COMMIT_MODE=tx) vs one Merkle root per round (commitRoot +
+one claimReward per participant, COMMIT_MODE=merkle), on an in-process test
+chain (eth-tester) with AICollaboration deployed.
+
+Reports gas and transaction counts per round: in total, paid by the coordinator,
+paid by each participant, and on the round's critical path (transactions that
+must be mined before the next round can start; claims happen later, off it).
+
+Requires eth-tester[py-evm]. The contract is build/AICollaboration.json by default;
+its "compiler" field says whether it was built from the .sol or the Vyper port, whose
+gas differs slightly: pass --solc-version to measure AICollaboration.sol itself.
+
+Usage (from the repository root):
+    python benchmarks/bench_merkle_commit.py --participants 100 --rounds 3
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_federation import compile_contract, create_participants, start_chain  # noqa: E402
+from bench_upload_latency import ROOT  # noqa: E402
+
+sys.path.insert(0, ROOT)
+from merkle_commit import build_round_commit, verify_claim  # noqa: E402
+
+REWARD_WEI = 10 ** 13  # Per participant, as coordinator_bot.REWARD_WEI
+
+
+def gas_of(w3, tx_hash):
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    if receipt["status"] != 1:
+        raise RuntimeError(f"transaction reverted ({w3.to_hex(tx_hash)})")
+    return receipt["gasUsed"]
+
+
+def legacy_round(w3, contract, coordinator, accounts, hashes, batch_size):
+    """tx mode: every participant anchors its hash, the bot pays them in batches."""
+    submit = [gas_of(w3, contract.functions.submitUpdate(h).transact({"from": addr}))
+              for (addr, _), h in zip(accounts, hashes)]
+    pay = []
+    for start in range(0, len(accounts), batch_size):
+        batch = [addr for addr, _ in accounts[start:start + batch_size]]
+        pay.append(gas_of(w3, contract.functions.validateAndPayMany(batch).transact(
+            {"from": coordinator, "value": REWARD_WEI * len(batch)})))
+    return {"participant_gas": submit, "coordinator_gas": pay, "critical_txs": len(submit) + len(pay)}
+
+
+def merkle_round(w3, contract, coordinator, accounts, hashes, round_num):
+    """merkle mode: one funded root, then every participant claims with its proof."""
+    commit = build_round_commit(round_num, {addr: h for (addr, _), h in zip(accounts, hashes)})
+    root = gas_of(w3, contract.functions.commitRoot(round_num, commit["root"], commit["count"]).transact(
+        {"from": coordinator, "value": REWARD_WEI * commit["count"]}))
+    claims = []
+    for addr, _ in accounts:
+        claim = commit["proofs"][addr]
+        assert verify_claim(claim)
+        claims.append(gas_of(w3, contract.functions.claimReward(
+            round_num, claim["index"], addr, claim["model_hash"], claim["proof"]).transact({"from": addr})))
+    return {"participant_gas": claims, "coordinator_gas": [root], "critical_txs": 1}
+
+
+def deploy(w3, abi, bytecode, coordinator):
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact({"from": coordinator}))
+    return w3.eth.contract(address=receipt["contractAddress"], abi=abi)
+
+
+def run(mode, w3, abi, bytecode, coordinator, accounts, rounds, batch_size, seed):
+    contract = deploy(w3, abi, bytecode, coordinator)
+    rng = np.random.default_rng(seed)
+    per_round = []
+    for _ in range(rounds):
+        switch = gas_of(w3, contract.functions.startNewRound().transact({"from": coordinator}))
+        round_num = contract.functions.currentRound().call()
+        hashes = ["0x" + rng.bytes(32).hex() for _ in accounts]
+        if mode == "tx":
+            result = legacy_round(w3, contract, coordinator, accounts, hashes, batch_size)
+        else:
+            result = merkle_round(w3, contract, coordinator, accounts, hashes, round_num)
+        result["coordinator_gas"].append(switch)
+        per_round.append(result)
+
+    def mean(key, fn):
+        return float(np.mean([fn(r[key]) for r in per_round]))
+
+    return {
+        "mode": mode,
+        "txs_per_round": mean("participant_gas", len) + mean("coordinator_gas", len),
+        "critical_txs_per_round": float(np.mean([r["critical_txs"] for r in per_round])) + 1,  # + startNewRound
+        "gas_per_round": mean("participant_gas", sum) + mean("coordinator_gas", sum),
+        "coordinator_gas_per_round": mean("coordinator_gas", sum),
+        "participant_gas": mean("participant_gas", np.mean),
+        "participant_gas_max": mean("participant_gas", max),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=50, help="Participants per validateAndPayMany (bot)")
+    parser.add_argument("--artifact", help="Compiled contract JSON (default build/AICollaboration.json)")
+    parser.add_argument("--solc-version", help="Compile AICollaboration.sol with this solc instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    abi, bytecode = compile_contract(args.artifact, args.solc_version)
+    w3, tester_accounts = start_chain()
+    coordinator = tester_accounts[0][0]
+    accounts = create_participants(w3, tester_accounts[1][0], args.participants)
+    results = [run(mode, w3, abi, bytecode, coordinator, accounts, args.rounds, args.batch_size, args.seed)
+               for mode in ("tx", "merkle")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.participants} participants | {args.rounds} rounds | payment batches of {args.batch_size}")
+    baseline = results[0]["gas_per_round"]
+    for r in results:
+        print(f"{r['mode']:<6} | {r['txs_per_round']:6.0f} txs/round ({r['critical_txs_per_round']:4.0f} on the "
+              f"critical path) | {r['gas_per_round'] / 1e6:7.3f} Mgas/round ({baseline / r['gas_per_round']:4.2f}x) | "
+              f"coordinator {r['coordinator_gas_per_round'] / 1e3:8.1f} kgas | "
+              f"participant {r['participant_gas'] / 1e3:5.1f} kgas (max {r['participant_gas_max'] / 1e3:5.1f})")
+
+
+if __name__ == "__main__":
+    main()
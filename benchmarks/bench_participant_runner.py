@@ -0,0 +1,95 @@
+"""
+Benchmark: local training of many hosted clients, Train_Participant style (read
+CSV, scale and fit per client, sequentially) vs participant_runner (datasets
+cached per worker, training in a process pool) for several pool sizes.
+
+Expected: one worker already beats the baseline (no CSV parse per round); each
+extra worker should then divide the round time up to os.cpu_count() (one BLAS
+thread per worker), so the expected speedup is x(1 worker) * min(workers, CPUs).
+Pools larger than the CPU count only add overhead. Pool sizes default to powers
+of two up to os.cpu_count().
+
+Usage (from the repository root):
+    python benchmarks/bench_participant_runner.py --clients 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from participant_runner import _init_worker, train_client  # noqa: E402
+
+DATASETS = [os.path.join(ROOT, "datasets", f"client_{c}.csv") for c in "ABCD"]
+
+
+def baseline_client(dataset, rows):
+    """Previous per-round work of Train_Participant.py."""
+    df = pd.read_csv(dataset).head(rows)
+    X = StandardScaler().fit_transform(df.drop(['Churn', 'customerID'], axis=1))
+    X_train, X_test, y_train, y_test = train_test_split(X, df['Churn'], test_size=0.2)
+    LogisticRegression(max_iter=1000, warm_start=True).fit(X_train, y_train)
+
+
+def run_pool(workers, jobs, rounds):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        list(pool.map(train_client, *zip(*jobs)))  # Warm-up: worker start and dataset cache
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            list(pool.map(train_client, *zip(*jobs), chunksize=max(1, len(jobs) // (4 * workers))))
+        return (time.perf_counter() - t0) / rounds
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    return sorted({2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus} | {cpus})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=600)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers(),
+                        help="Pool sizes (default: powers of two up to the CPU count)")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    jobs = [(DATASETS[i % len(DATASETS)], args.rows, i, None) for i in range(args.clients)]
+
+    t0 = time.perf_counter()
+    for dataset, rows, _, _ in jobs:
+        baseline_client(dataset, rows)
+    baseline = time.perf_counter() - t0
+
+    cpus = os.cpu_count() or 1
+    results = {"clients": args.clients, "rows": args.rows, "cpu_count": cpus,
+               "baseline_round_s": baseline, "runner": []}
+    single_s = None
+    for workers in sorted(set(args.workers)):
+        round_s = run_pool(workers, jobs, args.rounds)
+        single_s = single_s or round_s * min(workers, cpus)  # Smallest pool, scaled back to one worker
+        results["runner"].append({"workers": workers, "round_s": round_s,
+                                  "clients_per_s": args.clients / round_s,
+                                  "speedup": baseline / round_s,
+                                  "expected_speedup": baseline / single_s * min(workers, cpus)})
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"baseline (sequential, CSV per round): {baseline:.2f}s per round | {cpus} CPU(s)")
+    for r in results["runner"]:
+        print(f"runner {r['workers']:>2} worker(s): {r['round_s']:.2f}s per round | "
+              f"{r['clients_per_s']:.0f} clients/s | x{r['speedup']:.1f} (expected x{r['expected_speedup']:.1f})"
+              + (" | more workers than CPUs" if r["workers"] > cpus else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: re-scoring a training history, one joblib.load + calculate_metrics per
+stored model (previous approach) vs replay.py (all weights stacked, one
+vectorized pass per test set), on a synthetic history of --rounds global models
+and --participants updates per round.
+
+Usage (from the repository root):
+    python benchmarks/bench_replay.py --rounds 200 --participants 20 --test-sets 3
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from evaluation import EvaluationEngine  # noqa: E402
+from feature_stats import DROP_COLUMNS  # noqa: E402
+from model_store import GLOBAL_OWNER, ModelStore  # noqa: E402
+from replay import load_models, replay  # noqa: E402
+from weights_format import encode_update, load_any  # noqa: E402
+
+
+def build_history(root, rounds, participants, n_features, seed):
+    """Global models (joblib) and participant updates (.flw) in two model stores."""
+    rng = np.random.default_rng(seed)
+    history = ModelStore(os.path.join(root, "history"))
+    uploads = ModelStore(os.path.join(root, "uploads"))
+    for r in range(1, rounds + 1):
+        model = LogisticRegression()
+        model.coef_, model.intercept_, model.classes_ = rng.normal(size=(1, n_features)), rng.normal(size=1), \
+            np.array([0, 1])
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        history.put(r, GLOBAL_OWNER, buffer.getvalue(), ".joblib")
+        for p in range(participants):
+            payload = encode_update(rng.normal(size=(1, n_features)), rng.normal(size=1), [0, 1], n_samples=100)
+            uploads.put(r, f"0x{p:040x}", payload, ".flw")
+    history.close()
+    uploads.close()
+    return history.root, uploads.root
+
+
+def baseline(history_root, uploads_root, test_sets):
+    """Previous approach: every stored model loaded and evaluated on its own."""
+    history, uploads = ModelStore(history_root), ModelStore(uploads_root)
+    paths = [history.path(e["round"], e["owner"]) for e in history.entries()]
+    paths += [uploads.path(e["round"], e["owner"]) for e in uploads.entries()]
+    engines = [EvaluationEngine(X, y, cache_size=0) for X, y in test_sets.values()]
+    for path in paths:
+        update = load_any(path, allow_pickle=True)  # Global history is stored as joblib
+        for engine in engines:
+            engine.evaluate(update.coef, update.intercept, update.classes)
+    return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--participants", type=int, default=20, help="Updates per round")
+    parser.add_argument("--test-sets", type=int, default=3, help="Copies of the server test set (resampled)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    df = pd.read_csv(os.path.join(ROOT, "datasets", "server_test.csv"))
+    rng = np.random.default_rng(args.seed)
+    X_all, y_all = df.drop(DROP_COLUMNS, axis=1).to_numpy(dtype=np.float64), df["Churn"].to_numpy()
+    X_all = (X_all - X_all.mean(axis=0)) / np.where(X_all.std(axis=0) > 0, X_all.std(axis=0), 1.0)
+    test_sets = {}
+    for t in range(args.test_sets):
+        idx = rng.choice(len(y_all), len(y_all))
+        test_sets[f"test_{t}"] = (X_all[idx], y_all[idx])
+
+    with tempfile.TemporaryDirectory() as root:
+        history_root, uploads_root = build_history(root, args.rounds, args.participants, X_all.shape[1], args.seed)
+
+        t0 = time.perf_counter()
+        n_models = baseline(history_root, uploads_root, test_sets)
+        baseline_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        models, _ = load_models(history_root, uploads_root, participants=True)
+        t1 = time.perf_counter()
+        columns = replay(models, test_sets)
+        t2 = time.perf_counter()
+
+    result = {"models": n_models, "test_sets": args.test_sets, "rows": len(columns["round"]),
+              "baseline_s": baseline_s, "replay_load_s": t1 - t0, "replay_eval_s": t2 - t1,
+              "speedup": baseline_s / (t2 - t0)}
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{n_models} models ({args.rounds} rounds × (1 + {args.participants})) × {args.test_sets} test sets")
+    print(f"per model (load + evaluate)  : {baseline_s:.2f}s")
+    print(f"replay (load + stacked eval) : {t2 - t0:.2f}s (load {t1 - t0:.2f}s, evaluation {1000 * (t2 - t1):.1f} ms)"
+          f" | x{result['speedup']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
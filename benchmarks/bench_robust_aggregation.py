@@ -0,0 +1,90 @@
+"""
+Benchmark: time and peak memory of the aggregation rules (aggregators.py) over
+stacked updates, for several participant counts and feature dimensions, with a
+naive broadcast Krum (O(n^2 * d) memory) as reference where it fits in memory.
+
+Usage (from the repository root):
+    python benchmarks/bench_robust_aggregation.py --participants 100 500 2000 --features 19 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aggregators import make_aggregator  # noqa: E402
+
+RULES = [
+    ("fedavg", {}),
+    ("trimmed_mean", {"trim_ratio": 0.1}),
+    ("median", {}),
+    ("krum", {"byzantine": 1}),
+    ("multi_krum", {"byzantine": 1}),
+]
+
+
+def naive_krum(updates, byzantine):
+    """Reference: every pairwise difference materialized at once."""
+    n = updates.shape[0]
+    dist = ((updates[:, None, :] - updates[None, :, :]) ** 2).sum(axis=2)
+    np.fill_diagonal(dist, np.inf)
+    scores = np.sort(dist, axis=1)[:, :n - byzantine - 2].sum(axis=1)
+    return updates[np.argmin(scores)]
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--features", type=int, nargs="+", default=[19, 10000])
+    parser.add_argument("--naive-max-mb", type=float, default=1024,
+                        help="Skip the naive Krum when its n^2 * d temporary exceeds this size")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    for d in args.features:
+        for n in args.participants:
+            # A round's updates: close to each other, a few of them far off
+            updates = rng.normal(size=(1, d)) + rng.normal(scale=0.01, size=(n, d))
+            updates[:max(1, n // 100)] += 1.0
+            weights = rng.integers(100, 1000, size=n).astype(np.float64)
+            input_bytes = updates.nbytes
+            for name, params in RULES:
+                rule = make_aggregator(name, **params)
+                out, elapsed, peak = measure(rule.aggregate, updates, weights)
+                results.append({"rule": name, "participants": n, "features": d, "seconds": elapsed,
+                                "peak_bytes": peak, "input_bytes": input_bytes})
+                if name == "krum":
+                    krum_out = out
+            if n * n * d * 8 <= args.naive_max_mb * 1e6:
+                ref, elapsed, peak = measure(naive_krum, updates, 1)
+                assert np.allclose(ref, krum_out)
+                results.append({"rule": "krum (naive)", "participants": n, "features": d, "seconds": elapsed,
+                                "peak_bytes": peak, "input_bytes": input_bytes})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'rule':<14} {'N':>6} {'d':>7} | {'time (s)':>9} | {'peak':>10} | {'input':>10}")
+    for r in results:
+        print(f"{r['rule']:<14} {r['participants']:>6} {r['features']:>7} | {r['seconds']:>9.3f} | "
+              f"{r['peak_bytes'] / 1e6:>8.1f}MB | {r['input_bytes'] / 1e6:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: upload + validate + aggregate throughput of the .flw binary update
+format against the previous pickled joblib path.
+
+Usage:
+    python benchmarks/bench_update_format.py --participants 500 --features 19
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agreggate import accumulate_files  # noqa: E402
+from weights_format import decode_update, encode_model, update_hash  # noqa: E402
+
+
+def make_model(rng, n_features):
+    m = LogisticRegression()
+    m.coef_ = rng.normal(size=(1, n_features))
+    m.intercept_ = rng.normal(size=(1,))
+    m.classes_ = np.array([0, 1])
+    m.n_iter_ = np.array([10])
+    m.n_features_in_ = n_features
+    return m
+
+
+def joblib_payload(model):
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.getvalue()
+
+
+def run_joblib(folder, payloads):
+    """Previous server path: write, joblib.load to validate, joblib.load again to aggregate."""
+    paths = []
+    for i, data in enumerate(payloads):
+        path = os.path.join(folder, f"round_1_{i}.joblib")
+        with open(path, "wb") as f:
+            f.write(data)
+        update_hash(data)
+        joblib.load(path)
+        paths.append(path)
+    return accumulate_files(paths, allow_pickle=True).result()
+
+
+def run_binary(folder, payloads):
+    """New server path: write, decode from the in-memory buffer, aggregate from mmap."""
+    paths, counts = [], []
+    for i, data in enumerate(payloads):
+        path = os.path.join(folder, f"round_1_{i}.flw")
+        with open(path, "wb") as f:
+            f.write(data)
+        update_hash(data)
+        counts.append(decode_update(data).n_samples)
+        paths.append(path)
+    return accumulate_files(paths, sample_counts=counts).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=500)
+    parser.add_argument("--features", type=int, default=19)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    models = [make_model(rng, args.features) for _ in range(args.participants)]
+    pickled = [joblib_payload(m) for m in models]
+    binary = [encode_model(m, n_samples=480, dtype=np.float64) for m in models]
+
+    results = {"participants": args.participants, "features": args.features}
+    for name, fn, payloads in (("joblib", run_joblib, pickled), ("flw", run_binary, binary)):
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            fn(tmp, payloads)
+            elapsed = time.perf_counter() - t0
+        results[name] = {
+            "seconds": elapsed,
+            "updates_per_s": args.participants / elapsed,
+            "bytes_per_update": int(np.mean([len(p) for p in payloads])),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name in ("joblib", "flw"):
+        r = results[name]
+        print(f"{name:>7}: {r['seconds']:.3f}s  {r['updates_per_s']:.0f} updates/s  {r['bytes_per_update']} B/update")
+
+
+if __name__ == "__main__":
+    main()
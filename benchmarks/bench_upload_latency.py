@@ -0,0 +1,118 @@
+"""
+Load test: N concurrent simulated participants upload to server_coordinator.app
+(in-process, through httpx's ASGI transport) over several rounds. The blockchain
+round switch is replaced by a stand-in that blocks for --chain-delay seconds.
+Upload latency percentiles are reported with and without that delay; they should
+not depend on it since aggregation and chain sync run on the round worker.
+
+Usage (from the repository root):
+    python benchmarks/bench_upload_latency.py --participants 200 --rounds 3 --chain-delay 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_server(workdir):
+    """Imports the server with its working directories inside workdir."""
+    os.chdir(workdir)
+    os.symlink(os.path.join(ROOT, "datasets"), os.path.join(workdir, "datasets"))
+    sys.path.insert(0, ROOT)
+    import server_coordinator
+    return server_coordinator
+
+
+# Shared by every session: the contract round never goes back
+_chain = {"round": 0}
+
+
+def chain_stand_in(delay):
+    def sync_blockchain_round():
+        time.sleep(delay)  # Blocks like wait_for_transaction_receipt
+        _chain["round"] += 1
+        return _chain["round"]
+    return sync_blockchain_round
+
+
+def percentiles(values):
+    arr = np.asarray(values) * 1000
+    return {"count": len(arr), "p50_ms": float(np.percentile(arr, 50)),
+            "p99_ms": float(np.percentile(arr, 99)), "max_ms": float(arr.max())}
+
+
+async def run_session(sc, n_participants, rounds, chain_delay, payloads):
+    import httpx
+
+    sc.sync_blockchain_round = chain_stand_in(chain_delay)
+    latencies = []
+    transport = httpx.ASGITransport(app=sc.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await client.post("/control/start_auto", params={"rounds": rounds, "participants": n_participants})
+        first_round = sc.state["current_round"]
+        last_round = first_round + rounds - 1
+
+        async def participant(i):
+            addr = f"0x{i + 1:040x}"
+            done_round = first_round - 1
+            while sc.state["training_active"] and done_round < last_round:
+                r = sc.state["current_round"]
+                if r == done_round:
+                    await asyncio.sleep(0.005)
+                    continue
+                t0 = time.perf_counter()
+                res = await client.post("/upload", data={"participant_address": addr, "accuracy": 0.5},
+                                        files={"file": ("update.flw", payloads[i])})
+                latencies.append(time.perf_counter() - t0)
+                if res.status_code == 200:
+                    await client.post("/webhook/verify_contribution",
+                                      json={"participant_address": addr, "round": r})
+                done_round = r
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(participant(i) for i in range(n_participants)))
+        elapsed = time.perf_counter() - t0
+        while sc.round_queue.depth:
+            await asyncio.sleep(0.01)
+    return {"chain_delay_s": chain_delay, "wall_s": elapsed, "upload": percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--participants", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--chain-delay", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fl_bench_")
+    sc = load_server(workdir)
+    from weights_format import encode_update
+
+    rng = np.random.default_rng(0)
+    n_features = sc.X_global_test.shape[1]
+    payloads = [encode_update(rng.normal(size=(1, n_features)), [0.0], [0, 1], n_samples=480)
+                for _ in range(args.participants)]
+
+    results = [asyncio.run(run_session(sc, args.participants, args.rounds, delay, payloads))
+               for delay in (0.0, args.chain_delay)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        u = r["upload"]
+        print(f"chain delay {r['chain_delay_s']:.1f}s | {u['count']} uploads | "
+              f"p50 {u['p50_ms']:.1f} ms | p99 {u['p99_ms']:.1f} ms | max {u['max_ms']:.1f} ms | "
+              f"wall {r['wall_s']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
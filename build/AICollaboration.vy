@@ -0,0 +1,176 @@
+# pragma version ^0.4.0
+"""
+@title AICollaboration (Vyper port)
+@notice Same storage, ABI, events and revert messages as AICollaboration.sol, which
+        stays the reference: this port only exists to build build/AICollaboration.json
+        where no solc is available (see build_contract.py). Vyper arrays are bounded:
+        validateAndPayMany takes at most 256 addresses and proofs at most 64 siblings.
+"""
+struct Contribution:
+    modelHash: bytes32
+    isValidated: bool
+    isPaid: bool
+
+coordinator: public(address)
+globalModelHash: public(bytes32)
+currentRound: public(uint256)
+trainingActive: public(bool)
+contributions: public(HashMap[uint256, HashMap[address, Contribution]])
+
+struct RoundCommit:
+    root: bytes32
+    reward: uint128
+    leafCount: uint64
+    claimed: uint64
+    claimDeadline: uint64
+
+CLAIM_WINDOW: public(constant(uint256)) = 30 * 86400
+
+roundCommits: public(HashMap[uint256, RoundCommit])
+claimedBitmap: HashMap[uint256, HashMap[uint256, uint256]]
+
+event HashSubmitted:
+    round: indexed(uint256)
+    participant: indexed(address)
+    modelHash: bytes32
+event RewardPaid:
+    round: indexed(uint256)
+    participant: indexed(address)
+    amount: uint256
+event PaymentSkipped:
+    round: indexed(uint256)
+    participant: indexed(address)
+event TrainingStarted:
+    round: uint256
+event TrainingFinished:
+    round: uint256
+event RootCommitted:
+    round: indexed(uint256)
+    root: bytes32
+    leafCount: uint256
+    reward: uint256
+event UnclaimedSwept:
+    round: indexed(uint256)
+    leaves: uint256
+    amount: uint256
+
+@deploy
+def __init__():
+    self.coordinator = msg.sender
+
+@internal
+@view
+def _onlyCoordinator():
+    assert msg.sender == self.coordinator, "Seul le coordinateur peut faire cela"
+
+@external
+def startNewRound():
+    self._onlyCoordinator()
+    self.currentRound += 1
+    self.trainingActive = True
+    log TrainingStarted(round=self.currentRound)
+
+@external
+def stopTraining():
+    self._onlyCoordinator()
+    self.trainingActive = False
+    log TrainingFinished(round=self.currentRound)
+
+@external
+def submitUpdate(_modelHash: bytes32):
+    assert self.trainingActive, "L'entrainement n'est pas actif actuellement"
+    assert _modelHash != empty(bytes32), "Hash invalide"
+    self.contributions[self.currentRound][msg.sender] = Contribution(modelHash=_modelHash, isValidated=False, isPaid=False)
+    log HashSubmitted(round=self.currentRound, participant=msg.sender, modelHash=_modelHash)
+
+@internal
+def _pay(p: address, amount: uint256):
+    c: Contribution = self.contributions[self.currentRound][p]
+    assert c.modelHash != empty(bytes32), "Aucune contribution trouvee"
+    assert not c.isPaid, "Deja paye"
+    self.contributions[self.currentRound][p] = Contribution(modelHash=c.modelHash, isValidated=True, isPaid=True)
+    assert raw_call(p, b"", value=amount, revert_on_failure=False), "Echec transfert"
+    log RewardPaid(round=self.currentRound, participant=p, amount=amount)
+
+@external
+@payable
+def validateAndPay(_participant: address):
+    self._onlyCoordinator()
+    self._pay(_participant, msg.value)
+
+@external
+@payable
+def validateAndPayMany(_participants: DynArray[address, 256]):
+    self._onlyCoordinator()
+    n: uint256 = len(_participants)
+    assert n > 0, "Liste vide"
+    assert msg.value % n == 0, "Montant non divisible"
+    reward: uint256 = msg.value // n
+    refund: uint256 = 0
+    for p: address in _participants:
+        c: Contribution = self.contributions[self.currentRound][p]
+        if c.modelHash == empty(bytes32) or c.isPaid:
+            refund += reward
+            log PaymentSkipped(round=self.currentRound, participant=p)
+            continue
+        self.contributions[self.currentRound][p] = Contribution(modelHash=c.modelHash, isValidated=True, isPaid=True)
+        if not raw_call(p, b"", value=reward, revert_on_failure=False):
+            self.contributions[self.currentRound][p] = c
+            refund += reward
+            log PaymentSkipped(round=self.currentRound, participant=p)
+            continue
+        log RewardPaid(round=self.currentRound, participant=p, amount=reward)
+    if refund > 0:
+        assert raw_call(msg.sender, b"", value=refund, revert_on_failure=False), "Echec remboursement"
+
+@external
+@payable
+def commitRoot(_round: uint256, _root: bytes32, _leafCount: uint64):
+    self._onlyCoordinator()
+    assert _round > 0 and _round <= self.currentRound, "Round invalide"
+    assert self.roundCommits[_round].root == empty(bytes32), "Racine deja publiee"
+    assert _root != empty(bytes32) and _leafCount > 0, "Racine invalide"
+    assert msg.value % convert(_leafCount, uint256) == 0, "Montant non divisible"
+    reward: uint256 = msg.value // convert(_leafCount, uint256)
+    self.roundCommits[_round] = RoundCommit(root=_root, reward=convert(reward, uint128), leafCount=_leafCount, claimed=0,
+                                            claimDeadline=convert(block.timestamp + CLAIM_WINDOW, uint64))
+    log RootCommitted(round=_round, root=_root, leafCount=convert(_leafCount, uint256), reward=reward)
+
+@external
+@view
+def isClaimed(_round: uint256, _index: uint256) -> bool:
+    return (self.claimedBitmap[_round][_index >> 8] >> (_index & 255)) & 1 == 1
+
+@external
+def claimReward(_round: uint256, _index: uint256, _participant: address, _modelHash: bytes32, _proof: DynArray[bytes32, 64]):
+    rc: RoundCommit = self.roundCommits[_round]
+    assert rc.root != empty(bytes32), "Aucune racine pour ce round"
+    assert _index < convert(rc.leafCount, uint256), "Index invalide"
+    assert block.timestamp <= convert(rc.claimDeadline, uint256), "Delai de reclamation expire"
+    word: uint256 = self.claimedBitmap[_round][_index >> 8]
+    bit: uint256 = 1 << (_index & 255)
+    assert word & bit == 0, "Deja paye"
+    node: bytes32 = keccak256(concat(convert(_round, bytes32), convert(_index, bytes32), convert(_participant, bytes20), _modelHash))
+    for sibling: bytes32 in _proof:
+        if convert(node, uint256) < convert(sibling, uint256):
+            node = keccak256(concat(node, sibling))
+        else:
+            node = keccak256(concat(sibling, node))
+    assert node == rc.root, "Preuve invalide"
+    self.claimedBitmap[_round][_index >> 8] = word | bit
+    self.roundCommits[_round].claimed = rc.claimed + 1
+    assert raw_call(_participant, b"", value=convert(rc.reward, uint256), revert_on_failure=False), "Echec transfert"
+    log RewardPaid(round=_round, participant=_participant, amount=convert(rc.reward, uint256))
+
+@external
+def sweepUnclaimed(_round: uint256):
+    self._onlyCoordinator()
+    rc: RoundCommit = self.roundCommits[_round]
+    assert rc.root != empty(bytes32), "Aucune racine pour ce round"
+    assert block.timestamp > convert(rc.claimDeadline, uint256), "Delai de reclamation en cours"
+    assert rc.claimed < rc.leafCount, "Rien a recuperer"
+    leaves: uint256 = convert(rc.leafCount - rc.claimed, uint256)
+    amount: uint256 = leaves * convert(rc.reward, uint256)
+    self.roundCommits[_round].claimed = rc.leafCount
+    assert raw_call(msg.sender, b"", value=amount, revert_on_failure=False), "Echec transfert"
+    log UnclaimedSwept(round=_round, leaves=leaves, amount=amount)
@@ -0,0 +1,67 @@
+"""
+Builds build/AICollaboration.json ({"abi": [...], "bytecode": "0x...", ...}), the
+compiled contract loaded by tests/test_chain.py and benchmarks/bench_federation.py.
+
+AICollaboration.sol is the reference and is compiled with py-solc-x when a solc is
+installed (or can be downloaded). Otherwise --vyper compiles build/AICollaboration.vy,
+a line-for-line port with the same storage, ABI, events and revert messages (vyper
+is on PyPI, solc binaries are not). Rebuild after any change to the contract:
+
+    python build_contract.py            # solc
+    python build_contract.py --vyper    # no solc available
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOLIDITY_SOURCE = os.path.join(ROOT, "AICollaboration.sol")
+VYPER_SOURCE = os.path.join(ROOT, "build", "AICollaboration.vy")
+ARTIFACT = os.path.join(ROOT, "build", "AICollaboration.json")
+SOLC_VERSION = "0.8.24"
+
+
+def compile_solidity(solc_version=SOLC_VERSION):
+    import solcx
+    if solc_version not in [str(v) for v in solcx.get_installed_solc_versions()]:
+        solcx.install_solc(solc_version)
+    with open(SOLIDITY_SOURCE, encoding="utf-8") as f:
+        compiled = solcx.compile_source(f.read(), output_values=["abi", "bin"], solc_version=solc_version)
+    _, contract = compiled.popitem()
+    return {"abi": contract["abi"], "bytecode": "0x" + contract["bin"].removeprefix("0x"),
+            "source": "AICollaboration.sol", "compiler": f"solc {solc_version}"}
+
+
+def compile_vyper():
+    import vyper
+    out = subprocess.run([sys.executable, "-m", "vyper", "-f", "abi,bytecode", VYPER_SOURCE],
+                         check=True, capture_output=True, text=True).stdout.splitlines()
+    return {"abi": json.loads(out[0]),
+            "bytecode": out[1], "source": "build/AICollaboration.vy", "compiler": f"vyper {vyper.__version__}"}
+
+
+def load_artifact(path=ARTIFACT):
+    """(abi, bytecode) of a built artifact."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["abi"], data["bytecode"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiles AICollaboration into build/AICollaboration.json")
+    parser.add_argument("--vyper", action="store_true", help="Compile the Vyper port (no solc needed)")
+    parser.add_argument("--solc-version", default=SOLC_VERSION)
+    parser.add_argument("--output", default=ARTIFACT)
+    args = parser.parse_args()
+
+    artifact = compile_vyper() if args.vyper else compile_solidity(args.solc_version)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=1)
+        f.write("\n")
+    print(f"✅ {artifact['source']} compilé ({artifact['compiler']}) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Shared read layer for the contract view functions (bot, server, participants).
+
+Reads go through one ContractReader per process:
+- values that can still change (currentRound, trainingActive, an unpaid
+  contribution) are cached for `ttl` seconds;
+- final values are cached until prune(): a paid contribution, and any
+  contribution of a past round (the contract only writes the current round);
+- cache misses of one read_many() are sent as JSON-RPC batches of up to
+  `max_batch` calls (one HTTP request each). Providers without batch support
+  (web3 < 7, EthereumTesterProvider) get the same calls one by one.
+
+So the RPC requests per round stay roughly constant (one batch per poll)
+instead of growing with the number of participants.
+"""
+import threading
+import time
+
+import telemetry
+
+DEFAULT_TTL = 1.0     # Seconds a mutable value is served from the cache
+MAX_BATCH = 100       # Calls per JSON-RPC batch (providers cap the batch size)
+
+READS = telemetry.register(telemetry.Counter("fl_contract_reads_total", "Contract view reads, by cache result"))
+READ_REQUESTS = telemetry.register(telemetry.Counter(
+    "fl_contract_read_requests_total", "RPC requests sent for contract view reads (a batch counts once)"))
+
+
+def supports_batches(w3):
+    """JSON-RPC batches need web3 >= 7 and an HTTP/IPC/WebSocket provider."""
+    try:
+        w3.batch_requests().cancel()
+        return True
+    except Exception:
+        return False
+
+
+class ContractReader:
+    """Cached, batched view calls of one contract."""
+
+    def __init__(self, contract, ttl=DEFAULT_TTL, max_batch=MAX_BATCH):
+        self.contract = contract
+        self.w3 = contract.w3
+        self.ttl = ttl
+        self.max_batch = max_batch
+        self.batching = supports_batches(self.w3)
+        self.stats = {"hits": 0, "misses": 0, "requests": 0, "batches": 0}
+        self._cache = {}  # (function name, args) -> (value, expires_at or None if final)
+        self._lock = threading.Lock()
+
+    # --- Generic reads -----------------------------------------------------
+
+    def read(self, fn_name, *args, ttl=None):
+        return self.read_many([(fn_name, args)], ttl)[0]
+
+    def read_many(self, calls, ttl=None):
+        """calls: [(function name, args tuple)]. Returns the decoded results, in order."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        results, missing = [None] * len(calls), {}
+        with self._lock:
+            for i, key in enumerate(calls):
+                key = (key[0], tuple(key[1]))
+                cached = self._cache.get(key)
+                if cached is not None and (cached[1] is None or cached[1] > now):
+                    results[i] = cached[0]
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.stats["hits"] += len(calls) - sum(len(v) for v in missing.values())
+            self.stats["misses"] += len(missing)
+        READS.inc(len(calls) - sum(len(v) for v in missing.values()), result="hit")
+        if not missing:
+            return results
+        READS.inc(len(missing), result="miss")
+
+        keys = list(missing)
+        values = []
+        for start in range(0, len(keys), self.max_batch):
+            values.extend(self._fetch(keys[start:start + self.max_batch]))
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._cache[key] = (value, None if self._is_final(key, value) else expires_at)
+                for i in missing[key]:
+                    results[i] = value
+        return results
+
+    def _fetch(self, keys):
+        if self.batching and len(keys) > 1:
+            try:
+                with self.w3.batch_requests() as batch:
+                    for fn_name, args in keys:
+                        batch.add(self.contract.functions[fn_name](*args))
+                    values = batch.execute()
+                self.stats["requests"] += 1
+                self.stats["batches"] += 1
+                READ_REQUESTS.inc(kind="batch")
+                return values
+            except NotImplementedError:
+                print("ℹ️ Le fournisseur RPC ne gère pas les lots : lectures une par une.")
+                self.batching = False
+        values = []
+        for fn_name, args in keys:
+            values.append(self.contract.functions[fn_name](*args).call())
+            self.stats["requests"] += 1
+            READ_REQUESTS.inc(kind="single")
+        return values
+
+    def _is_final(self, key, value):
+        fn_name, args = key
+        if fn_name != "contributions":
+            return False
+        # Paid, or written in a round the contract has left
+        current = self._cache.get(("currentRound", ()))
+        return bool(value[2]) or (current is not None and args[0] < current[0])
+
+    def invalidate(self, fn_name=None):
+        """Drops the cached values of fn_name (every mutable value if None)."""
+        with self._lock:
+            for key in [k for k, v in self._cache.items()
+                        if (k[0] == fn_name if fn_name else v[1] is not None)]:
+                del self._cache[key]
+
+    def prune(self, current_round):
+        """Forgets the contributions of rounds before current_round."""
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == "contributions" and k[1][0] < current_round]:
+                del self._cache[key]
+
+    # --- Contract functions ------------------------------------------------
+
+    def current_round(self, ttl=None):
+        return self.read("currentRound", ttl=ttl)
+
+    def training_active(self, ttl=None):
+        return self.read("trainingActive", ttl=ttl)
+
+    def contributions(self, round_num, addresses, ttl=None):
+        """{address: (modelHash, isValidated, isPaid)} for one round, in one batch."""
+        addresses = list(addresses)
+        values = self.read_many([("contributions", (round_num, a)) for a in addresses], ttl)
+        return dict(zip(addresses, values))
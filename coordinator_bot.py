@@ -1,10 +1,16 @@
 import os
+import queue
 import time
 import shutil
-import hashlib
 import requests
 from web3 import Web3
+from web3.logs import DISCARD
 from dotenv import load_dotenv
+import telemetry
+from contract_reads import ContractReader
+from merkle_commit import MERKLE_ABI, build_round_commit
+from tx_manager import TransactionManager
+from weights_format import hash_file
 
 load_dotenv()
 
@@ -14,130 +20,429 @@ PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 RPC_URL = os.getenv("RPC_URL")
 CONTRACT_ADDR = os.getenv("CONTRACT_ADDRESS")
 SERVER_URL = "http://127.0.0.1:8000"
+# Port of the bot's own Prometheus endpoint (GET /metrics), unset = not served
+BOT_METRICS_PORT = os.getenv("BOT_METRICS_PORT")
 
-web3 = Web3(Web3.HTTPProvider(RPC_URL))
+web3 = Web3(telemetry.instrument_provider(Web3.HTTPProvider(RPC_URL)))
 
 # Complete ABI for round management
 ABI = [
     {"inputs": [], "name": "currentRound", "outputs": [{"type": "uint256"}], "stateMutability": "view", "type": "function"},
     {"inputs": [{"type": "uint256"}, {"type": "address"}], "name": "contributions", "outputs": [{"type": "bytes32", "name": "modelHash"}, {"type": "bool", "name": "isValidated"}, {"type": "bool", "name": "isPaid"}], "stateMutability": "view", "type": "function"},
-    {"inputs": [{"type": "address", "name": "_participant"}], "name": "validateAndPay", "outputs": [], "stateMutability": "payable", "type": "function"}
-]
+    {"inputs": [{"type": "address", "name": "_participant"}], "name": "validateAndPay", "outputs": [], "stateMutability": "payable", "type": "function"},
+    {"inputs": [{"type": "address[]", "name": "_participants"}], "name": "validateAndPayMany", "outputs": [], "stateMutability": "payable", "type": "function"},
+    {"anonymous": False, "inputs": [{"indexed": True, "name": "round", "type": "uint256"}, {"indexed": True, "name": "participant", "type": "address"}, {"indexed": False, "name": "modelHash", "type": "bytes32"}], "name": "HashSubmitted", "type": "event"},
+    {"anonymous": False, "inputs": [{"indexed": False, "name": "round", "type": "uint256"}], "name": "TrainingStarted", "type": "event"},
+    {"anonymous": False, "inputs": [{"indexed": True, "name": "round", "type": "uint256"}, {"indexed": True, "name": "participant", "type": "address"}], "name": "PaymentSkipped", "type": "event"}
+] + MERKLE_ABI
+
+HASH_SUBMITTED_TOPIC = Web3.to_hex(Web3.keccak(text="HashSubmitted(uint256,address,bytes32)"))
+TRAINING_STARTED_TOPIC = Web3.to_hex(Web3.keccak(text="TrainingStarted(uint256)"))
+# COMMIT_MODE=merkle: one root per round, audited against the server's files
+ROOT_COMMITTED_TOPIC = Web3.to_hex(Web3.keccak(text="RootCommitted(uint256,bytes32,uint256,uint256)"))
+
+POLL_INTERVAL = 2         # Seconds between two cycles
+LOOKBACK_BLOCKS = 500     # Blocks re-read at startup to catch hashes submitted just before
+MAX_BLOCK_RANGE = 2000    # eth_getLogs range limit of most RPC providers
+
+REWARD_WEI = Web3.to_wei(0.00001, "ether")  # Per participant
+PAY_BASE_GAS = 60000
+PAY_GAS_PER_PARTICIPANT = 60000
+MAX_PAYMENT_BATCH = 50    # Participants paid by a single validateAndPayMany
+MAX_PAYMENT_ATTEMPTS = 3  # Failed payments of one participant before it is verified without reward
 
 contract = web3.eth.contract(address=CONTRACT_ADDR, abi=ABI)
+# View calls (contributions of a whole batch in one request), cached below POLL_INTERVAL
+reader = ContractReader(contract, ttl=POLL_INTERVAL / 2)
 
-def verify_and_pay(addr, path, current_round):
-    try:
-        # 1. Recalculate local hash
-        with open(path, "rb") as f: 
-            local_hash = "0x" + hashlib.sha256(f.read()).hexdigest()
-        
-        # 2. Read specific mapping (Current Round + Participant Address)
+# Shared nonce/gas-price/receipt management for every payment
+tx_manager = TransactionManager(web3, COORD_ADDR, PRIVATE_KEY, gas_price_multiplier=1.1)
+
+def notify_server(addr, current_round, timeout=5):
+    """Tells the server that a contribution is confirmed on chain."""
+    requests.post(f"{SERVER_URL}/webhook/verify_contribution", 
+                  json={"participant_address": addr, "round": current_round}, timeout=timeout)
+
+def check_contribution(addr, path, current_round, local_hash=None):
+    """
+    Compares the uploaded file with the hash anchored on chain.
+    local_hash: hash computed by the server while receiving the file (/uploads feed);
+    the file is only re-hashed when it is not available.
+    Returns "missing" (no hash yet), "paid", "valid" or "mismatch".
+    """
+    with telemetry.span("hash_verify", current_round):
+        # 1. Local hash (from the server, or chunked over the file as a fallback)
+        if local_hash is None:
+            local_hash = hash_file(path)
+
+        # 2. Read specific mapping (Current Round + Participant Address), usually prefetched
         check_addr = Web3.to_checksum_address(addr)
-        data = contract.functions.contributions(current_round, check_addr).call()
-        
-        on_chain_hash = web3.to_hex(data[0])
-        is_paid = data[2]
-
-        # If no hash is recorded for this round
-        if on_chain_hash == "0x" + "0"*64: 
-            return False 
-            
-        if is_paid: 
+        data = reader.contributions(current_round, [check_addr])[check_addr]
+
+    on_chain_hash = web3.to_hex(data[0])
+    is_paid = data[2]
+
+    # If no hash is recorded for this round
+    if on_chain_hash == "0x" + "0"*64: 
+        status = "missing"
+    elif is_paid:
+        status = "paid"
+    else:
+        print(f"   👤 {addr[:10]}... | Hash Chain: {on_chain_hash[:10]}... | Local: {local_hash[:10]}...")
+        status = "valid" if local_hash.lower() == on_chain_hash.lower() else "mismatch"
+    telemetry.HASH_CHECKS.inc(result=status)
+    return status
+
+# (round, addrs, ok, skipped addrs) of every payment transaction, put by its receipt callback
+payment_outcomes = queue.Queue()
+
+def pay_participants(addrs, current_round):
+    """
+    Queues ONE payment transaction for all addrs (validateAndPayMany when there
+    are several) on the shared TransactionManager. The server is notified by
+    settle_payments() once the receipt is successful.
+    """
+    check_addrs = [Web3.to_checksum_address(a) for a in addrs]
+    if len(check_addrs) == 1:
+        call = contract.functions.validateAndPay(check_addrs[0])
+    else:
+        call = contract.functions.validateAndPayMany(check_addrs)
+    ptx = tx_manager.send(call, value=REWARD_WEI * len(check_addrs),
+                          gas=PAY_BASE_GAS + PAY_GAS_PER_PARTICIPANT * len(check_addrs),
+                          label=f"paiement R{current_round} x{len(check_addrs)}")
+
+    def on_settled(future):
+        ok, skipped = False, set()
+        try:
+            receipt = future.result()
+            ok = receipt["status"] == 1
+            status = "✅" if ok else "❌ (revert)"
+            print(f"      ↳ 💰 Paiement x{len(check_addrs)} miné {status} : {web3.to_hex(receipt['transactionHash'])}")
+            if ok:
+                # validateAndPayMany skips (and refunds) paid entries and rejected transfers
+                skipped = {e["args"]["participant"].lower()
+                           for e in contract.events.PaymentSkipped().process_receipt(receipt, errors=DISCARD)}
+        except Exception as e:
+            print(f"      ↳ ⚠️ Paiement x{len(check_addrs)} non confirmé : {e}")
+        # Runs on the tx-manager thread: the main loop does the HTTP notifications
+        payment_outcomes.put((current_round, list(addrs), ok, [a for a in addrs if a.lower() in skipped]))
+    ptx.future.add_done_callback(on_settled)
+    print(f"      ↳ 💰 Paiement de {len(check_addrs)} participant(s) envoyé.")
+    return ptx
+
+def _notify_all(addrs, round_num):
+    for addr in addrs:
+        try:
+            notify_server(addr, round_num)
+        except Exception as e:
+            print(f"      ↳ ⚠️ Erreur notif serveur : {e}")
+
+def settle_payments(matcher=None):
+    """
+    Main loop: notifies the server of the participants paid by a successful receipt.
+    A reverted batch is retried one validateAndPay per participant; skipped entries
+    and failed single payments go back to verification (re-read from chain). After
+    MAX_PAYMENT_ATTEMPTS failures the contribution is notified without reward, so one
+    unpayable address cannot hold the round. Returns the notified addresses.
+    """
+    confirmed = []
+    while True:
+        try:
+            round_num, addrs, ok, skipped = payment_outcomes.get_nowait()
+        except queue.Empty:
+            return confirmed
+        paid = [a for a in addrs if a not in skipped] if ok else []
+        failed = skipped if ok else addrs
+        if paid:
+            _notify_all(paid, round_num)
+            confirmed.extend(paid)
+            print(f"      ↳ 📢 Serveur notifié ({len(paid)} paiement(s) confirmé(s)).")
+            if matcher is not None:
+                for addr in paid:
+                    matcher.payment_done(round_num, addr, True)
+        if not failed:
+            continue
+        reader.invalidate("contributions")  # Paid or not, the retry reads the chain again
+        if not ok and len(addrs) > 1:
+            # One bad entry reverts the whole batch: pay the participants one by one
+            print(f"      ↳ 🔁 Lot de {len(addrs)} annulé : paiements individuels.")
+            for addr in addrs:
+                try:
+                    pay_participants([addr], round_num)
+                except Exception as e:
+                    print(f"      ↳ ⚠️ Erreur technique : {e}")
+                    if matcher is not None:
+                        matcher.payment_done(round_num, addr, False)
+            continue
+        print(f"      ↳ 🔁 {len(failed)} participant(s) à re-vérifier.")
+        if matcher is None:
+            continue
+        for addr in failed:
+            if not matcher.payment_done(round_num, addr, False):
+                print(f"      ↳ ⚠️ Paiement impossible pour {addr[:10]}... après {MAX_PAYMENT_ATTEMPTS} essais : "
+                      f"contribution notifiée sans récompense.")
+                _notify_all([addr], round_num)
+                confirmed.append(addr)
+
+def verify_and_pay_batch(items, current_round):
+    """
+    items: list of (addr, path) or (addr, path, file_hash). Checks every hash, pays
+    all valid ones in batched transactions. Returns (settled, paying): the addresses
+    that need no retry, and those whose payment was queued (see settle_payments).
+    """
+    settled, to_pay, paying = [], [], []
+    try:
+        # Every on-chain hash of the batch in one request; check_contribution then hits the cache
+        reader.contributions(current_round, [Web3.to_checksum_address(addr) for addr, *_ in items])
+    except Exception as e:
+        print(f"      ↳ ⚠️ Lecture groupée impossible : {e}")
+    for addr, path, *file_hash in items:
+        try:
+            status = check_contribution(addr, path, current_round, *file_hash)
+        except Exception as e:
+            print(f"      ↳ ⚠️ Erreur technique : {e}")
+            continue
+        if status == "missing":
+            continue
+        if status == "paid":
             # Notify server it is VERIFIED (Even if already paid before/Mismatch ignored)
             print(f"      ↳ 📡 Déjà payé. Serveur notifié (Sync).")
             try:
-                requests.post(f"{SERVER_URL}/webhook/verify_contribution", 
-                              json={"participant_address": addr, "round": current_round}, timeout=5)
-            except: pass
-            return True 
-            
-        print(f"   👤 {addr[:10]}... | Hash Chain: {on_chain_hash[:10]}... | Local: {local_hash[:10]}...")
+                notify_server(addr, current_round)
+            except Exception: pass
+        elif status == "valid":
+            print(f"      ↳ ✅ Hash Valide. Paiement groupé...")
+            to_pay.append(addr)
+            continue
+        else:
+            print(f"      ↳ ❌ FRAUDE : Hash mismatch!")
+        settled.append(addr)
 
-        # 4. Comparison and Payment
-        if local_hash.lower() == on_chain_hash.lower():
-            print(f"      ↳ ✅ Hash Valide. Envoi du paiement...")
-            
-            # Using 'pending' to chain payments without nonce errors
-            nonce = web3.eth.get_transaction_count(COORD_ADDR, 'pending')
-            
-            tx = contract.functions.validateAndPay(check_addr).build_transaction({
-                "from": COORD_ADDR, 
-                "value": web3.to_wei(0.00001, "ether"),
-                "gas": 300000, 
-                "gasPrice": int(web3.eth.gas_price * 1.1), 
-                "nonce": nonce
-            })
-            
-            signed = web3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-            tx_hash = web3.eth.send_raw_transaction(signed.raw_transaction)
-            print(f"      ↳ 💰 Transaction envoyée : {web3.to_hex(tx_hash)}")
-            
-            # --- NOTIFICATION TO SERVER ---
-            try:
-                requests.post(f"{SERVER_URL}/webhook/verify_contribution", 
-                              json={"participant_address": addr, "round": current_round})
-                print(f"      ↳ 📢 Serveur notifié.")
-            except Exception as e:
-                print(f"      ↳ ⚠️ Erreur notif serveur : {e}")
+    for start in range(0, len(to_pay), MAX_PAYMENT_BATCH):
+        batch = to_pay[start:start + MAX_PAYMENT_BATCH]
+        try:
+            pay_participants(batch, current_round)
+            paying.extend(batch)
+        except Exception as e:
+            print(f"      ↳ ⚠️ Erreur technique : {e}")
+    return settled, paying
+
+def verify_and_pay(addr, path, current_round, local_hash=None):
+    settled, paying = verify_and_pay_batch([(addr, path, local_hash)], current_round)
+    return addr in settled or addr in paying
+
+def audit_round_root(round_num, root, leaf_count, received_dir, server_url=None):
+    """
+    Merkle mode: rebuilds the root committed for a round from the server's list of
+    contributions, and re-hashes their files. Returns "valid" or "mismatch".
+    """
+    with telemetry.span("root_audit", round_num):
+        res = requests.get(f"{server_url or SERVER_URL}/merkle/{round_num}", timeout=5)
+        res.raise_for_status()
+        contributions = res.json()["contributions"]
+        rebuilt = build_round_commit(round_num, {p: c["hash"] for p, c in contributions.items()})
+        bad_files = [p for p, c in contributions.items()
+                     if c.get("file") and os.path.exists(os.path.join(received_dir, c["file"]))
+                     and hash_file(os.path.join(received_dir, c["file"])).lower() != c["hash"].lower()]
+    if rebuilt["root"].lower() != root.lower() or rebuilt["count"] != leaf_count or bad_files:
+        print(f"🚨 Racine du Round {round_num} incohérente ({len(bad_files)} fichier(s) modifié(s))")
+        status = "mismatch"
+    else:
+        print(f"✅ Racine du Round {round_num} vérifiée ({leaf_count} contributions)")
+        status = "valid"
+    telemetry.HASH_CHECKS.inc(result=status)
+    return status
+
+def fetch_contract_events(from_block, to_block, w3=None, c=None):
+    """
+    Reads HashSubmitted, TrainingStarted and RootCommitted logs in [from_block, to_block] with eth_getLogs.
+    Returns decoded events ordered by block.
+    """
+    w3 = w3 or web3
+    c = c or contract
+    events = []
+    for start in range(from_block, to_block + 1, MAX_BLOCK_RANGE):
+        end = min(to_block, start + MAX_BLOCK_RANGE - 1)
+        logs = w3.eth.get_logs({
+            "address": c.address,
+            "fromBlock": start,
+            "toBlock": end,
+            "topics": [[HASH_SUBMITTED_TOPIC, TRAINING_STARTED_TOPIC, ROOT_COMMITTED_TOPIC]],
+        })
+        for log in logs:
+            topic = Web3.to_hex(log["topics"][0])
+            if topic == HASH_SUBMITTED_TOPIC:
+                events.append(c.events.HashSubmitted().process_log(log))
+            elif topic == TRAINING_STARTED_TOPIC:
+                events.append(c.events.TrainingStarted().process_log(log))
+            elif topic == ROOT_COMMITTED_TOPIC:
+                events.append(c.events.RootCommitted().process_log(log))
+    return events
+
+
+def fetch_new_uploads(cursor, server_url=None):
+    """Asks the server for the uploads received after `cursor`. Returns (new_cursor, uploads)."""
+    res = requests.get(f"{server_url or SERVER_URL}/uploads", params={"since": cursor}, timeout=5)
+    res.raise_for_status()
+    data = res.json()
+    return data["cursor"], data["uploads"]
+
+
+class UploadHashMatcher:
+    """
+    Joins the two streams in memory: on-chain hashes (HashSubmitted) and
+    uploaded files (server feed). A (round, participant) pair is ready for
+    verification once both sides have been seen.
+    """
+
+    def __init__(self):
+        self.hashes = {}   # (round, addr) -> on-chain hash
+        self.uploads = {}  # (round, addr) -> (checksum address, file name, file hash)
+        self.ready = {}    # (round, addr) -> (checksum address, file name, file hash)
+        self.paying = {}   # Same, while their payment transaction is in flight
+        self.failures = {} # (round, addr) -> failed payments
+
+    @staticmethod
+    def _key(round_num, addr):
+        return int(round_num), addr.lower()
+
+    def _try_match(self, key):
+        if key in self.hashes and key in self.uploads:
+            self.hashes.pop(key)
+            self.ready[key] = self.uploads.pop(key)
+
+    def add_hash(self, round_num, addr, model_hash):
+        key = self._key(round_num, addr)
+        self.hashes[key] = model_hash
+        self._try_match(key)
+
+    def add_upload(self, round_num, addr, filename, file_hash=None):
+        key = self._key(round_num, addr)
+        self.uploads[key] = (addr, filename, file_hash)
+        self._try_match(key)
+
+    def ready_for(self, round_num):
+        """Matched pairs of round_num still waiting for a successful verification."""
+        return [(key, value) for key, value in self.ready.items() if key[0] == round_num]
 
+    def done(self, key):
+        self.ready.pop(key, None)
+
+    def begin_payment(self, key):
+        """Out of ready_for() until payment_done(): no second payment while one is in flight."""
+        if key in self.ready:
+            self.paying[key] = self.ready.pop(key)
+
+    def payment_done(self, round_num, addr, ok):
+        """
+        Forgets a confirmed payment; a failed one is verified again, until
+        MAX_PAYMENT_ATTEMPTS failures. Returns False once the pair is given up.
+        """
+        key = self._key(round_num, addr)
+        value = self.paying.pop(key, None)
+        if ok:
+            self.failures.pop(key, None)
             return True
-        else:
-            print(f"      ↳ ❌ FRAUDE : Hash mismatch!")
-            return True 
-            
-    except Exception as e: 
-        print(f"      ↳ ⚠️ Erreur technique : {e}")
-        return False
+        self.failures[key] = self.failures.get(key, 0) + 1
+        if self.failures[key] >= MAX_PAYMENT_ATTEMPTS:
+            self.failures.pop(key)
+            return False
+        if value is not None:
+            self.ready[key] = value
+        return True
+
+    def prune(self, current_round):
+        """Drops everything older than current_round (the contract only pays the current round)."""
+        for table in (self.hashes, self.uploads, self.ready, self.paying, self.failures):
+            for key in [k for k in table if k[0] < current_round]:
+                del table[key]
 
-import re
 
 def start_bot():
     print("┏━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┓")
     print("┃ 🤖 BOT DE PAIEMENT ACTIF               ┃")
     print("┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛")
+    if BOT_METRICS_PORT:
+        telemetry.register_gauge("fl_tx_pending", "Payment transactions queued or waiting for a receipt",
+                                 lambda: tx_manager.pending)
+        telemetry.serve(int(BOT_METRICS_PORT))
+        print(f"📈 Métriques Prometheus : http://0.0.0.0:{BOT_METRICS_PORT}/metrics")
     
+    # Upload paths in the /uploads feed are relative to the server's model store (round_<N>/<sha256>.flw)
     received_dir = "received_models"
-    processed_dir = os.path.join(received_dir, "processed")
-    if not os.path.exists(processed_dir): os.makedirs(processed_dir)
-
-    last_round_seen = -1
-    processed_cache = set()
 
+    # Initial state: a single currentRound() read, then the round follows TrainingStarted events
     while True:
         try:
-            # Get current round ONLY ONCE per scan cycle for consistency
-            current_round_on_chain = contract.functions.currentRound().call()
-            
-            if current_round_on_chain != last_round_seen:
-                print(f"\n🔄 --- SCANNING ROUND {current_round_on_chain} ---")
-                last_round_seen = current_round_on_chain
-                processed_cache.clear() # New round, we reset the cache
-
-        except:
+            current_round = reader.current_round()
+            from_block = max(0, web3.eth.block_number - LOOKBACK_BLOCKS)
+            break
+        except Exception:
             print("⚠️ Impossible de lire le round actuel sur la blockchain.")
             time.sleep(5)
-            continue
 
-        files = [f for f in os.listdir(received_dir) if f.endswith(".joblib")]
-        
-        for f in files:
-            path = os.path.join(received_dir, f)
-            match = re.match(r"round_(\d+)_(0x[a-fA-F0-9]{40})\.joblib", f)
-            
-            if match:
-                file_round = int(match.group(1))
-                addr = match.group(2)
-                
-                # We only process files from the CURRENT Round
-                if file_round == current_round_on_chain:
-                    if addr in processed_cache:
-                        continue # Already processed for this round, ignore
-                        
-                    if verify_and_pay(addr, path, current_round_on_chain):
-                        processed_cache.add(addr) # Mark as processed
-
-        time.sleep(2) # Pause of 2 seconds between scans
+    print(f"\n🔄 --- SCANNING ROUND {current_round} ---")
+    matcher = UploadHashMatcher()
+    upload_cursor = 0
+
+    while True:
+        cycle_start = time.perf_counter()
+        # 1. New on-chain events since the block cursor
+        try:
+            with telemetry.span("bot_scan_events", current_round):
+                latest_block = web3.eth.block_number
+                if latest_block >= from_block:
+                    for event in fetch_contract_events(from_block, latest_block):
+                        if event["event"] == "TrainingStarted":
+                            if event["args"]["round"] != current_round:
+                                telemetry.tracer.flush(current_round, source="bot")
+                                current_round = event["args"]["round"]
+                                matcher.prune(current_round)
+                                reader.prune(current_round)
+                                print(f"\n🔄 --- SCANNING ROUND {current_round} ---")
+                        elif event["event"] == "RootCommitted":
+                            args = event["args"]
+                            try:
+                                audit_round_root(args["round"], web3.to_hex(args["root"]), args["leafCount"],
+                                                 received_dir)
+                            except Exception as e:
+                                print(f"⚠️ Audit de la racine du Round {args['round']} impossible : {e}")
+                        else:
+                            args = event["args"]
+                            matcher.add_hash(args["round"], args["participant"], web3.to_hex(args["modelHash"]))
+                    from_block = latest_block + 1
+        except Exception as e:
+            print(f"⚠️ Lecture des événements impossible : {e}")
+
+        # 2. New uploads announced by the server
+        try:
+            with telemetry.span("bot_upload_feed", current_round):
+                upload_cursor, uploads = fetch_new_uploads(upload_cursor)
+            for u in uploads:
+                if u["round"] >= current_round:
+                    matcher.add_upload(u["round"], u["participant"], u["file"], u.get("hash"))
+        except Exception as e:
+            print(f"⚠️ Flux d'uploads du serveur indisponible : {e}")
+
+        # 3. Payments mined since the last cycle: notify the server, or retry the failed ones
+        settle_payments(matcher)
+
+        # 4. Verify only the pairs that just became complete (payments are batched)
+        ready = matcher.ready_for(current_round)
+        if ready:
+            items = [(addr, os.path.join(received_dir, filename), file_hash)
+                     for _, (addr, filename, file_hash) in ready]
+            with telemetry.span("bot_verify_and_pay", current_round, items=len(items)):
+                settled, paying = verify_and_pay_batch(items, current_round)
+            settled, paying = set(settled), set(paying)
+            for key, (addr, _, _) in ready:
+                if addr in settled:
+                    matcher.done(key)
+                elif addr in paying:
+                    matcher.begin_payment(key)
+
+        telemetry.record("bot_cycle", time.perf_counter() - cycle_start, current_round)
+        time.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__": 
     start_bot()
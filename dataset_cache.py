@@ -0,0 +1,190 @@
+"""
+Typed, memory-mapped cache of the CSV datasets (server test set, client partitions).
+
+A CSV is parsed once, chunk by chunk (partitions larger than RAM convert fine),
+into NumPy files named after the SHA-256 of the CSV bytes:
+
+    <cache_dir>/<sha256>/features.npy   float64 (rows, features), DROP_COLUMNS removed
+    <cache_dir>/<sha256>/target.npy     int64 (rows,), the "Churn" column
+    <cache_dir>/<sha256>/meta.json      {"source", "columns", "rows"}
+    <cache_dir>/sources.json            path -> {"size", "mtime_ns", "hash"}
+
+Later loads memory-map the .npy files: only the rows actually used are read.
+sources.json spares re-hashing a CSV whose size and mtime did not change; an
+edited CSV hashes differently and gets a new entry.
+
+Usage (prebuilds the cache):
+    python dataset_cache.py datasets/*.csv
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+
+from feature_stats import DROP_COLUMNS
+from weights_format import HASH_CHUNK_SIZE, hash_file
+
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", ".fl_cache/datasets")
+TARGET_COLUMN = "Churn"
+CHUNK_ROWS = 65536  # Rows per CSV chunk (conversion) and per Dataset.chunks() slice
+FEATURES_FILE = "features.npy"
+TARGET_FILE = "target.npy"
+META_FILE = "meta.json"
+SOURCES_FILE = "sources.json"
+
+
+@dataclass
+class Dataset:
+    X: np.ndarray  # Memory-mapped unless loaded with mmap=False
+    y: np.ndarray
+    columns: list
+    source: str
+
+    def __len__(self):
+        return len(self.y)
+
+    def head(self, rows):
+        """First rows (views: still nothing read from disk)."""
+        return Dataset(self.X[:rows], self.y[:rows], self.columns, self.source)
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """(X, y) slices of chunk_rows rows; only the slice being used is paged in."""
+        for start in range(0, len(self.y), chunk_rows):
+            yield self.X[start:start + chunk_rows], self.y[start:start + chunk_rows]
+
+
+def _count_rows(path):
+    """Data lines of a CSV (an upper bound if it has blank lines), counted in chunks."""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    return max(0, lines + (last != b"\n") - 1)  # Minus the header
+
+
+def _convert(csv_path, out_dir, chunk_rows=CHUNK_ROWS):
+    """Parses the CSV in chunks straight into the .npy files of out_dir. Returns the meta dict."""
+    import pandas as pd
+
+    n_rows = _count_rows(csv_path)
+    features = target = columns = None
+    written = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        if features is None:
+            if TARGET_COLUMN not in chunk.columns:
+                raise ValueError(f"{csv_path}: no {TARGET_COLUMN!r} column")
+            columns = [str(c) for c in chunk.columns if c not in DROP_COLUMNS]
+            features = np.lib.format.open_memmap(os.path.join(out_dir, FEATURES_FILE), mode="w+",
+                                                 dtype=np.float64, shape=(n_rows, len(columns)))
+            target = np.lib.format.open_memmap(os.path.join(out_dir, TARGET_FILE), mode="w+",
+                                               dtype=np.int64, shape=(n_rows,))
+        n = len(chunk)
+        features[written:written + n] = chunk[columns].to_numpy(dtype=np.float64)
+        target[written:written + n] = chunk[TARGET_COLUMN].to_numpy(dtype=np.int64)
+        written += n
+    if features is None:
+        raise ValueError(f"{csv_path}: no data rows")
+    features.flush()
+    target.flush()
+    if written != n_rows:
+        # Blank lines were counted: rewrite with the real row count (rare, loads the arrays)
+        kept_X, kept_y = np.array(features[:written]), np.array(target[:written])
+        del features, target
+        np.save(os.path.join(out_dir, FEATURES_FILE), kept_X)
+        np.save(os.path.join(out_dir, TARGET_FILE), kept_y)
+    meta = {"source": os.path.basename(csv_path), "columns": columns, "rows": written}
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def _read_sources(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, SOURCES_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_sources(cache_dir, sources):
+    path = os.path.join(cache_dir, SOURCES_FILE)
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"  # Several processes may convert at once
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(sources, f)
+    os.replace(temp, path)
+
+
+def csv_hash(csv_path, cache_dir=None):
+    """SHA-256 of the CSV (no "0x"), re-hashed only when its size or mtime changed."""
+    cache_dir = cache_dir or CACHE_DIR
+    key = os.path.abspath(csv_path)
+    st = os.stat(csv_path)
+    sources = _read_sources(cache_dir)
+    known = sources.get(key)
+    if known is not None and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        return known["hash"]
+    digest = hash_file(csv_path)[2:]
+    os.makedirs(cache_dir, exist_ok=True)
+    sources[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+    _write_sources(cache_dir, sources)
+    return digest
+
+
+def build_cache(csv_path, cache_dir=None):
+    """Directory holding the .npy files of csv_path, converted now if missing."""
+    cache_dir = cache_dir or CACHE_DIR
+    entry = os.path.join(cache_dir, csv_hash(csv_path, cache_dir))
+    if os.path.exists(os.path.join(entry, META_FILE)):
+        return entry
+    # Converted next to the entry, then renamed: readers never see half-written files
+    temp = f"{entry}.incoming-{uuid.uuid4().hex}"
+    os.makedirs(temp)
+    try:
+        _convert(csv_path, temp)
+        os.replace(temp, entry)
+    except OSError:
+        if not os.path.exists(os.path.join(entry, META_FILE)):
+            raise
+        shutil.rmtree(temp, ignore_errors=True)  # Another process converted it first
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    return entry
+
+
+def load_dataset(csv_path, rows=None, cache_dir=None, mmap=True):
+    """
+    Features (DROP_COLUMNS removed), target and column names of a CSV, from the cache.
+    rows: keep the first rows only. mmap=False reads the arrays into memory.
+    """
+    entry = build_cache(csv_path, cache_dir)
+    with open(os.path.join(entry, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    dataset = Dataset(np.load(os.path.join(entry, FEATURES_FILE), mmap_mode=mode),
+                      np.load(os.path.join(entry, TARGET_FILE), mmap_mode=mode), meta["columns"], csv_path)
+    return dataset.head(rows) if rows is not None else dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts CSV datasets into the memory-mapped cache")
+    parser.add_argument("csv", nargs="*", default=sorted(glob.glob("datasets/*.csv")))
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+    for path in args.csv:
+        t0 = time.perf_counter()
+        entry = build_cache(path, args.cache_dir)
+        dataset = load_dataset(path, cache_dir=args.cache_dir)
+        print(f"🗃️ {path} -> {entry} ({len(dataset)} lignes × {len(dataset.columns)} colonnes, "
+              f"{time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
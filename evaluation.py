@@ -0,0 +1,150 @@
+"""
+Vectorized evaluation of Logistic Regression weights on a fixed test set.
+
+The test set is kept as one contiguous float64 array. Scores for one model or
+for many stacked models come from a single matmul, and accuracy / log-loss /
+macro precision / recall / F1 are all derived from one confusion-matrix pass.
+Results are memoized by model key (e.g. the SHA-256 of the update).
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+FAILED_METRICS = {"accuracy": 0.0, "loss": 99.9, "precision": 0.0, "recall": 0.0, "f1": 0.0}
+
+
+def weights_key(coef, intercept):
+    """Content key of a set of weights (used when no upload hash is available)."""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(coef, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(intercept, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class EvaluationEngine:
+    def __init__(self, X, y, cache_size=4096):
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.y = np.asarray(y)
+        self.n_samples = self.X.shape[0]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # Per-classes encoding of y, computed once: tuple(classes) -> class indices
+        self._y_codes = {}
+
+    def _encode_y(self, classes):
+        key = tuple(classes)
+        if key not in self._y_codes:
+            classes_arr = np.asarray(classes)
+            codes = np.searchsorted(classes_arr, self.y)
+            codes = np.clip(codes, 0, len(classes_arr) - 1)
+            if not np.array_equal(classes_arr[codes], self.y):
+                raise ValueError("Test labels are not all part of the model classes")
+            self._y_codes[key] = codes
+        return self._y_codes[key]
+
+    def _remember(self, key, metrics):
+        if key is None:
+            return
+        self._cache[key] = metrics
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def evaluate(self, coef, intercept, classes, key=None):
+        """Metrics of one model. `key` (e.g. update hash) enables memoization."""
+        if key is None:
+            key = weights_key(coef, intercept)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return dict(self._cache[key])
+        coef = np.asarray(coef, dtype=np.float64)
+        metrics = self._evaluate_stack(coef[None], np.asarray(intercept, dtype=np.float64)[None], classes)[0]
+        self._remember(key, metrics)
+        return dict(metrics)
+
+    def evaluate_model(self, model, key=None):
+        return self.evaluate(model.coef_, model.intercept_, model.classes_, key)
+
+    def evaluate_update(self, update, key=None):
+        return self.evaluate(update.coef, update.intercept, update.classes, key)
+
+    def evaluate_many(self, coefs, intercepts, classes, keys=None):
+        """
+        Metrics of m stacked models (coefs: (m, n_rows, n_features), intercepts: (m, n_rows))
+        sharing the same classes. Only the models missing from the cache are scored,
+        all together in one GEMM.
+        """
+        coefs = np.asarray(coefs, dtype=np.float64)
+        intercepts = np.asarray(intercepts, dtype=np.float64)
+        m = coefs.shape[0]
+        if keys is None:
+            keys = [weights_key(coefs[i], intercepts[i]) for i in range(m)]
+        results = [self._cache.get(k) for k in keys]
+        todo = [i for i, r in enumerate(results) if r is None]
+        if todo:
+            fresh = self._evaluate_stack(coefs[todo], intercepts[todo], classes)
+            for i, metrics in zip(todo, fresh):
+                results[i] = metrics
+                self._remember(keys[i], metrics)
+        return [dict(r) for r in results]
+
+    def _evaluate_stack(self, coefs, intercepts, classes):
+        m, n_rows, n_features = coefs.shape
+        if n_features != self.X.shape[1]:
+            raise ValueError(f"Model has {n_features} features, test set has {self.X.shape[1]}")
+        n_classes = len(classes)
+        y_codes = self._encode_y(classes)
+        n = self.n_samples
+        eps = np.finfo(np.float64).eps
+
+        # 1. All scores with one matmul: (n, d) @ (d, m * n_rows)
+        scores = self.X @ coefs.reshape(m * n_rows, n_features).T
+        scores += intercepts.reshape(1, m * n_rows)
+
+        # 2. Predictions and probability of the true class, shape (n, m)
+        if n_rows == 1:
+            z = scores  # Binary: one decision function per model
+            pred = (z > 0).astype(np.intp)
+            p1 = 1.0 / (1.0 + np.exp(-z))
+            p_true = np.where(y_codes[:, None] == 1, p1, 1.0 - p1)
+        else:
+            z = scores.reshape(n, m, n_rows)
+            pred = z.argmax(axis=2)
+            z = z - z.max(axis=2, keepdims=True)
+            np.exp(z, out=z)
+            z /= z.sum(axis=2, keepdims=True)
+            p_true = np.take_along_axis(z, y_codes[:, None, None].repeat(m, axis=1), axis=2)[..., 0]
+        losses = -np.log(np.clip(p_true, eps, 1 - eps)).mean(axis=0)
+
+        # 3. One confusion matrix per model, built with a single bincount
+        flat = (np.arange(m)[None, :] * n_classes + y_codes[:, None]) * n_classes + pred
+        cm = np.bincount(flat.ravel(), minlength=m * n_classes * n_classes).reshape(m, n_classes, n_classes)
+
+        tp = np.diagonal(cm, axis1=1, axis2=2).astype(np.float64)
+        true_count = cm.sum(axis=2)
+        pred_count = cm.sum(axis=1)
+        # Macro average over the labels present in y_true or y_pred (sklearn semantics, zero_division=0)
+        present = (true_count + pred_count) > 0
+        n_present = np.maximum(present.sum(axis=1), 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(pred_count > 0, tp / pred_count, 0.0)
+            recall = np.where(true_count > 0, tp / true_count, 0.0)
+            f1_den = true_count + pred_count
+            f1 = np.where(f1_den > 0, 2 * tp / f1_den, 0.0)
+
+        accuracy = tp.sum(axis=1) / n
+        precision = (precision * present).sum(axis=1) / n_present
+        recall = (recall * present).sum(axis=1) / n_present
+        f1 = (f1 * present).sum(axis=1) / n_present
+
+        return [
+            {
+                "accuracy": float(accuracy[i]),
+                "loss": float(losses[i]),
+                "precision": float(precision[i]),
+                "recall": float(recall[i]),
+                "f1": float(f1[i]),
+            }
+            for i in range(m)
+        ]
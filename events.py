@@ -0,0 +1,86 @@
+"""
+Server-Sent Events fan-out for the dashboard.
+
+Publishers (request handlers, background workers) call EventBroker.publish
+from any thread; every connected client owns a bounded asyncio queue that is
+fed on its event loop. A client that falls too far behind is disconnected and
+reconnects with its cursor instead of making the server buffer without limit.
+"""
+import asyncio
+import itertools
+import json
+import threading
+
+KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._clients = {}  # queue -> event loop
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def subscribe(self):
+        """Registers a client on the running event loop and returns its queue."""
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._clients[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._clients.pop(queue, None)
+
+    def publish(self, event_type, data):
+        """Thread-safe. Serialization is done once, not per client."""
+        with self._lock:
+            if not self._clients:
+                return
+            clients = list(self._clients.items())
+        message = format_sse(event_type, data, next(self._ids))
+        for queue, loop in clients:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                self.unsubscribe(queue)  # Loop closed
+
+    def _offer(self, queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow client: drop it, it will reconnect with ?since=<cursor>
+            self.unsubscribe(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    async def stream(self, queue, backlog=()):
+        """Async generator for a StreamingResponse: backlog first, then live events."""
+        try:
+            for message in backlog:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(queue)
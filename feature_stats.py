@@ -0,0 +1,162 @@
+"""
+Federated feature scaling: one StandardScaler for every party.
+
+Each participant sends the sufficient statistics of its local features
+(row count, per-feature sum and sum of squares), the server merges them and
+publishes a global scaler (GET /scaler). Clients and the server evaluation set
+are then scaled in the same feature space, so averaged coefficients mean the
+same thing for every participant.
+
+Statistics are plain JSON: {"count": n, "sum": [...], "sumsq": [...], "columns": [...]}.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+DROP_COLUMNS = ["Churn", "customerID"]  # Target and identifier of the client CSVs
+
+
+def local_stats(X, columns=None):
+    """Sufficient statistics of a (n_rows, n_features) matrix or DataFrame."""
+    if columns is None and hasattr(X, "columns"):
+        columns = [str(c) for c in X.columns]
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2:
+        raise ValueError("Expected a (n_rows, n_features) matrix")
+    return {
+        "count": int(X.shape[0]),
+        "sum": X.sum(axis=0).tolist(),
+        "sumsq": np.einsum("ij,ij->j", X, X).tolist(),
+        "columns": list(columns) if columns is not None else None,
+    }
+
+
+def chunked_stats(chunks, columns=None):
+    """local_stats of a matrix read as (X, y) row blocks (dataset_cache.Dataset.chunks()), one block in memory."""
+    count, total, total_sq = 0, 0.0, 0.0
+    for X, _ in chunks:
+        X = np.asarray(X, dtype=np.float64)
+        count += X.shape[0]
+        total = total + X.sum(axis=0)
+        total_sq = total_sq + np.einsum("ij,ij->j", X, X)
+    if count == 0:
+        raise ValueError("No rows to compute statistics on")
+    return {"count": count, "sum": total.tolist(), "sumsq": total_sq.tolist(),
+            "columns": list(columns) if columns is not None else None}
+
+
+def check_stats(stats):
+    """Raises ValueError unless stats is a well-formed statistics dict."""
+    try:
+        count = int(stats["count"])
+        d = len(stats["sum"])
+        ok = count > 0 and d > 0 and len(stats["sumsq"]) == d
+        columns = stats.get("columns")
+        ok = ok and (columns is None or len(columns) == d)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid feature statistics: missing or malformed {e}") from None
+    if not ok:
+        raise ValueError("Invalid feature statistics: expected count > 0 and sum/sumsq/columns of one length")
+
+
+def merge_stats(stats_list):
+    """Sums the statistics of every party in one vectorized pass."""
+    stats_list = list(stats_list)
+    if not stats_list:
+        raise ValueError("No feature statistics to merge")
+    columns = stats_list[0].get("columns")
+    for stats in stats_list:
+        check_stats(stats)
+        if stats.get("columns") != columns or len(stats["sum"]) != len(stats_list[0]["sum"]):
+            raise ValueError("Feature statistics with different columns")
+    counts = np.array([s["count"] for s in stats_list], dtype=np.float64)
+    sums = np.array([s["sum"] for s in stats_list], dtype=np.float64)
+    sumsqs = np.array([s["sumsq"] for s in stats_list], dtype=np.float64)
+    merged = {
+        "count": int(counts.sum()),
+        "sum": sums.sum(axis=0).tolist(),
+        "sumsq": sumsqs.sum(axis=0).tolist(),
+        "columns": columns,
+        "participants": len(stats_list),
+    }
+    merged["version"] = stats_version(merged)
+    return merged
+
+
+def stats_version(stats):
+    """Short content hash: clients cache their scaled data per scaler version."""
+    body = json.dumps([stats["count"], stats["sum"], stats["sumsq"], stats.get("columns")])
+    return hashlib.sha256(body.encode()).hexdigest()[:16]
+
+
+def moments(stats):
+    """(mean, var, scale) as StandardScaler computes them (population variance, scale 1 for constant features)."""
+    n = float(stats["count"])
+    mean = np.asarray(stats["sum"], dtype=np.float64) / n
+    var = np.maximum(np.asarray(stats["sumsq"], dtype=np.float64) / n - mean ** 2, 0.0)
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+    return mean, var, scale
+
+
+def scale_features(X, stats, columns=None):
+    """(X - mean) / scale with the global statistics; columns, when both sides have them, must match."""
+    if columns is not None and stats.get("columns") and list(columns) != list(stats["columns"]):
+        raise ValueError("Feature columns differ from the global scaler's")
+    mean, _, scale = moments(stats)
+    return (np.asarray(X, dtype=np.float64) - mean) / scale
+
+
+def scaler_from_stats(stats):
+    """A fitted sklearn StandardScaler equivalent to fitting on the union of the parties' rows."""
+    from sklearn.preprocessing import StandardScaler
+
+    mean, var, scale = moments(stats)
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = int(stats["count"])
+    scaler.n_features_in_ = len(mean)
+    if stats.get("columns"):
+        scaler.feature_names_in_ = np.asarray(stats["columns"], dtype=object)
+    return scaler
+
+
+class ScalerClient:
+    """Participant side: sends the local statistics, keeps the published global scaler (conditional GET)."""
+
+    def __init__(self, server_url, session=None, timeout=10):
+        import requests
+
+        self.server_url = server_url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.stats = None
+        self.etag = None
+        self.scaler = None
+
+    def submit(self, participant, stats):
+        res = self.session.post(f"{self.server_url}/scaler/stats", json={"participant_address": participant, **stats},
+                                timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    def fetch(self):
+        """Global scaler (fitted StandardScaler), or None while none is published."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        res = self.session.get(f"{self.server_url}/scaler", headers=headers, timeout=self.timeout)
+        if res.status_code == 304:
+            return self.scaler
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        self.stats = res.json()
+        self.scaler = scaler_from_stats(self.stats)
+        self.etag = res.headers.get("ETag")
+        return self.scaler
+
+    @property
+    def version(self):
+        return self.stats["version"] if self.stats else None
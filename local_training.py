@@ -0,0 +1,127 @@
+"""
+Local training of the participants: logistic regression by mini-batch SGD in NumPy.
+
+Each round starts from the global weights and runs `epochs` passes over the
+local data (FedAvg local epochs). With mu > 0 the FedProx proximal term
+mu/2 * ||w - w_global||^2 is added to the local loss, which keeps the local
+model close to the global one when the clients' data differ.
+
+Buffers (shuffled rows, logits, gradient) are allocated once per fit; the
+per-batch loop only writes into them. A fitted LocalTrainer has coef_,
+intercept_ and classes_ like the sklearn model, so encode_model() and the
+DeltaEncoder take it as is.
+"""
+import numpy as np
+
+TRAINERS = ("sgd", "lbfgs")  # "lbfgs": previous sklearn LogisticRegression warm-start fit
+
+
+class LocalTrainer:
+    """
+    Binary logistic regression trained by mini-batch SGD (FedProx with mu > 0).
+    C: inverse L2 strength as in sklearn (penalty ||w||^2 / 2C on the summed loss, intercept not penalized).
+    """
+
+    def __init__(self, epochs=5, batch_size=32, lr=0.1, mu=0.0, C=1.0, seed=None):
+        if epochs < 1 or batch_size < 1 or lr <= 0 or mu < 0 or C <= 0:
+            raise ValueError("Expected epochs >= 1, batch_size >= 1, lr > 0, mu >= 0 and C > 0")
+        self.epochs = int(epochs)
+        self.batch_size = int(batch_size)
+        self.lr = float(lr)
+        self.mu = float(mu)
+        self.C = float(C)
+        self.rng = np.random.default_rng(seed)
+
+    def fit(self, X, y, coef_init=None, intercept_init=None, classes=None):
+        """
+        Trains from the global weights (zeros if None). classes: those of the global model,
+        so a client that only holds one class still maps its labels the same way.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        n, d = X.shape
+        if n == 0 or len(y) != n:
+            raise ValueError("Expected a non-empty X and one label per row")
+        self.classes_ = np.unique(y) if classes is None else np.asarray(classes)
+        if len(self.classes_) != 2:
+            raise ValueError("LocalTrainer fits binary targets: expected two classes (pass the global model's)")
+        target = (y == self.classes_[-1]).astype(np.float64)
+
+        w = np.zeros(d) if coef_init is None else np.array(coef_init, dtype=np.float64).reshape(d)
+        b = 0.0 if intercept_init is None else float(np.ravel(intercept_init)[0])
+        lr = self.lr
+        # Per step, w -= lr * (grad + (l2 + mu) * w - mu * w_global): the last term is constant
+        decay = lr * (1.0 / (self.C * n) + self.mu)
+        pull_w = lr * self.mu * w if self.mu else None
+        pull_b = lr * self.mu * b
+
+        # Allocated once: the batch loop only slices and writes into these
+        order = np.arange(n)
+        X_epoch = np.empty_like(X)
+        t_epoch = np.empty(n)
+        z_buf = np.empty(min(self.batch_size, n))
+        grad = np.empty(d)
+        reg = np.empty(d)
+
+        for _ in range(self.epochs):
+            self.rng.shuffle(order)
+            # mode="clip": indices are valid, and "raise" would buffer out
+            np.take(X, order, axis=0, out=X_epoch, mode="clip")
+            np.take(target, order, out=t_epoch, mode="clip")
+            for start in range(0, n, self.batch_size):
+                stop = min(start + self.batch_size, n)
+                Xb = X_epoch[start:stop]
+                z = z_buf[:stop - start]
+                np.dot(Xb, w, out=z)
+                z += b
+                # sigmoid(z) = (1 + tanh(z / 2)) / 2, in place and without overflow
+                z *= 0.5
+                np.tanh(z, out=z)
+                z += 1.0
+                z *= 0.5
+                z -= t_epoch[start:stop]  # Error p - t
+                scale = lr / (stop - start)
+                np.dot(z, Xb, out=grad)
+                grad *= scale
+                np.multiply(w, decay, out=reg)
+                grad += reg
+                w -= grad
+                if pull_w is not None:
+                    w += pull_w
+                b -= scale * z.sum() + lr * self.mu * b - pull_b
+
+        self.coef_ = w.reshape(1, d)
+        self.intercept_ = np.array([b])
+        self.n_samples_ = n
+        return self
+
+    def decision_function(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_[0] + self.intercept_[0]
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+    def score(self, X, y):
+        return float((self.predict(X) == np.asarray(y)).mean())
+
+
+def make_trainer(kind="sgd", **params):
+    """A LocalTrainer, or the sklearn LogisticRegression the participants used before (kind="lbfgs", params ignored)."""
+    if kind == "lbfgs":
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(max_iter=1000, warm_start=True)
+    if kind != "sgd":
+        raise ValueError(f"Unknown trainer {kind!r}, expected one of {TRAINERS}")
+    return LocalTrainer(**params)
+
+
+def train_local(model, X, y, global_weights=None):
+    """Fits model starting from global_weights = (coef, intercept, classes), or from scratch if None."""
+    if isinstance(model, LocalTrainer):
+        if global_weights is None:
+            return model.fit(X, y)
+        return model.fit(X, y, *global_weights)
+    if global_weights is not None:
+        # sklearn warm start: the lbfgs solver starts from coef_ / intercept_
+        model.coef_, model.intercept_, model.classes_ = (np.array(w) for w in global_weights)
+    return model.fit(X, y)
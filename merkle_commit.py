@@ -0,0 +1,177 @@
+"""
+Merkle commit mode (COMMIT_MODE=merkle): one on-chain root per round instead of
+one submitUpdate transaction per participant.
+
+- Participants sign (round, update hash) with their wallet key and upload; no
+  transaction.
+- When the round closes, the coordinator builds a Merkle tree of the round's
+  verified updates and anchors its root with AICollaboration.commitRoot (which
+  also funds the rewards).
+- Each participant gets its inclusion proof from the server (GET /proof) and
+  calls claimReward; the contract checks the proof and flips one bit of the
+  round's claimed bitmap.
+- Claims close CLAIM_WINDOW after commitRoot; the coordinator then recovers the
+  unclaimed rewards with sweepUnclaimed (POST /control/sweep/{round}).
+
+Hashing matches the contract:
+    leaf   = keccak256(abi.encodePacked(uint256 round, uint256 index, address participant, bytes32 modelHash))
+    parent = keccak256(min(a, b) ++ max(a, b))   (a lone last node moves up unchanged)
+"""
+import requests
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak
+from web3 import Web3
+
+COMMIT_MODES = ("tx", "merkle")
+
+# Functions added to the participants' / bot's ABI in merkle mode
+MERKLE_ABI = [
+    {"inputs": [{"type": "uint256", "name": "_round"}, {"type": "bytes32", "name": "_root"}, {"type": "uint64", "name": "_leafCount"}], "name": "commitRoot", "outputs": [], "stateMutability": "payable", "type": "function"},
+    {"inputs": [{"type": "uint256", "name": "_round"}, {"type": "uint256", "name": "_index"}, {"type": "address", "name": "_participant"}, {"type": "bytes32", "name": "_modelHash"}, {"type": "bytes32[]", "name": "_proof"}], "name": "claimReward", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
+    {"inputs": [{"type": "uint256"}, {"type": "uint256"}], "name": "isClaimed", "outputs": [{"type": "bool"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [{"type": "uint256"}], "name": "roundCommits", "outputs": [{"type": "bytes32", "name": "root"}, {"type": "uint128", "name": "reward"}, {"type": "uint64", "name": "leafCount"}, {"type": "uint64", "name": "claimed"}, {"type": "uint64", "name": "claimDeadline"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [{"type": "uint256", "name": "_round"}], "name": "sweepUnclaimed", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
+    {"anonymous": False, "inputs": [{"indexed": True, "name": "round", "type": "uint256"}, {"indexed": False, "name": "root", "type": "bytes32"}, {"indexed": False, "name": "leafCount", "type": "uint256"}, {"indexed": False, "name": "reward", "type": "uint256"}], "name": "RootCommitted", "type": "event"},
+    {"anonymous": False, "inputs": [{"indexed": True, "name": "round", "type": "uint256"}, {"indexed": False, "name": "leaves", "type": "uint256"}, {"indexed": False, "name": "amount", "type": "uint256"}], "name": "UnclaimedSwept", "type": "event"},
+]
+
+CLAIM_GAS = 120000  # claimReward with a proof of up to ~20 levels (1M leaves)
+
+
+def _to_bytes32(value):
+    return bytes(Web3.to_bytes(hexstr=value) if isinstance(value, str) else value)
+
+
+def leaf_hash(round_num, index, participant, model_hash):
+    return bytes(Web3.solidity_keccak(["uint256", "uint256", "address", "bytes32"],
+                                      [round_num, index, Web3.to_checksum_address(participant),
+                                       _to_bytes32(model_hash)]))
+
+
+def _parent(a, b):
+    return keccak(a + b if a < b else b + a)
+
+
+class MerkleTree:
+    """All levels of the tree, leaves first."""
+
+    def __init__(self, leaves):
+        if not leaves:
+            raise ValueError("A Merkle tree needs at least one leaf")
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    def proof(self, index):
+        """Sibling hashes from the leaf up (levels where the node has no sibling are skipped)."""
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+            index //= 2
+        return proof
+
+
+def verify_proof(leaf, proof, root):
+    node = leaf
+    for sibling in proof:
+        node = _parent(node, sibling)
+    return node == root
+
+
+def build_round_commit(round_num, contributions):
+    """
+    contributions: {participant address: update hash ("0x..." hex)}. Leaves are ordered by address,
+    so anyone holding the same list rebuilds the same root (the bot checks it).
+    Returns {"round", "root", "leaves": [...], "proofs": {address: {...}}}, all hex strings.
+    """
+    participants = sorted(Web3.to_checksum_address(p) for p in contributions)
+    hashes = {Web3.to_checksum_address(p): h for p, h in contributions.items()}
+    leaves = [leaf_hash(round_num, i, p, hashes[p]) for i, p in enumerate(participants)]
+    tree = MerkleTree(leaves)
+    root = Web3.to_hex(tree.root)
+    proofs = {
+        p: {"round": round_num, "index": i, "participant": p, "model_hash": hashes[p], "root": root,
+            "proof": [Web3.to_hex(h) for h in tree.proof(i)]}
+        for i, p in enumerate(participants)
+    }
+    return {"round": round_num, "root": root, "leaves": [Web3.to_hex(leaf) for leaf in leaves],
+            "count": len(leaves), "proofs": proofs}
+
+
+def verify_claim(claim):
+    """Checks a proof dict of build_round_commit against its own root (no chain access)."""
+    leaf = leaf_hash(claim["round"], claim["index"], claim["participant"], claim["model_hash"])
+    return verify_proof(leaf, [_to_bytes32(h) for h in claim["proof"]], _to_bytes32(claim["root"]))
+
+
+# --- Upload signatures (replace the participants' submitUpdate transactions) ---
+
+def commit_message(round_num, model_hash):
+    return encode_defunct(primitive=Web3.solidity_keccak(["uint256", "bytes32"],
+                                                         [round_num, _to_bytes32(model_hash)]))
+
+
+def sign_commit(private_key, round_num, model_hash):
+    """Signature sent with the upload: binds the wallet to this update hash for this round."""
+    return Web3.to_hex(Account.sign_message(commit_message(round_num, model_hash), private_key).signature)
+
+
+def recover_committer(round_num, model_hash, signature):
+    """Address that signed (round, model_hash); raises ValueError on a malformed signature."""
+    try:
+        return Account.recover_message(commit_message(round_num, model_hash), signature=signature)
+    except Exception as e:
+        raise ValueError(f"Invalid commit signature: {e}") from None
+
+
+def claim_reward(w3, contract, claim, sender, private_key, gas_price=None, nonce=None):
+    """Sends claimReward for a proof dict of build_round_commit. Returns the transaction hash."""
+    tx = contract.functions.claimReward(
+        claim["round"], claim["index"], Web3.to_checksum_address(claim["participant"]),
+        _to_bytes32(claim["model_hash"]), [_to_bytes32(h) for h in claim["proof"]],
+    ).build_transaction({
+        "from": sender,
+        "nonce": w3.eth.get_transaction_count(sender, "pending") if nonce is None else nonce,
+        "gas": CLAIM_GAS,
+        "gasPrice": gas_price or w3.eth.gas_price,
+    })
+    signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+    return w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+
+def fetch_and_claim(w3, contract, server_url, round_num, wallet, private_key, session=None, gas_price=None):
+    """
+    Participant side: fetches the proof of (round, wallet) from the server, checks it against the
+    root anchored on chain and claims the reward.
+    Returns "pending" (no proof / root not mined yet), "claimed", "already_claimed", "expired"
+    (claim window over) or "invalid".
+    """
+    res = (session or requests).get(f"{server_url}/proof/{round_num}/{wallet}", timeout=10)
+    if res.status_code == 404:
+        return "pending"
+    res.raise_for_status()
+    claim = res.json()
+    root, _, _, _, claim_deadline = contract.functions.roundCommits(round_num).call()
+    on_chain_root = Web3.to_hex(root)
+    if on_chain_root == "0x" + "0" * 64:
+        return "pending"
+    if (on_chain_root.lower() != claim["root"].lower() or claim["participant"].lower() != wallet.lower()
+            or not verify_claim(claim)):
+        return "invalid"
+    if contract.functions.isClaimed(round_num, claim["index"]).call():
+        return "already_claimed"
+    if w3.eth.get_block("latest")["timestamp"] > claim_deadline:
+        return "expired"
+    claim_reward(w3, contract, claim, wallet, private_key, gas_price=gas_price)
+    return "claimed"
@@ -0,0 +1,233 @@
+"""
+Versioned global-model distribution (GET /model).
+
+Server side, ModelDistributor encodes each published global model once (.flw,
+float64) together with its content-hash ETag and the delta from the previous
+round, so the download burst after a round switch costs a dict lookup per
+request, and clients that already have the model get an empty 304.
+
+Client side, ModelCache keeps the last model (on disk or in memory) and asks
+for it with If-None-Match and ?since=<cached round>: the answer is a 304, a
+delta against the cached round, or the full weights.
+
+Deltas are float64 and only served when base + delta rebuilds the new weights
+bit for bit and is smaller than them (i.e. sparse: few weights moved), so the
+client's model always hashes to the server's ETag (the client checks it, and
+falls back to the full weights if it does not).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from model_store import GLOBAL_OWNER
+from weights_format import (DeltaUpdate, WeightUpdate, decode_update, encode_delta, encode_update, load_update,
+                            update_hash)
+
+MEDIA_TYPE = "application/octet-stream"
+
+
+def model_etag(payload):
+    return f'"{update_hash(payload)[2:]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match evaluation (weak comparison, as required for GET)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ModelDistributor:
+    """
+    Encoded payloads of the last `keep` global models, keyed by round.
+    Older rounds are reloaded from `history` (model_store.ModelStore), or from history_pattern files.
+    """
+
+    def __init__(self, history_pattern="static/global_model_round_{}.joblib",
+                 latest_path="static/global_model.joblib", keep=8, history=None):
+        self.history_pattern = history_pattern
+        self.history = history
+        self.latest_path = latest_path
+        self.keep = keep
+        self.latest_round = None
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # round -> (payload, etag, flat weights, model)
+        self._deltas = {}             # (since, round) -> payload
+
+    def _encode(self, round_num, model):
+        payload = encode_update(model.coef_, model.intercept_, model.classes_,
+                                getattr(model, "feature_names_in_", None), dtype=np.float64)
+        flat = np.concatenate([np.ravel(model.coef_), np.ravel(model.intercept_)]).astype(np.float64)
+        self._models[round_num] = (payload, model_etag(payload), flat, model)
+        self._models.move_to_end(round_num)
+        while len(self._models) > self.keep:
+            old, _ = self._models.popitem(last=False)
+            self._deltas = {k: v for k, v in self._deltas.items() if old not in k}
+        return self._models[round_num]
+
+    def publish(self, round_num, model):
+        """Registers a new global model; its payloads are built now, not on the first request."""
+        with self._lock:
+            self._encode(round_num, model)
+            self.latest_round = round_num
+            previous = [r for r in self._models if r < round_num]
+            if previous:
+                self._delta(max(previous), round_num)
+
+    def _load(self, round_num):
+        """Model of round_num from the joblib history (after a restart). None if unknown."""
+        if round_num is None:
+            path = self.latest_path
+        elif self.history is not None:
+            path = self.history.path(round_num, GLOBAL_OWNER)
+        else:
+            path = self.history_pattern.format(round_num)
+        if path is None or not os.path.exists(path):
+            return None
+        model = joblib.load(path)
+        if round_num is None:
+            round_num = getattr(model, "fl_round_", None)
+            if round_num is None:
+                return None
+            self.latest_round = round_num
+        return round_num, self._encode(round_num, model)
+
+    def get(self, round_num=None):
+        """(round, payload, etag) of the given round (default: latest), or None."""
+        with self._lock:
+            if round_num is None:
+                round_num = self.latest_round
+            if round_num in self._models:
+                payload, etag, _, _ = self._models[round_num]
+                return round_num, payload, etag
+            found = self._load(round_num)
+            if found is None:
+                return None
+            round_num, (payload, etag, _, _) = found
+            return round_num, payload, etag
+
+    def model(self, round_num):
+        """Global model (sklearn) of round_num, or None if it is not available anymore."""
+        with self._lock:
+            if round_num in self._models:
+                return self._models[round_num][3]
+            found = self._load(round_num)
+            return None if found is None else found[1][3]
+
+    def _delta(self, since, round_num):
+        key = (since, round_num)
+        if key not in self._deltas:
+            base = self._models.get(since) or (self._load(since) or (None, None))[1]
+            if base is None:
+                return None
+            _, _, base_flat, _ = base
+            full, _, flat, model = self._models[round_num]
+            if base_flat.shape != flat.shape:
+                return None
+            # Lossless float64 delta, sparse when enough weights did not move (4-byte index + 8-byte
+            # value per entry vs 8 bytes per weight). None (full payload served instead) when float
+            # rounding of base + delta would not give back the exact weights, or when it is not smaller.
+            delta = flat - base_flat
+            changed = np.flatnonzero(delta)
+            rebuilt = base_flat.copy()
+            rebuilt[changed] += delta[changed]
+            payload = None
+            if np.array_equal(rebuilt, flat):
+                top_k = max(1, changed.shape[0]) if changed.shape[0] * 12 < flat.shape[0] * 8 else None
+                payload, _ = encode_delta(delta, model.coef_.shape, since, model.classes_,
+                                          getattr(model, "feature_names_in_", None), dtype=np.float64, top_k=top_k)
+            self._deltas[key] = payload if payload is not None and len(payload) < len(full) else None
+        return self._deltas[key]
+
+    def get_delta(self, round_num, since):
+        """Payload turning the model of `since` into the model of round_num, or None."""
+        with self._lock:
+            if round_num not in self._models:
+                return None
+            return self._delta(since, round_num)
+
+
+class ModelCache:
+    """
+    Participant side: last global model, refreshed with conditional/delta requests.
+    cache_dir=None keeps it in memory only.
+    """
+
+    FILE_NAME = "global_model.flw"
+
+    def __init__(self, server_url, cache_dir=".fl_cache", session=None, timeout=10):
+        import requests
+
+        self.server_url = server_url
+        self.cache_dir = cache_dir
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.model = None
+        self.round = None
+        self.etag = None
+        if cache_dir:
+            path = os.path.join(cache_dir, self.FILE_NAME)
+            if os.path.exists(path):
+                try:
+                    cached = load_update(path)
+                    self._set(cached, cached.header["round"], cached.header["etag"])
+                except Exception:
+                    pass  # Unreadable cache: start from a full download
+
+    def _set(self, weights, round_num, etag):
+        self.model = weights.to_model()
+        self.model.fl_round_ = round_num
+        self.round = round_num
+        self.etag = etag
+
+    def _store(self, weights, round_num, etag):
+        self._set(weights, round_num, etag)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            payload = encode_update(weights.coef, weights.intercept, weights.classes, weights.feature_names,
+                                    dtype=np.float64, extra={"round": round_num, "etag": etag})
+            tmp = os.path.join(self.cache_dir, self.FILE_NAME + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, os.path.join(self.cache_dir, self.FILE_NAME))
+
+    def fetch(self, round_num=None):
+        """
+        Returns the global model (sklearn LogisticRegression with fl_round_), or None
+        when the server has none yet. Only changed bytes travel.
+        """
+        url = f"{self.server_url}/model" if round_num is None else f"{self.server_url}/model/{round_num}"
+        headers, params = {}, {}
+        if self.model is not None:
+            headers["If-None-Match"] = self.etag
+            params["since"] = self.round
+        res = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+        if res.status_code == 304:
+            return self.model
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+
+        update = decode_update(res.content)
+        new_round = int(res.headers["X-Model-Round"])
+        if isinstance(update, DeltaUpdate):
+            if self.model is None or update.base_round != self.round:
+                # Cache and delta disagree: start over with the full weights
+                self.model = None
+                return self.fetch(round_num)
+            coef, intercept = update.apply(self.model.coef_, self.model.intercept_)
+            update = WeightUpdate(coef, intercept, update.classes, update.feature_names)
+            rebuilt = encode_update(coef, intercept, update.classes, update.feature_names, dtype=np.float64)
+            if model_etag(rebuilt) != res.headers["ETag"]:
+                # The patched model is not the server's: never store it under the server ETag
+                self.model = None
+                return self.fetch(round_num)
+        else:
+            update = WeightUpdate(np.array(update.coef), np.array(update.intercept), update.classes,
+                                  update.feature_names)
+        self._store(update, new_round, res.headers["ETag"])
+        return self.model
@@ -0,0 +1,176 @@
+"""
+Content-addressed storage of model files (participant uploads, global model history).
+
+Files are named by the SHA-256 of their bytes (the hash anchored on chain) and
+sharded by round:
+
+    <root>/round_<N>/<sha256><ext>
+    <root>/index.jsonl      one line per stored file: {"round", "owner", "hash", "ext", "size"}
+
+Identical files of a round are stored once. The index is replayed at startup
+into a dict, so finding the file of (round, owner) never lists a directory.
+With keep_rounds > 0, compact() deletes the rounds that fell out of the
+retention window and rewrites the index without them.
+"""
+import glob
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from weights_format import hash_file, update_hash
+
+INDEX_NAME = "index.jsonl"
+GLOBAL_OWNER = "global"  # Owner of the global models in a history store
+
+
+class ModelStore:
+    """Files keyed by (round, owner), stored once per content hash and round."""
+
+    def __init__(self, root, keep_rounds=0):
+        self.root = root
+        self.keep_rounds = keep_rounds  # 0: keep every round
+        self.index_path = os.path.join(root, INDEX_NAME)
+        self._entries = {}  # (round, owner) -> entry
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.index_path):
+            self._replay()
+        self._index = open(self.index_path, "a", encoding="utf-8")
+
+    def _replay(self):
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut by a crash
+                # A later line for the same key (re-upload) replaces the earlier one
+                self._entries[(entry["round"], entry["owner"])] = entry
+
+    # --- Paths ---------------------------------------------------------------
+
+    def round_dir(self, round_num):
+        return os.path.join(self.root, f"round_{round_num}")
+
+    def _object_path(self, entry):
+        return os.path.join(self.round_dir(entry["round"]), entry["hash"][2:] + entry["ext"])
+
+    def relpath(self, path):
+        """Path relative to the store root (what the server announces in the /uploads feed)."""
+        return os.path.relpath(path, self.root)
+
+    def temp_path(self, round_num):
+        """Where to stream a file whose hash is not known yet; then commit() it."""
+        os.makedirs(self.round_dir(round_num), exist_ok=True)
+        return os.path.join(self.round_dir(round_num), f".incoming-{uuid.uuid4().hex}")
+
+    # --- Writes --------------------------------------------------------------
+
+    def commit(self, round_num, owner, temp_path, file_hash, ext, size):
+        """Moves a fully written temp file to its content address and indexes it. Returns the path."""
+        entry = {"round": round_num, "owner": owner, "hash": file_hash.lower(), "ext": ext, "size": size}
+        path = self._object_path(entry)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(temp_path)  # Same bytes already stored for this round
+            else:
+                os.replace(temp_path, path)
+            previous = self._entries.get((round_num, owner))
+            self._entries[(round_num, owner)] = entry
+            self._index.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._index.flush()
+            if previous is not None and previous["hash"] != entry["hash"]:
+                self._release(previous)
+        return path
+
+    def put(self, round_num, owner, payload, ext):
+        """Stores bytes held in memory (e.g. a serialized global model). Returns the path."""
+        temp = self.temp_path(round_num)
+        with open(temp, "wb") as f:
+            f.write(payload)
+        return self.commit(round_num, owner, temp, update_hash(payload), ext, len(payload))
+
+    def adopt(self, path, round_num, owner):
+        """Moves an existing file (older flat layout) into the store."""
+        ext = os.path.splitext(path)[1]
+        temp = self.temp_path(round_num)
+        shutil.move(path, temp)
+        return self.commit(round_num, owner, temp, hash_file(temp), ext, os.path.getsize(temp))
+
+    def _release(self, entry):
+        """Deletes the file of a replaced entry unless another owner of the round has the same bytes."""
+        if not any(e["round"] == entry["round"] and e["hash"] == entry["hash"] for e in self._entries.values()):
+            try:
+                os.remove(self._object_path(entry))
+            except FileNotFoundError:
+                pass
+
+    # --- Reads ---------------------------------------------------------------
+
+    def get(self, round_num, owner):
+        """Index entry of (round, owner), or None."""
+        return self._entries.get((round_num, owner))
+
+    def path(self, round_num, owner):
+        """Path of the file of (round, owner), or None."""
+        entry = self._entries.get((round_num, owner))
+        return self._object_path(entry) if entry is not None else None
+
+    def entries(self):
+        """Every index entry, by round then owner."""
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: (e["round"], e["owner"]))
+
+    def rounds(self):
+        with self._lock:
+            return sorted({r for r, _ in self._entries})
+
+    def disk_usage(self):
+        """(files, bytes) on disk; identical files of a round count once."""
+        with self._lock:
+            objects = {(e["round"], e["hash"], e["ext"]): e["size"] for e in self._entries.values()}
+        return len(objects), sum(objects.values())
+
+    # --- Retention -----------------------------------------------------------
+
+    def compact(self, current_round):
+        """Deletes the rounds older than the last keep_rounds ones (up to current_round). Returns them."""
+        if self.keep_rounds <= 0:
+            return []
+        oldest_kept = current_round - self.keep_rounds + 1
+        with self._lock:
+            dropped = sorted({r for r, _ in self._entries if r < oldest_kept})
+            if not dropped:
+                return []
+            self._entries = {k: e for k, e in self._entries.items() if k[0] >= oldest_kept}
+            # Rewrite the index with the live entries only, then swap it in
+            temp_index = self.index_path + ".tmp"
+            with open(temp_index, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._index.close()
+            os.replace(temp_index, self.index_path)
+            self._index = open(self.index_path, "a", encoding="utf-8")
+        for round_num in dropped:
+            shutil.rmtree(self.round_dir(round_num), ignore_errors=True)
+        return dropped
+
+    def close(self):
+        with self._lock:
+            self._index.close()
+
+
+def adopt_legacy_files(store, pattern, parse):
+    """
+    Moves files of the older flat layout into the store, once.
+    pattern: glob of the old files; parse(file name) -> (round, owner), or None to skip.
+    """
+    moved = 0
+    for path in glob.glob(pattern):
+        key = parse(os.path.basename(path))
+        if key is not None and store.get(*key) is None:
+            store.adopt(path, *key)
+            moved += 1
+    return moved
@@ -0,0 +1,331 @@
+"""
+Hosts many participant identities in one process (simulations, edge gateways).
+
+Each client dataset is read, scaled and split once per worker process and kept
+as NumPy arrays. Local training for all hosted clients runs in a process pool;
+as soon as one client's training finishes, its hash submission and upload run on
+an I/O thread pool, so a slow upload never holds back the other clients.
+
+Usage:
+    python participant_runner.py --clients clients.json [--workers 8]
+
+clients.json: [{"wallet": "0x...", "private_key": "0x...", "dataset": "datasets/client_A.csv", "rows": 600}, ...]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+from web3 import Web3
+
+from contract_reads import ContractReader
+from dataset_cache import load_dataset
+from feature_stats import ScalerClient, chunked_stats
+from local_training import TRAINERS, make_trainer, train_local
+from merkle_commit import COMMIT_MODES, MERKLE_ABI, fetch_and_claim, sign_commit
+from model_distribution import ModelCache
+from weights_format import DeltaEncoder, encode_update, update_hash
+
+load_dotenv()
+
+RPC_URL = os.getenv("RPC_URL")
+CONTRACT_ADDR = os.getenv("CONTRACT_ADDRESS")
+SERVER_URL = os.getenv("SERVER_URL")
+POLL_INTERVAL = 2
+
+# Same functions as Train_Participant.py
+ABI = [
+    {"inputs": [{"internalType": "bytes32","name": "_modelHash","type": "bytes32"}],"name": "submitUpdate","outputs": [],"stateMutability": "nonpayable","type": "function"},
+    {"inputs": [],"name": "trainingActive","outputs": [{"internalType": "bool","name": "","type": "bool"}],"stateMutability": "view","type": "function"},
+    {"inputs": [{"type": "uint256"}, {"type": "address"}], "name": "contributions", "outputs": [{"type": "bytes32", "name": "modelHash"}, {"type": "bool", "name": "isValidated"}, {"type": "bool", "name": "isPaid"}], "stateMutability": "view", "type": "function"}
+] + MERKLE_ABI
+
+
+# --- Worker side (process pool) ---------------------------------------------
+
+# (dataset, rows) -> (X, y) raw features, and
+# (dataset, rows, seed, scaler version) -> (X_train, y_train, X_test, y_test), per worker process
+_raw = {}
+_datasets = {}
+
+
+def _init_worker():
+    # One BLAS thread per worker: the pool already uses every core
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def load_raw_data(dataset, rows=None):
+    """Unscaled features and target of a client CSV, memory-mapped from the dataset cache."""
+    key = (dataset, rows)
+    if key not in _raw:
+        data = load_dataset(dataset, rows)
+        _raw[key] = (data.X, data.y)
+    return _raw[key]
+
+
+def client_feature_stats(dataset, rows=None):
+    """Local statistics sent for the global scaler, streamed over the partition in row chunks."""
+    data = load_dataset(dataset, rows)
+    return chunked_stats(data.chunks(), data.columns)
+
+
+def load_client_data(dataset, rows=None, seed=0, scaler=None):
+    """
+    Scales and splits a client CSV once per scaler; later calls hit the cache.
+    scaler: (version, mean, scale) of the global scaler, or None for a local StandardScaler.
+    """
+    key = (dataset, rows, seed, scaler[0] if scaler is not None else None)
+    if key not in _datasets:
+        from sklearn.model_selection import train_test_split
+
+        X, y = load_raw_data(dataset, rows)
+        if scaler is not None:
+            X = (X - scaler[1]) / scaler[2]
+        else:
+            from sklearn.preprocessing import StandardScaler
+            X = StandardScaler().fit_transform(X)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed)
+        _datasets[key] = (np.ascontiguousarray(X_train), y_train, np.ascontiguousarray(X_test), y_test)
+    return _datasets[key]
+
+
+def train_client(dataset, rows, seed, global_weights, scaler=None, trainer="sgd", train_params=None):
+    """
+    Local training of one client (same model as Train_Participant.py).
+    global_weights: (coef, intercept, classes) or None. trainer / train_params: see local_training.make_trainer.
+    Returns (coef, intercept, classes, acc, n_train).
+    """
+    X_train, y_train, X_test, y_test = load_client_data(dataset, rows, seed, scaler)
+    local_model = train_local(make_trainer(trainer, **(train_params or {})), X_train, y_train, global_weights)
+    acc = float((local_model.predict(X_test) == y_test).mean())
+    return local_model.coef_, local_model.intercept_, local_model.classes_, acc, len(X_train)
+
+
+# --- Runner (main process) --------------------------------------------------
+
+class HostedClient:
+    def __init__(self, wallet, private_key, dataset, rows=None, seed=0, encoder=None):
+        self.wallet = Web3.to_checksum_address(wallet)
+        self.private_key = private_key
+        self.dataset = dataset
+        self.rows = rows
+        self.seed = seed
+        self.encoder = encoder  # DeltaEncoder: compressed deltas (error feedback state is per client)
+        self.last_round = -1
+        self.unclaimed_rounds = []  # Merkle mode: rounds uploaded, reward not claimed yet
+
+
+class ParticipantRunner:
+    def __init__(self, clients, workers=None, io_threads=16, server_url=SERVER_URL, web3=None, contract=None,
+                 trainer="sgd", train_params=None, commit_mode="tx"):
+        self.clients = clients
+        self.commit_mode = commit_mode  # Must match the server's COMMIT_MODE
+        self.trainer = trainer
+        self.train_params = train_params
+        self.server_url = server_url
+        self.web3 = web3 or Web3(Web3.HTTPProvider(RPC_URL))
+        self.contract = contract or self.web3.eth.contract(address=CONTRACT_ADDR, abi=ABI)
+        # One batched read per round for every hosted client (cached below POLL_INTERVAL)
+        self.reader = ContractReader(self.contract, ttl=POLL_INTERVAL / 2)
+        self.train_pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="participant-io")
+        self.session = requests.Session()
+        self.model_cache = ModelCache(server_url, session=self.session)
+        self.scaler_client = ScalerClient(server_url, session=self.session)
+
+    def download_global_weights(self):
+        """One conditional download per round for all hosted clients. Returns ((coef, intercept, classes), round)."""
+        try:
+            model = self.model_cache.fetch()
+            if model is not None:
+                return (model.coef_, model.intercept_, model.classes_), model.fl_round_
+        except Exception as e:
+            print(f"ℹ️ Modèle global indisponible ({e}) : initialisation locale.")
+        return None, None
+
+    def share_feature_stats(self):
+        """Sends the local feature statistics of every hosted client (computed in the training pool)."""
+        stats = self.train_pool.map(client_feature_stats, [c.dataset for c in self.clients],
+                                    [c.rows for c in self.clients])
+        sent = 0
+        for client, client_stats in zip(self.clients, stats):
+            try:
+                self.scaler_client.submit(client.wallet, client_stats)
+                sent += 1
+            except Exception as e:
+                print(f"ℹ️ {client.wallet[:10]}... statistiques non envoyées ({e})")
+        print(f"📐 Statistiques locales envoyées pour {sent}/{len(self.clients)} clients.")
+
+    def download_scaler(self):
+        """(version, mean, scale) of the global scaler, or None (local scaling)."""
+        try:
+            scaler = self.scaler_client.fetch()
+            if scaler is not None:
+                return self.scaler_client.version, scaler.mean_, scaler.scale_
+        except Exception as e:
+            print(f"ℹ️ Scaler global indisponible ({e}) : scaler local.")
+        return None
+
+    def submit_and_upload(self, client, round_number, result, gas_price, base=None):
+        """
+        I/O stage of one client: hash on chain (or signed, in merkle mode), then upload the weights.
+        base: (global weights, round).
+        """
+        coef, intercept, classes, acc, n_train = result
+        if client.encoder is not None and base is not None and base[1] is not None:
+            (base_coef, base_intercept, _), base_round = base
+            payload = client.encoder.encode(coef, intercept, base_coef, base_intercept, base_round, classes,
+                                            n_samples=n_train)
+        else:
+            base_round = base[1] if base is not None else None
+            payload = encode_update(coef, intercept, classes, n_samples=n_train,
+                                    extra={"base_round": base_round} if base_round is not None else None)
+        data = {"participant_address": client.wallet, "accuracy": acc, "n_samples": n_train}
+        if self.commit_mode == "merkle":
+            data["signature"] = sign_commit(client.private_key, round_number, update_hash(payload))
+        else:
+            tx = self.contract.functions.submitUpdate(update_hash(payload)).build_transaction({
+                'from': client.wallet, 'nonce': self.web3.eth.get_transaction_count(client.wallet, 'pending'),
+                'gas': 200000, 'gasPrice': gas_price,
+            })
+            signed_tx = self.web3.eth.account.sign_transaction(tx, client.private_key)
+            self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        files = {"file": (f"model_weights_{client.wallet}.flw", payload, "application/octet-stream")}
+        self.session.post(f"{self.server_url}/upload", files=files, data=data, timeout=30).raise_for_status()
+        client.last_round = round_number
+        if self.commit_mode == "merkle":
+            client.unclaimed_rounds.append(round_number)
+        return acc
+
+    def claim_rewards(self, client):
+        """Merkle mode: claims the client's rewards whose round root is on chain. Returns how many."""
+        claimed, pending = 0, []
+        for round_number in client.unclaimed_rounds:
+            status = fetch_and_claim(self.web3, self.contract, self.server_url, round_number, client.wallet,
+                                     client.private_key, session=self.session)
+            if status == "pending":
+                pending.append(round_number)
+            elif status == "claimed":
+                claimed += 1
+            elif status == "invalid":
+                print(f"🚨 {client.wallet[:10]}... preuve du Round {round_number} incohérente : non réclamée")
+            elif status == "expired":
+                print(f"⌛ {client.wallet[:10]}... délai de réclamation du Round {round_number} expiré")
+        client.unclaimed_rounds = pending
+        return claimed
+
+    def claim_all(self):
+        """Claims on the I/O pool for every client with unclaimed rounds."""
+        futures = {self.io_pool.submit(self.claim_rewards, c): c for c in self.clients if c.unclaimed_rounds}
+        claimed = 0
+        for future in wait(futures).done:
+            try:
+                claimed += future.result()
+            except Exception as e:
+                print(f"⚠️ {futures[future].wallet[:10]}... réclamation impossible : {e}")
+        if claimed:
+            print(f"💰 {claimed} récompense(s) réclamée(s) (preuves Merkle)")
+        return claimed
+
+    def run_round(self, round_number):
+        """Trains every hosted client that has not contributed yet, pipelining the uploads."""
+        pending = [c for c in self.clients if c.last_round < round_number]
+        # Merkle mode: nothing on chain per contribution, last_round is the only record
+        calls = [("trainingActive", ())] + ([("contributions", (round_number, c.wallet)) for c in pending]
+                                            if self.commit_mode == "tx" else [])
+        active, *contribs = self.reader.read_many(calls)
+        if not active:
+            print("❌ Erreur : L'entraînement n'est pas actif sur la blockchain.")
+            return 0
+        submitted = ([int.from_bytes(contrib[0], 'big') != 0 for contrib in contribs] if self.commit_mode == "tx"
+                     else [False] * len(pending))
+        for client, done in zip(pending, submitted):
+            if done:
+                client.last_round = round_number
+        todo = [c for c, done in zip(pending, submitted) if not done]
+        if not todo:
+            return 0
+
+        print(f"\n🚀 ROUND {round_number} : {len(todo)} client(s) à entraîner")
+        t0 = time.perf_counter()
+        global_weights, global_round = self.download_global_weights()
+        base = (global_weights, global_round) if global_weights is not None else None
+        scaler = self.download_scaler()
+        gas_price = self.web3.eth.gas_price
+        training = {self.train_pool.submit(train_client, c.dataset, c.rows, c.seed, global_weights, scaler,
+                                           self.trainer, self.train_params): c
+                    for c in todo}
+        uploads = {}
+        while training:
+            finished, _ = wait(training, return_when=FIRST_COMPLETED)
+            for future in finished:
+                client = training.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ {client.wallet[:10]}... entraînement en échec : {e}")
+                    continue
+                uploads[self.io_pool.submit(self.submit_and_upload, client, round_number, result, gas_price,
+                                            base)] = client
+
+        done_count = 0
+        for future in wait(uploads).done:
+            client = uploads[future]
+            try:
+                acc = future.result()
+                done_count += 1
+                print(f"   ✔️ {client.wallet[:10]}... Précision {acc * 100:.2f}%")
+            except Exception as e:
+                print(f"   ⚠️ {client.wallet[:10]}... envoi en échec : {e}")
+        print(f"🏁 Round {round_number} : {done_count}/{len(todo)} contributions en {time.perf_counter() - t0:.1f}s")
+        return done_count
+
+    def monitor(self):
+        print(f"🛰️ Mode automatique activé ({len(self.clients)} clients hébergés). En attente des rounds...")
+        self.share_feature_stats()
+        while True:
+            try:
+                res = self.session.get(f"{self.server_url}/status", timeout=5).json()
+                if res["training_active"]:
+                    self.run_round(res["current_round"])
+                if self.commit_mode == "merkle":
+                    self.claim_all()
+            except Exception as e:
+                print(f"⚠️ Serveur injoignable, nouvelle tentative... ({e})")
+            time.sleep(POLL_INTERVAL)
+
+
+def load_clients(path, encoding="full", top_k=None):
+    with open(path, encoding="utf-8") as f:
+        return [HostedClient(c["wallet"], c["private_key"], c["dataset"], c.get("rows"), c.get("seed", 0),
+                             DeltaEncoder(encoding, top_k) if encoding != "full" else None)
+                for c in json.load(f)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hosts many participants in one process")
+    parser.add_argument("--clients", required=True, help="JSON list of {wallet, private_key, dataset, rows}")
+    parser.add_argument("--workers", type=int, default=None, help="Training processes (default: CPU count)")
+    parser.add_argument("--io-threads", type=int, default=16, help="Concurrent submissions/uploads")
+    parser.add_argument("--encoding", choices=["full", "float16", "int8"], default="full",
+                        help="Upload full weights or compressed deltas against the global model")
+    parser.add_argument("--top-k", type=float, default=None, help="Fraction of the delta kept")
+    parser.add_argument("--trainer", choices=TRAINERS, default="sgd",
+                        help="NumPy mini-batch SGD (default) or the sklearn lbfgs fit")
+    parser.add_argument("--epochs", type=int, default=5, help="Local epochs per round (sgd)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=0.1)
+    parser.add_argument("--mu", type=float, default=0.0, help="FedProx proximal term, 0 = FedAvg")
+    parser.add_argument("--commit-mode", choices=COMMIT_MODES, default=os.getenv("COMMIT_MODE", "tx"),
+                        help="submitUpdate per round (tx) or signed uploads + Merkle reward claims (must match the server)")
+    args = parser.parse_args()
+    clients = load_clients(args.clients, args.encoding, args.top_k)
+    train_params = {"epochs": args.epochs, "batch_size": args.batch_size, "lr": args.lr, "mu": args.mu}
+    ParticipantRunner(clients, args.workers, args.io_threads, trainer=args.trainer,
+                      train_params=train_params, commit_mode=args.commit_mode).monitor()
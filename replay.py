@@ -0,0 +1,180 @@
+"""
+Offline replay of a training history: re-scores every stored global model (and,
+with --participants, every stored participant update) on one or more test sets.
+
+All weights are loaded once and stacked; each test set is then scored in one
+vectorized pass (EvaluationEngine.evaluate_many: one GEMM + one bincount per
+group of models sharing their classes). The result is a columnar file:
+
+    {"format": "fl-replay-1", "test_sets": [...], "rows": n,
+     "columns": {"round": [...], "participant": [...], "test_set": [index in test_sets],
+                 "n_samples": [...], "accuracy": [...], "loss": [...], "precision": [...],
+                 "recall": [...], "f1": [...]}}
+
+Written to static/replay_metrics.json by default, where the dashboard picks it
+up (one request instead of paging through /metrics). A .npz output path writes
+the same columns as NumPy arrays.
+
+Usage (from the repository root):
+    python replay.py --test-set datasets/server_test.csv datasets/client_B.csv --participants
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from evaluation import EvaluationEngine
+from dataset_cache import load_dataset
+from feature_stats import scale_features
+from model_store import GLOBAL_OWNER, INDEX_NAME, ModelStore
+from state_store import GLOBAL_PARTICIPANT
+from weights_format import DeltaUpdate, StaleUpdateError, UpdateFormatError, load_any
+
+FORMAT = "fl-replay-1"
+METRIC_COLUMNS = ("accuracy", "loss", "precision", "recall", "f1")
+
+
+def _open_store(root):
+    """Existing store of root, or None (the replay never creates one)."""
+    if not os.path.exists(os.path.join(root, INDEX_NAME)):
+        return None
+    return ModelStore(root)
+
+
+def load_models(history_dir="static/history", uploads_dir="received_models", participants=False,
+                allow_pickle=False):
+    """
+    Every stored model as a list of dicts {round, participant, hash, n_samples, coef, intercept, classes}:
+    the global models first, then (participants=True) the updates, deltas applied to their base round.
+    Global models are the server's own joblib files; pickled (.joblib) updates are only
+    loaded with allow_pickle=True, otherwise skipped.
+    """
+    models, global_weights = [], {}
+    history = _open_store(history_dir)
+    for entry in history.entries() if history is not None else []:
+        if entry["owner"] != GLOBAL_OWNER:
+            continue
+        update = load_any(history.path(entry["round"], GLOBAL_OWNER), allow_pickle=True)
+        global_weights[entry["round"]] = (update.coef, update.intercept)
+        models.append({"round": entry["round"], "participant": GLOBAL_PARTICIPANT, "hash": entry["hash"],
+                       "n_samples": 0, "coef": update.coef, "intercept": update.intercept,
+                       "classes": update.classes})
+
+    uploads = _open_store(uploads_dir) if participants else None
+    skipped = 0
+    for entry in uploads.entries() if uploads is not None else []:
+        try:
+            update = load_any(uploads.path(entry["round"], entry["owner"]), allow_pickle)
+            if isinstance(update, DeltaUpdate):
+                if update.base_round not in global_weights:
+                    raise StaleUpdateError(f"global model of round {update.base_round} not stored")
+                coef, intercept = update.apply(*global_weights[update.base_round])
+            else:
+                coef, intercept = update.coef, update.intercept
+        except (OSError, UpdateFormatError, StaleUpdateError) as e:
+            print(f"⚠️ {entry['owner'][:10]}... round {entry['round']} ignoré : {e}")
+            skipped += 1
+            continue
+        models.append({"round": entry["round"], "participant": entry["owner"], "hash": entry["hash"],
+                       "n_samples": update.n_samples, "coef": coef, "intercept": intercept,
+                       "classes": update.classes})
+    return models, skipped
+
+
+def load_test_set(path, scaler_path="static/feature_scaler.json"):
+    """(X, y) of a test CSV (dataset cache), scaled like the server does: global scaler if published, else its own."""
+    data = load_dataset(path)
+    X, y = data.X, data.y
+    if scaler_path and os.path.exists(scaler_path):
+        with open(scaler_path, encoding="utf-8") as f:
+            return scale_features(X, json.load(f), data.columns), y
+    from sklearn.preprocessing import StandardScaler
+    return StandardScaler().fit_transform(X), y
+
+
+def replay(models, test_sets):
+    """
+    Scores every model on every test set. test_sets: {name: (X, y)}.
+    Returns the columns ({name: list}) of the result, one row per (test set, model).
+    """
+    # One stacked array per group of models with the same classes and shape
+    groups = {}
+    for i, m in enumerate(models):
+        groups.setdefault((tuple(m["classes"]), np.shape(m["coef"])), []).append(i)
+    stacked = {key: (np.stack([np.asarray(models[i]["coef"], dtype=np.float64) for i in idx]),
+                     np.stack([np.ravel(models[i]["intercept"]).astype(np.float64) for i in idx]))
+               for key, idx in groups.items()}
+
+    columns = {name: [] for name in ("round", "participant", "test_set", "n_samples") + METRIC_COLUMNS}
+    for t, (X, y) in enumerate(test_sets.values()):
+        engine = EvaluationEngine(X, y)
+        metrics = [None] * len(models)
+        for key, idx in groups.items():
+            coefs, intercepts = stacked[key]
+            keys = [models[i]["hash"] for i in idx]
+            for i, result in zip(idx, engine.evaluate_many(coefs, intercepts, list(key[0]), keys)):
+                metrics[i] = result
+        for m, result in zip(models, metrics):
+            columns["round"].append(m["round"])
+            columns["participant"].append(m["participant"])
+            columns["test_set"].append(t)
+            columns["n_samples"].append(int(m["n_samples"]))
+            for name in METRIC_COLUMNS:
+                columns[name].append(round(result[name], 6))
+    return columns
+
+
+def write_result(path, columns, test_set_names):
+    """Columnar JSON (or .npz) result, written to a temp file then renamed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = path + ".tmp"
+    if path.endswith(".npz"):
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        with open(temp, "wb") as f:
+            np.savez_compressed(f, test_sets=np.asarray(test_set_names), **arrays)
+    else:
+        result = {"format": FORMAT, "created_at": time.time(), "test_sets": test_set_names,
+                  "rows": len(columns["round"]), "columns": columns}
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(result, f, separators=(",", ":"))
+    os.replace(temp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-scores the stored global models (and updates) on test sets")
+    parser.add_argument("--test-set", nargs="+", default=["datasets/server_test.csv"], help="Test CSV files")
+    parser.add_argument("--participants", action="store_true", help="Also score every stored participant update")
+    parser.add_argument("--history", default="static/history", help="Global-model store (model_store.py)")
+    parser.add_argument("--uploads", default="received_models", help="Participant-update store")
+    parser.add_argument("--allow-pickle", action="store_true",
+                        help="Also load legacy pickled (.joblib) updates (trusted stores only)")
+    parser.add_argument("--scaler", default="static/feature_scaler.json",
+                        help="Global scaler statistics (each test set is scaled on its own if absent)")
+    parser.add_argument("--output", default="static/replay_metrics.json", help=".json (dashboard) or .npz")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    models, skipped = load_models(args.history, args.uploads, args.participants, args.allow_pickle)
+    if not models:
+        print(f"❌ Aucun modèle stocké dans {args.history}")
+        return
+    test_sets = {os.path.splitext(os.path.basename(p))[0]: load_test_set(p, args.scaler) for p in args.test_set}
+    t1 = time.perf_counter()
+    columns = replay(models, test_sets)
+    t2 = time.perf_counter()
+    write_result(args.output, columns, list(test_sets))
+
+    print(f"📼 {len(models)} modèle(s) ({skipped} ignoré(s)) × {len(test_sets)} jeu(x) de test : "
+          f"chargement {t1 - t0:.2f}s, évaluation {1000 * (t2 - t1):.1f} ms")
+    for t, name in enumerate(test_sets):
+        rows = [i for i, (p, ts) in enumerate(zip(columns["participant"], columns["test_set"]))
+                if ts == t and p == GLOBAL_PARTICIPANT]
+        curve = " ".join(f"R{columns['round'][i]}:{columns['accuracy'][i]:.3f}" for i in rows)
+        print(f"   {name:<16} {curve}")
+    print(f"💾 Résultat : {args.output} ({len(columns['round'])} lignes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,31 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+import anyio
+import asyncio
+import contextlib
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import shutil
+import json
 import os
+import re
+import time
 import uvicorn
+import telemetry
 from web3 import Web3
-from agreggate import aggregate_and_publish 
+from tx_manager import TransactionManager
+from work_queue import JobQueue, QueueFull, Scheduler
+from events import EventBroker, format_sse
+from model_distribution import MEDIA_TYPE, ModelDistributor, etag_matches
+from model_store import GLOBAL_OWNER, ModelStore, adopt_legacy_files
+from state_store import GLOBAL_PARTICIPANT, StateStore
+from agreggate import BufferedAggregator, OnlineRoundAggregator, publish_global_model
+from aggregators import make_aggregator
+from contract_reads import ContractReader
+from merkle_commit import COMMIT_MODES, MERKLE_ABI, build_round_commit, recover_committer
+from feature_stats import merge_stats, moments, scale_features
+from dataset_cache import load_dataset
+from weights_format import (DELTA_VERSION, FILE_EXTENSION, HASH_CHUNK_SIZE, DeltaUpdate, StaleUpdateError,
+                            UpdateFormatError, UpdateHasher, decode_update, is_update_bytes, load_any, read_header)
 
 app = FastAPI(title="Orchestrateur FL Automatique")
 
@@ -15,55 +35,115 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Has-More", "ETag", "X-Model-Round"],  # /metrics pagination, /model version
 )
 
 # --- BLOCKCHAIN CONFIGURATION -
 
 RPC_URL = os.getenv("RPC_URL")
 CONTRACT_ADDR = os.getenv("CONTRACT_ADDRESS")
-COORD_ADDR = Web3.to_checksum_address("Adress of the Coordinator")
+COORD_ADDR = os.getenv("WALLET_ADDRESS")
 PRIVATE_KEY =  os.getenv("PRIVATE_KEY")
+ROUND_SYNC_TIMEOUT = 300  # Seconds to wait for the startNewRound receipt
+# Default round deadline in seconds (0 = wait for every expected participant)
+ROUND_DEADLINE = float(os.getenv("ROUND_DEADLINE", "0"))
+# Rounds of uploads and global-model history kept on disk (0 = all)
+MODEL_RETENTION_ROUNDS = int(os.getenv("MODEL_RETENTION_ROUNDS", "0"))
+# "tx": one submitUpdate per participant, verified by the bot; "merkle": signed uploads,
+# one commitRoot per round and rewards claimed by the participants (merkle_commit.py)
+COMMIT_MODE = os.getenv("COMMIT_MODE", "tx")
+if COMMIT_MODE not in COMMIT_MODES:
+    raise ValueError(f"COMMIT_MODE must be one of {COMMIT_MODES}, got {COMMIT_MODE!r}")
+# Reward per contribution, sent with commitRoot (same amount as the bot's validateAndPay)
+MERKLE_REWARD_WEI = int(os.getenv("MERKLE_REWARD_WEI", Web3.to_wei(0.00001, "ether")))
+COMMIT_ROOT_GAS = 250000  # 3 storage slots with solc, 5 with the Vyper port (build/AICollaboration.vy)
+SWEEP_GAS = 80000
+# Legacy pickled (.joblib) uploads: unpickling runs arbitrary code, refused unless set to 1
+ALLOW_LEGACY_PICKLE_UPLOADS = os.getenv("ALLOW_LEGACY_PICKLE_UPLOADS", "0") == "1"
 
 
 
-web3 = Web3(Web3.HTTPProvider(RPC_URL))
+# Every JSON-RPC call is timed (fl_rpc_seconds), the tx_manager ones included
+web3 = Web3(telemetry.instrument_provider(Web3.HTTPProvider(RPC_URL)))
 # Minimal ABI for control functions
 ABI = [
     {"inputs": [], "name": "startNewRound", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
     {"inputs": [], "name": "currentRound", "outputs": [{"type": "uint256"}], "stateMutability": "view", "type": "function"}
-]
+] + MERKLE_ABI
 contract = web3.eth.contract(address=CONTRACT_ADDR, abi=ABI)
+reader = ContractReader(contract)
+# Shared nonce/gas-price/receipt management (gasPrice +30% to ensure fast validation)
+tx_manager = TransactionManager(web3, COORD_ADDR, PRIVATE_KEY, gas_price_multiplier=1.3)
 
 # Serve static folder
 if not os.path.exists("static"): os.makedirs("static")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-state = {
-    "training_active": False,
-    "current_round": 0,
-    "target_rounds": 0,
-    "expected_participants": 0,
-    "received_this_round": 0,
-    "metrics": []
-}
+# Indexed, thread-safe session state; set STATE_LOG to persist it across restarts
+state = StateStore(os.getenv("STATE_LOG"))
+
+# Dashboard push: every state change is forwarded to the /events subscribers
+broker = EventBroker()
+state.add_listener(broker.publish)
+METRICS_PAGE_MAX = 10000
 
 UPLOAD_FOLDER = "received_models"
-if not os.path.exists(UPLOAD_FOLDER): os.makedirs(UPLOAD_FOLDER)
+# Uploads by content hash, in one directory per round, indexed by (round, participant)
+upload_store = ModelStore(UPLOAD_FOLDER, keep_rounds=MODEL_RETENTION_ROUNDS)
+# Files of the older flat layout (round_<N>_<address>.<ext>) are moved into the store once
+_LEGACY_UPLOAD = re.compile(r"round_(\d+)_(.+)\.(flw|joblib)$")
+if adopt_legacy_files(upload_store, f"{UPLOAD_FOLDER}/round_*_*.*",
+                      lambda name: (int(m[1]), m[2]) if (m := _LEGACY_UPLOAD.match(name)) else None):
+    print(f"📦 Anciennes mises à jour rangées dans {UPLOAD_FOLDER}/round_<N>/")
+# Uploads up to this size are kept in memory for validation; larger ones are re-read with mmap
+INLINE_VALIDATION_BYTES = 16 * 1024 * 1024
+
+# Merkle mode: round -> build_round_commit() of the round (proofs served by GET /proof)
+MERKLE_FOLDER = "merkle_commits"
+round_commits = {}
+
+# Online aggregation: round -> running FedAvg of the updates verified so far
+round_aggregators = {}
+# Asynchronous mode: verified updates of any round wait here until the next flush
+update_buffer = {"buffer": None, "rebuilt": False}
+SCHEDULER_INTERVAL = 0.5  # Seconds between two deadline checks
+
+# Background work: uploads are validated in parallel, round work (verification,
+# aggregation, chain sync) is serialized on a single worker
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", os.cpu_count() or 4))
+validation_queue = JobQueue("validation", max_workers=VALIDATION_WORKERS, max_pending=1024)
+round_queue = JobQueue("round", max_workers=1, max_pending=4096)
+# Deadlines (round, async buffer) are watched here, not in request handlers
+scheduler = Scheduler("rounds", interval=SCHEDULER_INTERVAL)
+
+# Read when GET /metrics/prometheus is scraped
+telemetry.register_gauge("fl_queue_depth", "Jobs waiting or running, by queue",
+                         lambda: {(("queue", q.name),): q.depth for q in (validation_queue, round_queue)})
+telemetry.register_gauge("fl_rounds_in_flight", "Sync rounds with a running aggregation",
+                         lambda: len(round_aggregators))
+telemetry.register_gauge("fl_buffered_updates", "Updates waiting in the async buffer",
+                         lambda: len(update_buffer["buffer"]) if update_buffer["buffer"] is not None else 0)
+telemetry.register_gauge("fl_tx_pending", "Coordinator transactions queued or waiting for a receipt",
+                         lambda: tx_manager.pending)
+telemetry.register_gauge("fl_current_round", "Current round of the session", lambda: state["current_round"])
+
+def find_update_file(round_num, participant):
+    """Path of a participant upload (.flw binary update, or legacy .joblib), from the store index."""
+    return upload_store.path(round_num, participant)
 
 # --- GLOBAL MODEL EVALUATION ---
-import pandas as pd
-from sklearn.metrics import accuracy_score, log_loss, precision_score, recall_score, f1_score
 from sklearn.linear_model import LogisticRegression
 import joblib
 import numpy as np
+from evaluation import EvaluationEngine, FAILED_METRICS
 
 # Loading data at startup (Global - Test Set Only)
 try:
-    df_test = pd.read_csv("datasets/server_test.csv")
-    
-    X_global_test_raw = df_test.drop(['Churn', 'customerID'], axis=1)
+    # Memory-mapped from the dataset cache (the CSV is parsed on the first start only)
+    test_set = load_dataset("datasets/server_test.csv")
+    X_global_test_raw = test_set.X
 
-    y_global_test = df_test['Churn']
+    y_global_test = test_set.y
     
     # Scaling (Important for Logistic Regression)
     from sklearn.preprocessing import StandardScaler
@@ -74,33 +154,100 @@ try:
 except Exception as e:
     print(f"⚠️ Erreur chargement dataset serveur: {e}")
     # Fallback in case (should not happen if setup_datasets.py ran)
-    X_global_test = []
-    y_global_test = []
+    X_global_test = np.empty((0, 0))
+    y_global_test = np.empty(0)
 
-def calculate_metrics(model, X, y):
-    """Calculates complete metrics for a given model."""
+# Contiguous copy of the test set + memoized results (keyed by model hash)
+eval_engine = EvaluationEngine(X_global_test, y_global_test)
+
+# Federated scaling: local statistics of the participants, merged when a session starts
+FEATURE_SCALER_PATH = "static/feature_scaler.json"
+scaler_stats = {}
+feature_scaler = {"stats": None}
+
+def apply_feature_scaler(stats):
+    """Scales the server test set with the global scaler (same feature space as the participants)."""
+    global X_global_test, eval_engine
+    feature_scaler["stats"] = stats
     try:
-        y_pred = model.predict(X)
-        y_prob = model.predict_proba(X)
-        
-        return {
-            "accuracy": float(accuracy_score(y, y_pred)),
-            "loss": float(log_loss(y, y_prob)),
-            "precision": float(precision_score(y, y_pred, average='macro')),
-            "recall": float(recall_score(y, y_pred, average='macro')),
-            "f1": float(f1_score(y, y_pred, average='macro'))
-        }
+        X_global_test = scale_features(X_global_test_raw, stats, test_set.columns)
+        eval_engine = EvaluationEngine(X_global_test, y_global_test)
+    except Exception as e:
+        print(f"⚠️ Scaler global inapplicable au jeu de test : {e}")
+
+if os.path.exists(FEATURE_SCALER_PATH):
+    with open(FEATURE_SCALER_PATH, encoding="utf-8") as f:
+        apply_feature_scaler(json.load(f))
+
+def calculate_metrics(model, X=None, y=None, key=None):
+    """Calculates complete metrics for a given model (server test set by default)."""
+    try:
+        engine = eval_engine if X is None or X is X_global_test else EvaluationEngine(X, y)
+        return engine.evaluate_model(model, key)
     except Exception as e:
         print(f"⚠️ Erreur Metrics : {e}")
-        return {"accuracy": 0.0, "loss": 99.9, "precision": 0.0, "recall": 0.0, "f1": 0.0}
+        return dict(FAILED_METRICS)
 
-def evaluate_global_model():
-    """Loads the global model and evaluates it on the server test set."""
-    model_path = "static/global_model.joblib"
-    if not os.path.exists(model_path): return None
-    
-    model = joblib.load(model_path)
-    metrics = calculate_metrics(model, X_global_test, y_global_test)
+def calculate_update_metrics(update, key=None):
+    """Same as calculate_metrics, straight from decoded weights (no sklearn object)."""
+    try:
+        if isinstance(update, DeltaUpdate):
+            base_model = global_model_of(update.base_round)
+            coef, intercept = update.apply(base_model.coef_, base_model.intercept_)
+            return eval_engine.evaluate(coef, intercept, update.classes, key)
+        return eval_engine.evaluate_update(update, key)
+    except Exception as e:
+        print(f"⚠️ Erreur Metrics : {e}")
+        return dict(FAILED_METRICS)
+
+GLOBAL_MODEL_PATH = "static/global_model.joblib"
+# Global model of every round, content-addressed like the uploads
+history_store = ModelStore("static/history", keep_rounds=MODEL_RETENTION_ROUNDS)
+_LEGACY_HISTORY = re.compile(r"global_model_round_(\d+)\.joblib$")
+adopt_legacy_files(history_store, "static/global_model_round_*.joblib",
+                   lambda name: (int(m[1]), GLOBAL_OWNER) if (m := _LEGACY_HISTORY.match(name)) else None)
+# Latest published global model: the base of the next round's delta updates
+latest_global = {"round": None, "model": None}
+
+# Encoded global models per round (ETag + deltas), served by GET /model
+model_distributor = ModelDistributor(latest_path=GLOBAL_MODEL_PATH, history=history_store)
+
+def get_latest_global():
+    """(round, model) of the latest published global model; read from disk once after a restart."""
+    if latest_global["model"] is None and os.path.exists(GLOBAL_MODEL_PATH):
+        model = joblib.load(GLOBAL_MODEL_PATH)
+        latest_global.update(round=getattr(model, "fl_round_", None), model=model)
+    return latest_global["round"], latest_global["model"]
+
+def global_model_of(round_num):
+    """Global model published at round_num (latest, or from the history), or None."""
+    latest_round, latest_model = get_latest_global()
+    if round_num == latest_round:
+        return latest_model
+    return model_distributor.model(round_num)
+
+def check_delta_base(base_round):
+    """
+    Raises StaleUpdateError unless base_round is the latest published global model
+    (async mode: one of the last max_staleness ones, still available).
+    """
+    latest_round, latest_model = get_latest_global()
+    if latest_model is not None and base_round == latest_round:
+        return
+    if (state["mode"] == "async" and latest_model is not None and isinstance(base_round, int)
+            and 0 < latest_round - base_round <= state["max_staleness"]
+            and model_distributor.model(base_round) is not None):
+        return
+    raise StaleUpdateError(f"Delta basé sur le Round {base_round}, modèle global actuel : Round {latest_round}")
+
+def evaluate_global_model(model=None):
+    """Evaluates the global model (given, or loaded from disk) on the server test set."""
+    if model is None:
+        model_path = GLOBAL_MODEL_PATH
+        if not os.path.exists(model_path): return None
+        model = joblib.load(model_path)
+    with telemetry.span("evaluate_global", state["current_round"]):
+        metrics = calculate_metrics(model)
     
     print(f"⭐ Global Model Results -> Acc: {metrics['accuracy']:.2f}, F1: {metrics['f1']:.2f}, Loss: {metrics['loss']:.2f}")
     return metrics
@@ -109,22 +256,20 @@ def sync_blockchain_round():
     """Calls the Smart Contract to move to the next round on Sepolia."""
     try:
         print(f"🔗 Synchronisation Blockchain : Activation du Round...")
-        nonce = web3.eth.get_transaction_count(COORD_ADDR, 'pending')
-        # Increase gasPrice by 30% to ensure fast validation
-        gas_price = int(web3.eth.gas_price * 1.3)
-        
-        tx = contract.functions.startNewRound().build_transaction({
-            'from': COORD_ADDR,
-            'nonce': nonce,
-            'gas': 100000,
-            'gasPrice': gas_price
-        })
-        signed = web3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = web3.eth.send_raw_transaction(signed.raw_transaction)
-        
         # Crucial wait for participant and bot to see the change
-        web3.eth.wait_for_transaction_receipt(tx_hash)
-        blockchain_round = contract.functions.currentRound().call()
+        ptx = tx_manager.send(contract.functions.startNewRound(), gas=100000, label="startNewRound")
+        try:
+            receipt = ptx.wait(ROUND_SYNC_TIMEOUT)
+        finally:
+            # Queue + nonce/gas price + broadcast, then mining until the receipt
+            if ptx.first_sent_at is not None:
+                round_num = state["current_round"]
+                telemetry.record("round_sync_send", ptx.first_sent_at - ptx.queued_at, round_num)
+                telemetry.record("round_sync_receipt", time.monotonic() - ptx.first_sent_at, round_num)
+        if receipt["status"] != 1:
+            raise RuntimeError(f"startNewRound reverted ({web3.to_hex(receipt['transactionHash'])})")
+        reader.invalidate("currentRound")  # Just moved: the cached value is stale
+        blockchain_round = reader.current_round()
         print(f"✅ Blockchain synchronisée au Round {blockchain_round}")
         return blockchain_round
     except Exception as e:
@@ -133,31 +278,116 @@ def sync_blockchain_round():
 
 @app.get("/status")
 async def get_status():
-    return state
+    # Metric entries are served by /metrics (paginated) and /events (stream)
+    return state.status()
+
+def submit_job(queue, kind, fn, *args):
+    """Queues background work; a full queue is reported as 503 (backpressure)."""
+    try:
+        return queue.submit(kind, fn, *args)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def next_deadline():
+    """Deadline of a round starting now (epoch seconds), or None without round deadline."""
+    return time.time() + state["round_deadline"] if state["round_deadline"] > 0 else None
+
+def publish_feature_scaler():
+    """Round worker: merges the statistics received so far into the session's global scaler."""
+    stats = merge_stats(scaler_stats.values())
+    with open(FEATURE_SCALER_PATH, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    apply_feature_scaler(stats)
+    state.update_session(feature_scaler={k: stats[k] for k in ("version", "participants", "count")})
+    print(f"📐 Scaler global publié : {stats['participants']} participant(s), {stats['count']} lignes "
+          f"(version {stats['version']})")
+
+def start_session(rounds, participants, aggregator=None, buffering=None, deadline=None):
+    # The feature space is fixed for the whole session
+    if scaler_stats:
+        publish_feature_scaler()
 
-@app.post("/control/start_auto")
-def start_auto(rounds: int, participants: int):
-    # ... (content remains implicitly same, just header change)
     # Activate New Round on Blockchain AND get its real number
     new_round = sync_blockchain_round()
     
     if new_round is None:
         return {"status": "error", "message": "Blockchain sync failed"}
 
-    state["training_active"] = True
-    state["current_round"] = new_round
     # Target is no longer "3" but "Current Round + 3"
-    state["target_rounds"] = new_round + rounds - 1
+    state.update_session(
+        training_active=True,
+        current_round=new_round,
+        target_rounds=new_round + rounds - 1,
+        expected_participants=participants,
+        aggregator=aggregator or {"name": "fedavg"},
+        **(buffering or {"mode": "sync"}),
+        **(deadline or {"round_deadline": 0, "quorum": 1}),
+    )
+    state.update_session(round_deadline_at=next_deadline())
+    update_buffer["buffer"] = None
     
-    state["expected_participants"] = participants
-    state["received_this_round"] = 0
-    
-    print(f"🚀 Session automatique lancée : Rounds {new_round} à {state['target_rounds']}")
-    return {"status": "started", "start_round": new_round}
+    print(f"🚀 Session automatique lancée : Rounds {new_round} à {state['target_rounds']} "
+          f"(agrégation {state['aggregator']['name']}, mode {state['mode']})")
+    return {"status": "started", "start_round": new_round, "aggregator": state["aggregator"]}
+
+@app.post("/control/start_auto")
+async def start_auto(rounds: int, participants: int, aggregator: str = "fedavg", trim_ratio: float = None,
+                     byzantine: int = None, select: int = None, mode: str = "sync", buffer_size: int = None,
+                     buffer_deadline: float = 30.0, staleness_exponent: float = 0.5, max_staleness: int = 4,
+                     round_deadline: float = None, quorum: int = None):
+    """
+    aggregator: fedavg (default), trimmed_mean (trim_ratio), median, krum or
+    multi_krum (byzantine, select). See aggregators.py.
+    mode=async: FedBuff-style rounds. A round closes as soon as buffer_size
+    verified updates (default: half of participants) are buffered, or
+    buffer_deadline seconds after the first one; updates trained on an older
+    global model (up to max_staleness rounds) are weighted by
+    1 / (1 + staleness) ** staleness_exponent. With MODEL_RETENTION_ROUNDS set,
+    it must keep at least max_staleness + 1 rounds (the bases of stale updates).
+    round_deadline (sync mode, seconds, default ROUND_DEADLINE, 0 = none): the
+    round is then aggregated with the verified updates if there are at least
+    `quorum` of them (default: the minimum of the aggregator); participants that
+    did not make it are recorded as dropped.
+    """
+    params = {"trim_ratio": trim_ratio} if aggregator == "trimmed_mean" else {}
+    if aggregator in ("krum", "multi_krum"):
+        params = {"byzantine": byzantine, "select": select}
+    try:
+        rule = make_aggregator(aggregator, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail=f"Mode inconnu : {mode} (sync ou async)")
+    buffering = {"mode": mode}
+    per_round = participants
+    if mode == "async":
+        per_round = buffer_size or max(1, participants // 2)
+        if buffer_deadline <= 0 or staleness_exponent < 0 or max_staleness < 0:
+            raise HTTPException(status_code=400, detail="buffer_deadline > 0, staleness_exponent >= 0, max_staleness >= 0")
+        if 0 < MODEL_RETENTION_ROUNDS < max_staleness + 1:
+            # Stale updates are folded against the global model they were trained from: keep it on disk
+            raise HTTPException(status_code=400, detail=f"max_staleness={max_staleness} nécessite "
+                                                        f"MODEL_RETENTION_ROUNDS >= {max_staleness + 1} "
+                                                        f"(actuellement {MODEL_RETENTION_ROUNDS})")
+        buffering.update(buffer_size=per_round, buffer_deadline=buffer_deadline,
+                         staleness_exponent=staleness_exponent, max_staleness=max_staleness)
+    if per_round < rule.min_participants():
+        raise HTTPException(status_code=400, detail=f"{aggregator} nécessite au moins "
+                                                    f"{rule.min_participants()} participants par round.")
+    round_deadline = ROUND_DEADLINE if round_deadline is None else round_deadline
+    quorum = quorum or rule.min_participants()
+    if round_deadline < 0 or not rule.min_participants() <= quorum <= participants:
+        raise HTTPException(status_code=400, detail=f"round_deadline >= 0 et quorum entre "
+                                                    f"{rule.min_participants()} et {participants}")
+    deadline = {"round_deadline": round_deadline, "quorum": quorum}
+    # The blockchain call runs on the round worker: the event loop keeps serving uploads
+    job = submit_job(round_queue, "start_session", start_session, rounds, participants, rule.describe(), buffering,
+                     deadline)
+    return await asyncio.wrap_future(job.future)
 
 @app.post("/control/stop")
-def stop_round():
-    state["training_active"] = False
+async def stop_round():
+    state.update_session(training_active=False)
     return {"status": "stopped"}
 
 from pydantic import BaseModel
@@ -167,123 +397,630 @@ class VerifyPayload(BaseModel):
     participant_address: str
     round: int
 
+class FeatureStatsPayload(BaseModel):
+    participant_address: str
+    count: int
+    sum: list[float]
+    sumsq: list[float]
+    columns: list[str] = None
+
+@app.post("/scaler/stats")
+async def submit_feature_stats(payload: FeatureStatsPayload):
+    """Local feature statistics of a participant (feature_stats.local_stats), merged at the next session start."""
+    if state["training_active"]:
+        raise HTTPException(status_code=409, detail="Session en cours : le scaler global est figé jusqu'à la fin.")
+    stats = payload.model_dump(exclude={"participant_address"})
+    reference = next(iter(scaler_stats.values()), None)
+    try:
+        # Validated now: a bad submission must not block the merge of the others
+        merge_stats([stats] if reference is None else [reference, stats])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    scaler_stats[payload.participant_address.lower()] = stats
+    return {"participants": len(scaler_stats)}
+
+@app.get("/scaler")
+async def get_feature_scaler(request: Request, response: Response):
+    """Global scaler of the session: merged statistics plus mean/scale. ETag is its version."""
+    stats = feature_scaler["stats"]
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Aucun scaler global publié")
+    etag = f'"{stats["version"]}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    mean, _, scale = moments(stats)
+    response.headers["ETag"] = etag
+    return {**stats, "mean": mean.tolist(), "scale": scale.tolist()}
+
 @app.post("/webhook/verify_contribution")
-def verify_contribution(payload: VerifyPayload):
+async def verify_contribution(payload: VerifyPayload):
     """Called by the Bot when a participant is confirmed on Blockchain."""
     # Safety Check: Ignore if system is stopped
     if not state["training_active"]:
         return {"status": "inactive"}
 
-    print(f"🔐 Webhook: Verifying {payload.participant_address} for Round {payload.round}")
+    # Folding, aggregation and round switch run on the (single) round worker, in order
+    job = submit_job(round_queue, "verify", process_verification, payload.participant_address, payload.round)
+    return {"status": "queued", "job_id": job.id}
+
+def fold_participant(aggregator, round_num, participant):
+    """Adds a verified upload to the round's running sum. Returns an error status or None."""
+    fpath = find_update_file(round_num, participant)
+    if not fpath:
+        print(f"⚠️ Error: No file found for verified participant {participant}.")
+        return "missing_file"
+    try:
+        with telemetry.span("model_load", round_num):
+            update = load_any(fpath, ALLOW_LEGACY_PICKLE_UPLOADS)
+        entry = state.get_metric(round_num, participant)
+        with telemetry.span("aggregate_fold", round_num):
+            aggregator.fold(participant, update, update.n_samples or entry.get("n_samples", 0))
+    except Exception as e:
+        print(f"⚠️ Mise à jour illisible {fpath} : {e}")
+        return "invalid_update"
+    return None
+
+def process_verification(participant_address, round_num):
+    """Round worker: marks a contribution verified and aggregates when the round is complete."""
+    if not state["training_active"]:
+        return {"status": "inactive"}
+
+    print(f"🔐 Webhook: Verifying {participant_address} for Round {round_num}")
     
-    # 1. Update verification status
-    updated = False
-    for m in state["metrics"]:
-        if m["round"] == payload.round and m["participant"] == payload.participant_address:
-            m["verified"] = True
-            updated = True
-            break
-            
-    if not updated:
+    # 1. Update verification status (O(1) index lookup)
+    entry, first_time = state.mark_verified(round_num, participant_address)
+    if entry is None:
         return {"status": "ignored"}
+    if state["mode"] == "async":
+        # Late verifications of a closed round still count: they go to the next buffer
+        return process_buffered(participant_address, round_num) if first_time else {"status": "duplicate"}
 
-    # 2. Check logic (Aggregation)
-    # Ensure we don't re-aggregate the SAME round multiple times
-    if state["current_round"] in state.get("aggregated_rounds", []):
+    # Ensure we don't re-aggregate the SAME round multiple times (late verification)
+    if state.is_aggregated(round_num):
         return {"status": "already_aggregated"}
 
-    current_round_metrics = [m for m in state["metrics"] if m["round"] == state["current_round"] and m.get("participant") != "GLOBAL_MODEL"]
-    verified_count = sum(1 for m in current_round_metrics if m.get("verified"))
-    
+    # 2. Fold the verified update into the round's running sum (idempotent)
+    aggregator = get_round_aggregator(round_num, skip=participant_address)
+    if participant_address in aggregator.participants:
+        return {"status": "duplicate"}
+    status = fold_participant(aggregator, round_num, participant_address)
+    if status:
+        return {"status": status}
 
-    if verified_count >= state["expected_participants"]:
-        # LOCK: Mark round as aggregated immediately to prevent race conditions
-        if "aggregated_rounds" not in state: state["aggregated_rounds"] = []
-        state["aggregated_rounds"].append(state["current_round"])
-
-        print(f"🔄 Round {state['current_round']} Verified & Complete. Aggregating...")
-        
-        # Collect ONLY verified files
-        prefix = f"round_{state['current_round']}_"
-        files = []
-        for m in current_round_metrics:
-            if m.get("verified"):
-                fpath = f"{UPLOAD_FOLDER}/round_{state['current_round']}_{m['participant']}.joblib"
-                if os.path.exists(fpath):
-                    files.append(fpath)
-        
-        if files:
-            aggregate_and_publish(files, round_num=state['current_round'])
-            
-            # Global Model Evaluation
-            global_metrics = evaluate_global_model()
-            if global_metrics:
-                entry = {"round": state["current_round"], "participant": "GLOBAL_MODEL"}
-                entry.update(global_metrics)
-                state["metrics"].append(entry)
-            
-            # Next Round Logic
-            if state["current_round"] < state["target_rounds"]:
-                next_round = sync_blockchain_round()
-                if next_round:
-                    state["current_round"] = next_round
-                    state["received_this_round"] = 0
-                    print(f"➡️ Passage automatique au Round {state['current_round']}")
-                else:
-                    print("⚠️ Erreur Critique : Impossible de synchro le round suivant.")
-                    state["training_active"] = False
-            else:
-                state["training_active"] = False
-                print("🏁 Entraînement terminé !")
+    # 3. Check logic (Aggregation): O(1), the sums are already there
+    if (round_num == state["current_round"] and len(aggregator) >= state["expected_participants"]
+            # LOCK: atomic check-and-set, only one worker can aggregate a round
+            and state.try_mark_aggregated(round_num)):
+        del round_aggregators[round_num]
+
+        print(f"🔄 Round {state['current_round']} Verified & Complete. Publishing ({len(aggregator)} updates)...")
+        with telemetry.span("aggregate", round_num, rule=aggregator.rule.name):
+            global_model = aggregator.to_model()
+        excluded = [(round_num, p) for p in aggregator.excluded_participants()]
+        close_round(global_model, aggregator.rule.name, excluded, {"closed_by": "complete", "updates": len(aggregator)})
+
+    return {"status": "verified"}
+
+def get_round_aggregator(round_num, skip=None):
+    """Running aggregation of a sync round; after a restart, rebuilt from the uploads already verified (except skip)."""
+    aggregator = round_aggregators.get(round_num)
+    if aggregator is None:
+        base_round, base_model = get_latest_global()
+        aggregator = round_aggregators[round_num] = OnlineRoundAggregator(
+            round_num, base_model, base_round, make_aggregator(**state["aggregator"]))
+        for participant in state.verified_participants(round_num):
+            if participant != skip:
+                fold_participant(aggregator, round_num, participant)
+    return aggregator
+
+def record_dropouts(round_num, aggregator):
+    """
+    Participants missing from a round closed at its deadline: uploads not verified
+    in time (flagged dropped="deadline") and previous-round participants that sent nothing.
+    """
+    uploaded = set(state.round_participants(round_num))
+    for participant in uploaded - set(aggregator.participants):
+        entry = state.get_metric(round_num, participant)
+        if entry is not None:
+            state.update_metric(entry, dropped="deadline")
+    previous = set(state.round_participants(round_num - 1))
+    return sorted((uploaded - set(aggregator.participants)) | (previous - uploaded))
+
+def close_on_deadline(round_num):
+    """Round worker (sync mode): aggregates what was verified when the round deadline fires."""
+    if not state["training_active"] or round_num != state["current_round"] or state.is_aggregated(round_num):
+        return {"status": "closed"}
+    deadline_at = state["round_deadline_at"]
+    if deadline_at is None or time.time() < deadline_at:
+        return {"status": "pending"}
+    aggregator = get_round_aggregator(round_num)
+    if len(aggregator) < state["quorum"]:
+        state.update_session(round_deadline_at=next_deadline())
+        print(f"⏰ Round {round_num} : quorum non atteint ({len(aggregator)}/{state['quorum']}), échéance prolongée.")
+        return {"status": "quorum_not_met", "updates": len(aggregator)}
+    if not state.try_mark_aggregated(round_num):
+        return {"status": "already_aggregated"}
+    del round_aggregators[round_num]
+
+    dropped = record_dropouts(round_num, aggregator)
+    print(f"⏰ Round {round_num} clos à l'échéance : {len(aggregator)}/{state['expected_participants']} mises à jour, "
+          f"{len(dropped)} participant(s) en retard. Publishing...")
+    with telemetry.span("aggregate", round_num, rule=aggregator.rule.name):
+        global_model = aggregator.to_model()
+    excluded = [(round_num, p) for p in aggregator.excluded_participants()]
+    close_round(global_model, aggregator.rule.name, excluded,
+                {"closed_by": "deadline", "updates": len(aggregator), "dropped_participants": dropped})
+    return {"status": "aggregated", "round": round_num, "updates": len(aggregator), "dropped": dropped}
+
+def load_round_commit(round_num):
+    """Merkle commit of a round (memory, else merkle_commits/round_<N>.json), or None."""
+    commit = round_commits.get(round_num)
+    if commit is None:
+        try:
+            with open(os.path.join(MERKLE_FOLDER, f"round_{round_num}.json"), encoding="utf-8") as f:
+                commit = round_commits[round_num] = json.load(f)
+        except FileNotFoundError:
+            return None
+    return commit
+
+def commit_round_root(round_num):
+    """
+    Round worker (merkle mode): one commitRoot for every verified upload of the round,
+    funded with their rewards. Proofs are saved before the transaction is sent.
+    """
+    entries = {p: state.get_metric(round_num, p) for p in state.verified_participants(round_num)}
+    if not entries:
+        return None
+    commit = build_round_commit(round_num, {p: e["hash"] for p, e in entries.items()})
+    commit["files"] = {Web3.to_checksum_address(p): e["file"] for p, e in entries.items()}  # For GET /merkle
+    os.makedirs(MERKLE_FOLDER, exist_ok=True)
+    path = os.path.join(MERKLE_FOLDER, f"round_{round_num}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(commit, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+    round_commits[round_num] = commit
+    # Not awaited: startNewRound follows with the next nonce, participants claim once it is mined
+    ptx = tx_manager.send(contract.functions.commitRoot(round_num, commit["root"], commit["count"]),
+                          value=MERKLE_REWARD_WEI * commit["count"], gas=COMMIT_ROOT_GAS,
+                          label=f"commitRoot R{round_num} x{commit['count']}")
+    print(f"🌳 Racine Merkle du Round {round_num} ({commit['count']} contributions) : {commit['root'][:18]}...")
+    return ptx
+
+def close_round(global_model, rule_name, excluded=(), summary=None):
+    """
+    Round worker: publishes the new global model, evaluates it and moves the contract
+    to the next round. summary (how the round closed) goes into the global metric entry.
+    """
+    closed_round = state['current_round']
+    with telemetry.span("publish", closed_round):
+        publish_global_model(global_model, round_num=closed_round, history=history_store)
+        latest_global.update(round=closed_round, model=global_model)
+        model_distributor.publish(closed_round, global_model)
+    print(f"🚀 NOUVEAU MODÈLE FL ({rule_name}) PUBLIÉ : Round {state['current_round']}")
+    # Updates rejected by Krum stay verified (and paid) but are flagged for the dashboard
+    for key in excluded:
+        excluded_entry = state.get_metric(*key)
+        if excluded_entry is not None:
+            state.update_metric(excluded_entry, excluded_from_aggregate=True)
+    if excluded:
+        print(f"🛡️ {len(excluded)} mise(s) à jour écartée(s) par {rule_name}")
+
+    # Global Model Evaluation (in memory, no reload from disk)
+    global_metrics = evaluate_global_model(global_model)
+    if global_metrics:
+        entry = {"round": state["current_round"], "participant": GLOBAL_PARTICIPANT}
+        entry.update(global_metrics)
+        entry.update(summary or {})
+        state.add_metric(entry)
+
+    telemetry.ROUNDS.inc(reason=(summary or {}).get("closed_by", "complete"))
+
+    # Retention: uploads and global models of the rounds before the last MODEL_RETENTION_ROUNDS
+    try:
+        dropped = upload_store.compact(closed_round)
+        history_store.compact(closed_round)
+        if dropped:
+            print(f"🧹 Rounds {dropped[0]}..{dropped[-1]} supprimés du disque (rétention {MODEL_RETENTION_ROUNDS})")
+    except OSError as e:
+        print(f"⚠️ Compaction du stockage impossible : {e}")
+
+    # Merkle mode: the round's contributions are anchored (and paid) in one transaction
+    if COMMIT_MODE == "merkle":
+        try:
+            commit_round_root(closed_round)
+        except Exception as e:
+            print(f"⚠️ Engagement Merkle du Round {closed_round} impossible : {e}")
+
+    # Next Round Logic
+    if state["current_round"] < state["target_rounds"]:
+        next_round = sync_blockchain_round()
+        if next_round:
+            state.update_session(current_round=next_round, round_deadline_at=next_deadline())
+            print(f"➡️ Passage automatique au Round {state['current_round']}")
         else:
-             print("⚠️ Error: No files found for verified participants.")
+            print("⚠️ Erreur Critique : Impossible de synchro le round suivant.")
+            state.update_session(training_active=False)
+    else:
+        state.update_session(training_active=False)
+        print("🏁 Entraînement terminé !")
+    # TRACE_EXPORT: one JSON line with every span of the closed round (chain sync included)
+    telemetry.tracer.flush(closed_round, rule=rule_name, **(summary or {}))
+
+# --- Asynchronous (buffered) rounds ---
 
+def fold_buffered(buffer, round_num, participant):
+    """Adds a verified upload of any round to the buffer, weighted by its staleness. Returns an error status or None."""
+    fpath = find_update_file(round_num, participant)
+    if not fpath:
+        print(f"⚠️ Error: No file found for verified participant {participant}.")
+        return "missing_file"
+    try:
+        with telemetry.span("model_load", state["current_round"]):
+            update = load_any(fpath, ALLOW_LEGACY_PICKLE_UPLOADS)
+        entry = state.get_metric(round_num, participant)
+        latest_round, latest_model = get_latest_global()
+        # Global model the participant trained from (older than the latest one if it was slow)
+        base_round = update.base_round if isinstance(update, DeltaUpdate) else update.header.get("base_round")
+        declared = base_round is not None
+        if not declared:
+            # Not named (first round, legacy client): the one published before its upload round
+            base_round = round_num - 1
+        base_model = global_model_of(base_round)
+        if base_model is None and not declared:
+            base_model = latest_model  # Trained from scratch: delta against the current model
+        staleness = max(0, latest_round - base_round) if latest_round is not None else 0
+        if staleness > state["max_staleness"] or (declared and base_model is None):
+            print(f"⏳ Mise à jour trop ancienne ignorée : {participant} (Round {base_round})")
+            state.update_metric(entry, staleness=staleness, dropped="too_stale")
+            return "too_stale"
+        buffer.fold((round_num, participant), update, update.n_samples or entry.get("n_samples", 0),
+                    base_model, staleness)
+    except Exception as e:
+        print(f"⚠️ Mise à jour illisible {fpath} : {e}")
+        return "invalid_update"
+    return None
+
+def get_update_buffer():
+    """Current buffer, created on the latest global model (after a restart, refilled from the log)."""
+    if update_buffer["buffer"] is None:
+        base_round, base_model = get_latest_global()
+        update_buffer["buffer"] = BufferedAggregator(base_model, base_round, make_aggregator(**state["aggregator"]),
+                                                     state["staleness_exponent"])
+        if not update_buffer["rebuilt"]:
+            update_buffer["rebuilt"] = True
+            # Verified updates that were neither aggregated nor dropped before the restart
+            for past_round in range(max(0, state["current_round"] - state["max_staleness"]), state["current_round"] + 1):
+                for participant in state.verified_participants(past_round):
+                    entry = state.get_metric(past_round, participant)
+                    if entry is not None and "aggregated_in" not in entry and "dropped" not in entry:
+                        fold_buffered(update_buffer["buffer"], past_round, participant)
+    return update_buffer["buffer"]
+
+def process_buffered(participant_address, round_num):
+    """Round worker (async mode): buffers a verified update and flushes the buffer when it is full."""
+    buffer = get_update_buffer()
+    if (round_num, participant_address) in buffer.participants:
+        return {"status": "duplicate"}
+    status = fold_buffered(buffer, round_num, participant_address)
+    if status:
+        return {"status": status}
+    if len(buffer) >= state["buffer_size"]:
+        flush_buffer("buffer_full")
     return {"status": "verified"}
 
-@app.post("/upload")
-def upload_weight(participant_address: str = Form(...), accuracy: float = Form(...), file: UploadFile = File(...)):
-    if not state["training_active"]:
-        raise HTTPException(status_code=403, detail="L'entraînement n'est pas actif.")
+def flush_buffer(reason):
+    """Round worker (async mode): aggregates the buffered updates into a new global model."""
+    buffer = update_buffer["buffer"]
+    if buffer is None or not len(buffer) or state["mode"] != "async" or not state["training_active"]:
+        return {"status": "empty"}
+    if reason == "deadline" and not buffer.expired(state["buffer_deadline"]):
+        return {"status": "pending"}  # Flushed (buffer full) since this job was queued
+    round_num = state["current_round"]
+    if state.is_aggregated(round_num):
+        return {"status": "already_aggregated"}
+    if len(buffer) < buffer.rule.min_participants():
+        # e.g. Krum at a deadline with too few updates: keep them and wait one more deadline
+        buffer.opened_at = time.monotonic()
+        print(f"⏳ Round {round_num} : {len(buffer)} mise(s) à jour, {buffer.rule.name} en demande "
+              f"{buffer.rule.min_participants()}. Délai prolongé.")
+        return {"status": "pending"}
 
-    file_location = f"{UPLOAD_FOLDER}/round_{state['current_round']}_{participant_address}.joblib"
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # --- VALIDATION SERVEUR ---
+    mean_staleness = sum(buffer.staleness.values()) / len(buffer)
+    print(f"🔄 Round {round_num} ({reason}) : {len(buffer)} mises à jour, staleness moyenne {mean_staleness:.2f}. "
+          f"Publishing...")
     try:
-        part_model = joblib.load(file_location)
-        metrics = calculate_metrics(part_model, X_global_test, y_global_test)
+        with telemetry.span("aggregate", round_num, rule=buffer.rule.name):
+            global_model = buffer.to_model()
+    except ValueError as e:
+        # The buffer is kept: the next flush retries with more updates
+        print(f"⚠️ Agrégation du Round {round_num} impossible : {e}")
+        return {"status": "error", "detail": str(e)}
+    # Only once the model exists: mark the round and hand new updates to a fresh buffer
+    if not state.try_mark_aggregated(round_num):
+        return {"status": "already_aggregated"}
+    update_buffer["buffer"] = None
+    for key, staleness in buffer.staleness.items():
+        entry = state.get_metric(*key)
+        if entry is not None:
+            state.update_metric(entry, aggregated_in=round_num, staleness=staleness)
+    close_round(global_model, buffer.rule.name, buffer.excluded_participants(),
+                {"closed_by": reason, "updates": len(buffer), "mean_staleness": mean_staleness})
+    return {"status": "aggregated", "round": round_num, "updates": len(buffer)}
+
+# --- Scheduler checks (deadlines) ---
+
+def check_round_deadline():
+    """Sync mode: queues the deadline close of the current round once its deadline has passed."""
+    deadline_at = state["round_deadline_at"]
+    if (state["mode"] == "sync" and state["training_active"] and deadline_at is not None
+            and time.time() >= deadline_at):
+        scheduler.schedule_once(round_queue, "round_deadline", close_on_deadline, state["current_round"])
+
+def check_buffer_deadline():
+    """Async mode: queues a flush when the buffer deadline has passed."""
+    buffer = update_buffer["buffer"]
+    if (buffer is not None and state["mode"] == "async" and state["training_active"]
+            and buffer.expired(state["buffer_deadline"])):
+        scheduler.schedule_once(round_queue, "flush", flush_buffer, "deadline")
+
+scheduler.every_tick("round_deadline", check_round_deadline)
+scheduler.every_tick("buffer_deadline", check_buffer_deadline)
+scheduler.start()
+
+def validate_upload(metric_entry, file_location, contents=None):
+    """
+    Validation worker: server-side metrics of an upload, written into its metric entry.
+    contents: the uploaded bytes, or None to memory-map the file.
+    """
+    participant_address = metric_entry["participant"]
+    fields = {}
+    try:
+        if file_location.endswith(FILE_EXTENSION):
+            # Pickle-free path: weights are read straight from the buffer
+            with telemetry.span("model_load", metric_entry["round"]):
+                update = decode_update(contents) if contents is not None else load_any(file_location)
+            if isinstance(update, DeltaUpdate):
+                check_delta_base(update.base_round)
+            if update.n_samples > 0:
+                fields["n_samples"] = update.n_samples
+            # Memoized by the upload hash (computed once, while writing): identical weights cost nothing
+            with telemetry.span("calculate_metrics", metric_entry["round"]):
+                metrics = calculate_update_metrics(update, key=metric_entry["hash"])
+        else:
+            if not ALLOW_LEGACY_PICKLE_UPLOADS:
+                raise UpdateFormatError(f"{file_location}: not a .flw update (pickle uploads disabled)")
+            with telemetry.span("model_load", metric_entry["round"]):
+                part_model = joblib.load(file_location)
+            with telemetry.span("calculate_metrics", metric_entry["round"]):
+                metrics = calculate_metrics(part_model)
         print(f"gh Validation (Server-Side) {participant_address} -> Acc: {metrics['accuracy']:.2f}")
+        fields["validation"] = "done"
+    except (UpdateFormatError, StaleUpdateError) as e:
+        print(f"⚠️ Mise à jour invalide {participant_address} : {e}")
+        metrics = dict(FAILED_METRICS)
+        fields["validation"] = "failed"
     except Exception as e :
-        print("ereur:{e}")
-        metrics = {"accuracy": 0.0, "loss": 99.9, "precision": 0.0, "recall": 0.0, "f1": 0.0}
+        print(f"ereur:{e}")
+        metrics = dict(FAILED_METRICS)
+        fields["validation"] = "failed"
+
+    # We add other metrics calculated by the server (Loss, F1, etc.)
+    fields["loss"] = metrics["loss"]
+    fields["f1"] = metrics["f1"]
+    fields["precision"] = metrics["precision"]
+    fields["recall"] = metrics["recall"]
+    fields["server_accuracy"] = metrics["accuracy"] # Backup for comparison
+    state.update_metric(metric_entry, **fields)
+    return metrics
+
+@app.post("/upload")
+async def upload_weight(participant_address: str = Form(...), accuracy: float = Form(...), n_samples: int = Form(0),
+                        file: UploadFile = File(...), signature: str = Form(None)):
+    if not state["training_active"]:
+        raise HTTPException(status_code=403, detail="L'entraînement n'est pas actif.")
+    # Backpressure: the job slots are taken before touching the disk. Once the upload is stored
+    # and recorded, queuing its jobs cannot fail anymore (a retry would duplicate the entry and file)
+    try:
+        with validation_queue.reserve() as validation_slot, \
+                (round_queue.reserve() if COMMIT_MODE == "merkle" else contextlib.nullcontext()) as verify_slot:
+            return await receive_upload(participant_address, accuracy, n_samples, file, signature,
+                                        validation_slot, verify_slot)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Serveur saturé, réessayez.", headers={"Retry-After": "1"})
+
+async def receive_upload(participant_address, accuracy, n_samples, file, signature, validation_slot, verify_slot):
+    """Stores and records an upload; its jobs go to the queue slots reserved by upload_weight."""
+    round_num = state["current_round"]
+    t_start = time.perf_counter()
+    # Stream to disk in chunks; each chunk is hashed as it is written (the only hash of these bytes)
+    chunk = await file.read(HASH_CHUNK_SIZE)
+    ext = FILE_EXTENSION if is_update_bytes(chunk) else ".joblib"
+    if ext != FILE_EXTENSION and not ALLOW_LEGACY_PICKLE_UPLOADS:
+        telemetry.UPLOADS.inc(status="bad_format")
+        raise HTTPException(status_code=400, detail="Format non supporté : mise à jour .flw attendue")
+    if ext == FILE_EXTENSION:
+        # Deltas must be based on the current global model: reject stale ones before storing them
+        try:
+            version, header = read_header(chunk)
+            if version == DELTA_VERSION:
+                check_delta_base(header.get("base_round"))
+        except StaleUpdateError as e:
+            telemetry.UPLOADS.inc(status="stale")
+            raise HTTPException(status_code=409, detail=str(e))
+        except UpdateFormatError:
+            pass  # Reported by the validation worker
+    # Streamed to a temp file, then renamed to its content hash (round_<N>/<sha256><ext>)
+    temp_location = upload_store.temp_path(round_num)
+    hasher = UpdateHasher()
+    chunks = []  # Small updates stay in memory for validation
+    write_s = 0.0  # Hashing + disk writes; the rest of the loop is spent receiving
+    async with await anyio.open_file(temp_location, "wb") as out:
+        while chunk:
+            t0 = time.perf_counter()
+            hasher.update(chunk)
+            await out.write(chunk)
+            write_s += time.perf_counter() - t0
+            if chunks is not None:
+                chunks.append(chunk)
+                if hasher.size > INLINE_VALIDATION_BYTES:
+                    chunks = None
+            chunk = await file.read(HASH_CHUNK_SIZE)
+    contents = b"".join(chunks) if chunks is not None else None
+    if COMMIT_MODE == "merkle":
+        # The signature of (round, hash) replaces the submitUpdate transaction checked by the bot
+        try:
+            signer = recover_committer(round_num, hasher.hexdigest(), signature or "")
+        except ValueError:
+            signer = None
+        if signer is None or signer.lower() != participant_address.lower():
+            os.remove(temp_location)
+            telemetry.UPLOADS.inc(status="bad_signature")
+            raise HTTPException(status_code=401, detail="Signature de l'engagement invalide")
+    file_location = upload_store.commit(round_num, participant_address, temp_location, hasher.hexdigest(), ext,
+                                        hasher.size)
+    telemetry.record("upload_receive", time.perf_counter() - t_start - write_s, round_num)
+    telemetry.record("upload_write", write_s, round_num)
+    telemetry.UPLOAD_BYTES.observe(hasher.size)
+    telemetry.UPLOADS.inc(status="received")
 
+    # Server metrics are filled in by the validation worker
     metric_entry = {
-        "round": state["current_round"], 
+        "round": round_num, 
         "participant": participant_address,
         "verified": False,
-        "accuracy": accuracy
+        "accuracy": accuracy,
+        "n_samples": n_samples,
+        "loss": None, "f1": None, "precision": None, "recall": None, "server_accuracy": None,
+        "validation": "pending",
+        "file": upload_store.relpath(file_location),  # Relative to received_models/
+        "hash": hasher.hexdigest(),  # Compared by the bot with the on-chain hash
+        "size": hasher.size,
     }
-    
-    # We add other metrics calculated by the server (Loss, F1, etc.)
-    metric_entry["loss"] = metrics["loss"]
-    metric_entry["f1"] = metrics["f1"]
-    metric_entry["precision"] = metrics["precision"]
-    metric_entry["recall"] = metrics["recall"]
-    metric_entry["server_accuracy"] = metrics["accuracy"] # Backup for comparison
-    
-    state["metrics"].append(metric_entry)
-    
-    state["received_this_round"] += 1
+    state.add_metric(metric_entry)
+    job = validation_slot.submit("validate", validate_upload, metric_entry, file_location, contents)
+    if COMMIT_MODE == "merkle":
+        # Signature already checked: verified now, anchored with the round's root
+        verify_slot.submit("verify", process_verification, participant_address, round_num)
+        print(f"📩 Reçu {participant_address} (signé, vérifié)")
+        return {"message": "Verified (signed commit)", "job_id": job.id}
     print(f"📩 Reçu {participant_address} (En attente de validation Blockchain...)")
     
     # REMOVED: Aggregation logic is now in /webhook/verify_contribution
             
-    return {"message": "Pending Blockchain Verification"}
+    return {"message": "Pending Blockchain Verification", "job_id": job.id}
+
+@app.get("/model")
+@app.get("/model/{round_num}")
+async def get_global_model(request: Request, round_num: int = None, since: int = None):
+    """
+    Global model weights (.flw) of a round (default: latest). ETag is the content hash:
+    If-None-Match answers 304, and ?since=<round the client has> returns only a delta.
+    """
+    found = model_distributor.get(round_num)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Aucun modèle global publié")
+    model_round, payload, etag = found
+    headers = {"ETag": etag, "X-Model-Round": str(model_round), "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if since is not None and since != model_round:
+        delta = model_distributor.get_delta(model_round, since)
+        if delta is not None:
+            return Response(delta, media_type=MEDIA_TYPE, headers=headers)
+    return Response(payload, media_type=MEDIA_TYPE, headers=headers)
+
+@app.get("/jobs")
+async def get_jobs():
+    """Depth of the background queues."""
+    return {"validation": validation_queue.stats(), "round": round_queue.stats()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = validation_queue.get(job_id) or round_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu")
+    return job.to_dict()
+
+@app.get("/uploads")
+async def get_uploads(since: int = 0, limit: int = 1000):
+    """Uploads received after the `since` cursor (sequence number), oldest first."""
+    # The cursor is the metric entry seq: entries are append-only, so this is a slice
+    since = max(0, since)
+    new_entries = state.metrics[since:since + limit]
+    cursor = new_entries[-1]["seq"] if new_entries else since
+    uploads = [
+        {"seq": m["seq"], "round": m["round"], "participant": m["participant"], "file": m["file"],
+         "hash": m.get("hash")}
+        for m in new_entries if m["participant"] != GLOBAL_PARTICIPANT
+    ]
+    return {"cursor": cursor, "uploads": uploads}
+
+@app.get("/merkle/{round_num}")
+async def get_round_commit(round_num: int):
+    """Committed contributions of a round (participant -> hash, file), for the bot's root audit."""
+    commit = load_round_commit(round_num)
+    if commit is None:
+        raise HTTPException(status_code=404, detail="Aucune racine engagée pour ce round")
+    contributions = {p: {"hash": c["model_hash"], "file": commit["files"].get(p)} for p, c in commit["proofs"].items()}
+    return {"round": round_num, "root": commit["root"], "count": commit["count"], "contributions": contributions}
+
+@app.post("/control/sweep/{round_num}")
+async def sweep_unclaimed(round_num: int):
+    """Merkle mode: sends the round's unclaimed rewards back to the coordinator once its claim window is over."""
+    root, reward, leaf_count, claimed, claim_deadline = contract.functions.roundCommits(round_num).call()
+    if root == bytes(32):
+        raise HTTPException(status_code=404, detail="Aucune racine engagée pour ce round")
+    if web3.eth.get_block("latest")["timestamp"] <= claim_deadline:
+        raise HTTPException(status_code=409, detail=f"Délai de réclamation en cours (jusqu'à {claim_deadline})")
+    if claimed >= leaf_count:
+        raise HTTPException(status_code=409, detail="Rien à récupérer")
+    tx_manager.send(contract.functions.sweepUnclaimed(round_num), gas=SWEEP_GAS, label=f"sweepUnclaimed R{round_num}")
+    print(f"🧹 Round {round_num} : récupération de {leaf_count - claimed} récompense(s) non réclamée(s) envoyée")
+    return {"status": "sent", "round": round_num, "leaves": leaf_count - claimed,
+            "amount": (leaf_count - claimed) * reward}
+
+@app.get("/proof/{round_num}/{participant}")
+async def get_proof(round_num: int, participant: str):
+    """Inclusion proof of a participant's update, for claimReward."""
+    commit = load_round_commit(round_num)
+    proof = commit["proofs"].get(Web3.to_checksum_address(participant)) if commit is not None else None
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Aucune preuve pour ce participant et ce round")
+    return proof
 
 @app.get("/metrics")
-async def get_metrics():
-    return state["metrics"]
+async def get_metrics(response: Response, since: int = 0, round_min: int = None, round_max: int = None,
+                      participant: str = None, limit: int = Query(1000, ge=1, le=METRICS_PAGE_MAX)):
+    """
+    Metric entries with seq > since, oldest first, optionally filtered by round
+    range or participant. Pagination is in the X-Next-Cursor / X-Has-More headers.
+    """
+    entries, cursor, has_more = state.query(max(0, since), round_min, round_max, participant, limit)
+    response.headers["X-Next-Cursor"] = str(cursor)
+    response.headers["X-Has-More"] = "1" if has_more else "0"
+    return entries
+
+@app.get("/metrics/prometheus")
+async def get_prometheus_metrics():
+    """Stage latencies, RPC calls, queue depths and counters in the Prometheus text format."""
+    return Response(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get("/events")
+async def stream_events(since: int = 0):
+    """
+    Server-Sent Events: a status snapshot, the metric entries after `since`,
+    then live "status", "metric" and "metric_update" events.
+    """
+    # Subscribe before reading the backlog so nothing falls in between
+    # (an entry may then arrive twice; clients key entries by seq)
+    queue = broker.subscribe()
+    backlog = [format_sse("status", state.status())]
+    cursor, has_more = max(0, since), True
+    while has_more:
+        entries, cursor, has_more = state.query(cursor, limit=METRICS_PAGE_MAX)
+        backlog.extend(format_sse("metric", e) for e in entries)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(broker.stream(queue, backlog), media_type="text/event-stream", headers=headers)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
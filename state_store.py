@@ -0,0 +1,239 @@
+"""
+Thread-safe coordinator state.
+
+Replaces the plain `state` dict: metric entries are indexed by
+(round, participant), per-round counters are maintained on write, and the
+"aggregate once" lock is an atomic check-and-set. Every mutation can be
+appended to a JSON-lines log so that a restarted coordinator replays it and
+resumes the session where it stopped.
+"""
+import heapq
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+
+GLOBAL_PARTICIPANT = "GLOBAL_MODEL"
+
+SESSION_DEFAULTS = {
+    "training_active": False,
+    "current_round": 0,
+    "target_rounds": 0,
+    "expected_participants": 0,
+    "aggregator": {"name": "fedavg"},  # aggregators.Aggregator.describe() of the session's rule
+    # "sync": a round closes when expected_participants are verified. "async" (FedBuff):
+    # it closes when buffer_size updates are verified or buffer_deadline seconds passed
+    "mode": "sync",
+    "buffer_size": 0,
+    "buffer_deadline": 0,
+    "staleness_exponent": 0.5,
+    "max_staleness": 4,
+    # Sync mode: at round_deadline_at (epoch seconds), the round is aggregated with the
+    # verified updates if there are at least `quorum` of them (else the deadline is extended)
+    "round_deadline": 0,
+    "round_deadline_at": None,
+    "quorum": 1,
+    # Global feature scaler of the session ({"version", "participants", "count"}), see feature_stats.py
+    "feature_scaler": None,
+}
+
+
+class StateStore:
+    def __init__(self, log_path=None, fsync=False):
+        self._lock = threading.RLock()
+        self.session = dict(SESSION_DEFAULTS)
+        self.metrics = []                      # Every entry, in arrival order (entry["seq"] = position + 1)
+        self._index = {}                       # (round, participant) -> latest entry
+        self._by_round = defaultdict(list)     # round -> entries (seq order)
+        self._by_participant = defaultdict(list)
+        self._received = defaultdict(int)      # round -> uploads received
+        self._verified = defaultdict(set)      # round -> verified participants
+        self._aggregated = set()
+        self.log_path = log_path
+        self.fsync = fsync
+        self._log = None
+        self._listeners = []
+        if log_path:
+            if os.path.exists(log_path):
+                self._replay(log_path)
+            self._log = open(log_path, "a", encoding="utf-8")
+
+    # --- Persistence ---------------------------------------------------------
+
+    def _write(self, record):
+        if self._log is None:
+            return
+        self._log.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def _replay(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Truncated last line (crash during write)
+                self._apply(record)
+        print(f"♻️ État restauré depuis {path} : Round {self.session['current_round']}, {len(self.metrics)} entrées")
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "session":
+            self.session.update(record["fields"])
+        elif op == "metric":
+            self._add(record["entry"])
+        elif op == "update":
+            self.metrics[record["seq"] - 1].update(record["fields"])
+        elif op == "verified":
+            self._verify(record["round"], record["participant"])
+        elif op == "aggregated":
+            self._aggregated.add(record["round"])
+
+    # --- Change notifications ------------------------------------------------
+
+    def add_listener(self, callback):
+        """callback(event_type, data) is called (under the store lock) after each change."""
+        self._listeners.append(callback)
+
+    def _emit(self, event_type, data):
+        for callback in self._listeners:
+            try:
+                callback(event_type, data)
+            except Exception as e:
+                print(f"⚠️ Listener en échec : {e}")
+
+    # --- Session -------------------------------------------------------------
+
+    def __getitem__(self, key):
+        return self.session[key]
+
+    def update_session(self, **fields):
+        with self._lock:
+            self.session.update(fields)
+            self._write({"op": "session", "fields": fields})
+            self._emit("status", self.status())
+
+    def status(self):
+        """Snapshot for /status."""
+        with self._lock:
+            snapshot = dict(self.session)
+            snapshot["received_this_round"] = self._received.get(self.session["current_round"], 0)
+            return snapshot
+
+    # --- Metric entries ------------------------------------------------------
+
+    def _add(self, entry):
+        self.metrics.append(entry)
+        self._by_round[entry["round"]].append(entry)
+        self._by_participant[entry["participant"]].append(entry)
+        if entry["participant"] != GLOBAL_PARTICIPANT:
+            self._index[(entry["round"], entry["participant"])] = entry
+            self._received[entry["round"]] += 1
+
+    def add_metric(self, entry):
+        """Appends an entry (participant upload or GLOBAL_MODEL result); returns it with its seq."""
+        with self._lock:
+            entry["seq"] = len(self.metrics) + 1
+            self._add(entry)
+            self._write({"op": "metric", "entry": entry})
+            self._emit("metric", entry)
+            if entry["participant"] != GLOBAL_PARTICIPANT:
+                self._emit("status", self.status())
+            return entry
+
+    def update_metric(self, entry, **fields):
+        with self._lock:
+            entry.update(fields)
+            self._write({"op": "update", "seq": entry["seq"], "fields": fields})
+            self._emit("metric_update", dict(fields, seq=entry["seq"]))
+
+    def query(self, since=0, round_min=None, round_max=None, participant=None, limit=1000):
+        """
+        Entries with seq > since matching the filters, oldest first, at most `limit`.
+        Returns (entries, next_cursor, has_more). Uses the per-round/per-participant
+        lists so the cost follows the selection, not the whole history.
+        """
+        with self._lock:
+            if participant is not None:
+                sources = [self._by_participant.get(participant, [])]
+            elif round_min is not None or round_max is not None:
+                lo = round_min if round_min is not None else min(self._by_round, default=0)
+                hi = round_max if round_max is not None else max(self._by_round, default=-1)
+                sources = [self._by_round[r] for r in range(lo, hi + 1) if r in self._by_round]
+            else:
+                sources = [self.metrics]
+            # Lists are in seq order: skip what the client already has
+            sources = [src[bisect_right(src, since, key=lambda e: e["seq"]):] for src in sources]
+
+            result = []
+            for entry in heapq.merge(*sources, key=lambda e: e["seq"]):
+                if round_min is not None and entry["round"] < round_min:
+                    continue
+                if round_max is not None and entry["round"] > round_max:
+                    continue
+                if len(result) == limit:
+                    return result, result[-1]["seq"], True
+                result.append(entry)
+            # Nothing else matches up to the newest entry
+            return result, max(since, len(self.metrics)), False
+
+    def get_metric(self, round_num, participant):
+        """O(1) lookup of the latest upload of a participant for a round."""
+        return self._index.get((round_num, participant))
+
+    def received_count(self, round_num):
+        return self._received.get(round_num, 0)
+
+    # --- Verification and aggregation lock ----------------------------------
+
+    def _verify(self, round_num, participant):
+        entry = self._index.get((round_num, participant))
+        if entry is None:
+            return None, False
+        first = participant not in self._verified[round_num]
+        entry["verified"] = True
+        self._verified[round_num].add(participant)
+        return entry, first
+
+    def mark_verified(self, round_num, participant):
+        """
+        Marks the upload verified. Returns (entry, first_time); entry is None when
+        no upload is known for (round, participant).
+        """
+        with self._lock:
+            entry, first = self._verify(round_num, participant)
+            if first:
+                self._write({"op": "verified", "round": round_num, "participant": participant})
+                self._emit("metric_update", {"seq": entry["seq"], "verified": True})
+            return entry, first
+
+    def verified_count(self, round_num):
+        return len(self._verified.get(round_num, ()))
+
+    def verified_participants(self, round_num):
+        with self._lock:
+            return list(self._verified.get(round_num, ()))
+
+    def round_participants(self, round_num):
+        """Participants that uploaded for round_num."""
+        with self._lock:
+            return list({e["participant"] for e in self._by_round.get(round_num, ())
+                         if e["participant"] != GLOBAL_PARTICIPANT})
+
+    def is_aggregated(self, round_num):
+        return round_num in self._aggregated
+
+    def try_mark_aggregated(self, round_num):
+        """Atomic check-and-set: True only for the first caller for this round."""
+        with self._lock:
+            if round_num in self._aggregated:
+                return False
+            self._aggregated.add(round_num)
+            self._write({"op": "aggregated", "round": round_num})
+            return True
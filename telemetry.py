@@ -0,0 +1,272 @@
+"""
+Timing instrumentation of the coordinator hot paths (server and bot).
+
+Counters, gauges and histograms are kept in process and rendered in the
+Prometheus text format (GET /metrics/prometheus on the server, BOT_METRICS_PORT
+for a standalone bot). Stage durations can also be exported per round as JSON
+lines (TRACE_EXPORT=path): one line per closed round with all its spans.
+
+TELEMETRY=0 turns everything into no-ops: span() returns a shared empty
+context manager and observe()/inc() return immediately.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+ENABLED = os.getenv("TELEMETRY", "1") != "0"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds: from a cached evaluation (~0.1 ms) to a receipt wait on a public chain
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(1 << k for k in range(8, 31, 2))  # 256 B .. 1 GiB
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, value=1.0, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(k)} {v:g}" for k, v in sorted(self._values.items())]
+        return lines
+
+
+class Gauge:
+    """Value read when the metrics are rendered (fn), e.g. a queue depth."""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            lines.append(f"{self.name}{_format_labels(labels)} {float(v):g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class RoundTracer:
+    """Spans grouped by round, written as one JSON line per round when it closes."""
+
+    MAX_SPANS = 100000  # Per round: a round that never closes cannot grow without bound
+
+    def __init__(self, path=None):
+        self.path = path
+        self._rounds = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, round_num, stage, start, duration, attrs=None):
+        if self.path is None or round_num is None:
+            return
+        span = {"stage": stage, "start": start, "duration": duration}
+        if attrs:
+            span.update(attrs)
+        with self._lock:
+            spans = self._rounds[round_num]
+            if len(spans) < self.MAX_SPANS:
+                spans.append(span)
+
+    def flush(self, round_num, **summary):
+        """Writes the spans of a closed round and forgets them."""
+        if self.path is None:
+            return
+        with self._lock:
+            spans = self._rounds.pop(round_num, [])
+            record = {"round": round_num, "closed_at": time.time(), **summary, "spans": spans}
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class _Span:
+    __slots__ = ("stage", "round_num", "attrs", "start")
+
+    def __init__(self, stage, round_num, attrs):
+        self.stage = stage
+        self.round_num = round_num
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start, self.round_num, self.attrs, self.start)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+# --- Registry ------------------------------------------------------------------
+
+STAGE_SECONDS = Histogram("fl_stage_seconds", "Duration of the coordinator hot-path stages")
+UPLOAD_BYTES = Histogram("fl_upload_bytes", "Size of the received updates", SIZE_BUCKETS)
+UPLOADS = Counter("fl_uploads_total", "Uploads received, by status")
+RPC_SECONDS = Histogram("fl_rpc_seconds", "Duration of the JSON-RPC calls, by method")
+RPC_ERRORS = Counter("fl_rpc_errors_total", "JSON-RPC calls that raised, by method")
+HASH_CHECKS = Counter("fl_hash_checks_total", "On-chain hash verifications by the bot, by result")
+ROUNDS = Counter("fl_rounds_total", "Rounds closed, by reason")
+
+_metrics = [STAGE_SECONDS, UPLOAD_BYTES, UPLOADS, RPC_SECONDS, RPC_ERRORS, HASH_CHECKS, ROUNDS]
+tracer = RoundTracer(TRACE_EXPORT if ENABLED else None)
+
+
+def register(metric):
+    """Adds a Counter/Histogram defined by another module to render()."""
+    _metrics.append(metric)
+    return metric
+
+
+def register_gauge(name, help_text, fn):
+    return register(Gauge(name, help_text, fn))
+
+
+def record(stage, seconds, round_num=None, attrs=None, start=None):
+    """Adds one stage duration (histogram + round trace)."""
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if tracer.path is not None:
+        tracer.add(round_num, stage, start if start is not None else time.perf_counter() - seconds, seconds, attrs)
+
+
+def span(stage, round_num=None, **attrs):
+    """Context manager timing a stage: `with telemetry.span("evaluate", round_num): ...`."""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(stage, round_num, attrs)
+
+
+def instrument_provider(provider):
+    """Times every JSON-RPC call of a web3 provider (before its first request)."""
+    if not ENABLED:
+        return provider
+    make_request = provider.make_request
+
+    def timed_request(method, params):
+        start = time.perf_counter()
+        try:
+            return make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method=method)
+            raise
+        finally:
+            RPC_SECONDS.observe(time.perf_counter() - start, method=method)
+    provider.make_request = timed_request
+    if hasattr(provider, "make_batch_request"):
+        make_batch_request = provider.make_batch_request
+
+        def timed_batch(requests):
+            start = time.perf_counter()
+            try:
+                return make_batch_request(requests)
+            except Exception:
+                RPC_ERRORS.inc(method="batch")
+                raise
+            finally:
+                RPC_SECONDS.observe(time.perf_counter() - start, method="batch")
+        provider.make_batch_request = timed_batch
+    return provider
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, host="0.0.0.0"):
+    """Serves render() on http://host:port/metrics from a daemon thread (standalone bot)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="telemetry-http", daemon=True).start()
+    return server
@@ -0,0 +1,130 @@
+"""
+Aggregation rules (aggregators.py) against plain-loop references: blocked order
+statistics, blocked Krum distances, outlier rejection and the n >= 2f + 3 bound.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregators  # noqa: E402
+from aggregators import CoordinateMedian, Krum, MultiKrum, TrimmedMean, WeightedFedAvg, make_aggregator  # noqa: E402
+
+
+@pytest.fixture
+def updates():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(11, 7)), rng.uniform(1, 50, size=11)
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(aggregators, "COLUMN_BLOCK", 3)  # Several column blocks, the last one partial
+
+
+def loop_trimmed_mean(updates, trim_ratio):
+    n, d = updates.shape
+    k = int(trim_ratio * n)
+    return np.array([np.mean(sorted(updates[:, j])[k:n - k]) for j in range(d)])
+
+
+def loop_median(updates):
+    n, d = updates.shape
+    out = []
+    for j in range(d):
+        column = sorted(updates[:, j])
+        out.append(column[n // 2] if n % 2 else (column[n // 2 - 1] + column[n // 2]) / 2)
+    return np.array(out)
+
+
+def loop_krum_scores(updates, byzantine):
+    n = len(updates)
+    scores = []
+    for i in range(n):
+        dists = sorted(float(np.sum((updates[i] - updates[j]) ** 2)) for j in range(n) if j != i)
+        scores.append(sum(dists[:n - byzantine - 2]))
+    return np.array(scores)
+
+
+def loop_weighted_mean(updates, weights, rows):
+    total = sum(weights[i] for i in rows)
+    return sum(weights[i] * updates[i] for i in rows) / total
+
+
+def test_fedavg_matches_the_weighted_loop(updates):
+    u, w = updates
+    np.testing.assert_allclose(WeightedFedAvg().aggregate(u, w), loop_weighted_mean(u, w, range(len(u))))
+
+
+@pytest.mark.parametrize("trim_ratio", [0.0, 0.1, 0.2, 0.45])
+def test_trimmed_mean_matches_the_sorted_loop(updates, trim_ratio):
+    u, w = updates
+    rule = TrimmedMean(trim_ratio)
+    np.testing.assert_allclose(rule.aggregate(u), loop_trimmed_mean(u, trim_ratio))
+    # Unweighted: the weights are validated, then ignored
+    np.testing.assert_array_equal(rule.aggregate(u, w), rule.aggregate(u))
+    with pytest.raises(ValueError):
+        rule.aggregate(u, -w)
+
+
+@pytest.mark.parametrize("n", [10, 11])
+def test_median_matches_the_sorted_loop(updates, n):
+    u, w = updates
+    rule = CoordinateMedian()
+    np.testing.assert_allclose(rule.aggregate(u[:n]), loop_median(u[:n]))
+    np.testing.assert_array_equal(rule.aggregate(u[:n], w[:n]), rule.aggregate(u[:n]))
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 256])
+def test_krum_scores_match_the_pairwise_loop(updates, block_size):
+    u, _ = updates
+    u = u + 1e3  # Far from the origin: the centring must avoid the cancellation
+    for byzantine in (0, 2, 4):
+        np.testing.assert_allclose(aggregators.krum_scores(u, len(u) - byzantine - 2, block_size),
+                                   loop_krum_scores(u, byzantine), rtol=1e-9)
+
+
+@pytest.mark.parametrize("select", [1, 3, None])
+def test_krum_and_multi_krum_match_the_loop(updates, select):
+    u, w = updates
+    rule = (Krum if select == 1 else MultiKrum)(byzantine=2, select=select, block_size=4)
+    scores = loop_krum_scores(u, 2)
+    rows = sorted(np.argsort(scores, kind="stable")[:len(u) - 2 if select is None else select])
+    np.testing.assert_allclose(rule.aggregate(u, w), loop_weighted_mean(u, w, rows))
+    assert list(rule.last_selected) == rows
+
+
+def test_krum_rejects_outliers():
+    rng = np.random.default_rng(1)
+    honest = rng.normal(scale=0.1, size=(8, 5))
+    byzantine = np.full((2, 5), 100.0)
+    u = np.vstack([honest[:4], byzantine[:1], honest[4:], byzantine[1:]])  # Outliers at rows 4 and 9
+    w = np.ones(10)
+    w[[4, 9]] = 1000.0  # Large claimed sample counts do not help them
+
+    krum = Krum(byzantine=2)
+    chosen = krum.aggregate(u, w)
+    assert len(krum.last_selected) == 1 and krum.last_selected[0] not in (4, 9)
+    np.testing.assert_array_equal(chosen, u[krum.last_selected[0]])
+
+    multi = MultiKrum(byzantine=2)
+    multi.aggregate(u, w)
+    assert list(multi.last_selected) == [0, 1, 2, 3, 5, 6, 7, 8]
+
+    # The coordinate-wise rules are not pulled towards the outliers either
+    assert np.abs(CoordinateMedian().aggregate(u, w)).max() < 1
+    assert np.abs(TrimmedMean(0.2).aggregate(u, w)).max() < 1
+    assert np.abs(WeightedFedAvg().aggregate(u, w)).max() > 90
+
+
+def test_krum_needs_2f_plus_3_updates(updates):
+    u, _ = updates
+    rule = make_aggregator("krum", byzantine=2)
+    assert rule.min_participants() == 7
+    with pytest.raises(ValueError, match="at least 7 updates, got 6"):
+        rule.aggregate(u[:6])
+    rule.aggregate(u[:7])
+    with pytest.raises(ValueError, match="at least 9"):
+        make_aggregator("multi_krum", byzantine=3).aggregate(u[:8])
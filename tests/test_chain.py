@@ -0,0 +1,400 @@
+"""
+Coordinator <-> contract round trip on an in-process chain (eth-tester): the
+shared TransactionManager (nonce pipelining, stuck-transaction replacement),
+validateAndPayMany with already-paid entries, payments settled on their receipt,
+the bot's log and view-call reads, and Merkle claims and the sweep of unclaimed
+rewards.
+
+Needs eth-tester[py-evm] (skipped otherwise). The contract is AICollaboration.sol
+compiled with an installed py-solc-x solc, or else the committed
+build/AICollaboration.json (python build_contract.py); AICOLLAB_ARTIFACT=<file>
+overrides both.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("eth_tester")
+from web3 import EthereumTesterProvider, Web3  # noqa: E402
+from web3.logs import DISCARD  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("CONTRACT_ADDRESS", "0x" + "11" * 20)  # Read by coordinator_bot at import time
+import build_contract  # noqa: E402
+from contract_reads import ContractReader  # noqa: E402
+from merkle_commit import build_round_commit, claim_reward  # noqa: E402
+from tx_manager import REPLACEMENT_BUMP, TransactionManager  # noqa: E402
+
+REWARD_WEI = 10 ** 13
+
+
+class DroppingTesterProvider(EthereumTesterProvider):
+    """eth-tester mines on send; drop_sends raw transactions are acknowledged but never
+    reach the chain, as a transaction stuck in (or evicted from) a real mempool."""
+
+    def __init__(self):
+        super().__init__()
+        self.drop_sends = 0
+        self._rpc_lock = threading.Lock()  # eth-tester is not thread-safe (tx-manager thread)
+
+    def make_request(self, method, params):
+        with self._rpc_lock:
+            if method == "eth_sendRawTransaction" and self.drop_sends:
+                self.drop_sends -= 1
+                return {"jsonrpc": "2.0", "id": 0, "result": Web3.to_hex(Web3.keccak(hexstr=params[0]))}
+            return super().make_request(method, params)
+
+
+def rejecting_forwarder(target):
+    """
+    Creation code of a contract wallet that reverts on any ETH transfer and forwards
+    its calldata to target (so it can submitUpdate as msg.sender).
+    """
+    runtime = ("34156009576000" "80fd5b" "3660006000" "37"       # callvalue ? revert : calldatacopy
+               "6000600036600060007" "3" + target[2:].lower() +  # call(gas, target, 0, 0, size, 0, 0)
+               "5af1" "15603557" "00" "5b600080fd")               # failed ? revert : stop
+    code = bytes.fromhex(runtime)
+    return "0x60" + f"{len(code):02x}" + "80600b6000396000f3" + code.hex()
+
+
+def deploy_rejecting(w3, contract, owner):
+    factory = w3.eth.contract(abi=[], bytecode=rejecting_forwarder(contract.address))
+    receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact({"from": owner}))
+    return receipt["contractAddress"]
+
+
+def load_contract():
+    """AICOLLAB_ARTIFACT if set, else AICollaboration.sol when py-solc-x has a solc
+    installed, else the committed build/AICollaboration.json."""
+    artifact = os.getenv("AICOLLAB_ARTIFACT")
+    if not artifact:
+        try:
+            import solcx
+            versions = solcx.get_installed_solc_versions()
+        except ImportError:
+            versions = []
+        if versions:
+            return build_contract.compile_solidity(str(max(versions)))
+    abi, bytecode = build_contract.load_artifact(artifact or build_contract.ARTIFACT)
+    return {"abi": abi, "bytecode": bytecode}
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    contract = load_contract()
+    return contract["abi"], contract["bytecode"]
+
+
+@pytest.fixture
+def chain(compiled):
+    """Fresh chain with AICollaboration deployed by the coordinator (first test account)."""
+    abi, bytecode = compiled
+    w3 = Web3(DroppingTesterProvider())
+    keys = w3.provider.ethereum_tester.backend.account_keys
+    accounts = [(k.public_key.to_checksum_address(), str(k)) for k in keys]
+    coordinator = accounts[0][0]
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact({"from": coordinator}))
+    contract = w3.eth.contract(address=receipt["contractAddress"], abi=abi)
+    return w3, contract, accounts
+
+
+def manager(w3, accounts, **kwargs):
+    address, key = accounts[0]
+    kwargs.setdefault("poll_interval", 0.01)
+    return TransactionManager(w3, address, key, **kwargs)
+
+
+def submit(w3, contract, addr, model_hash):
+    receipt = w3.eth.wait_for_transaction_receipt(contract.functions.submitUpdate(model_hash).transact({"from": addr}))
+    assert receipt["status"] == 1
+
+
+def test_sends_are_pipelined_with_consecutive_nonces(chain):
+    w3, contract, accounts = chain
+    tm = manager(w3, accounts)
+    start = w3.eth.get_transaction_count(accounts[0][0])
+    sent = [tm.send(contract.functions.startNewRound(), label=f"round {i}") for i in range(5)]
+    receipts = [ptx.wait(30) for ptx in sent]
+
+    assert [ptx.nonce for ptx in sent] == list(range(start, start + 5))
+    assert all(r["status"] == 1 for r in receipts)
+    assert contract.functions.currentRound().call() == 5
+    assert tm.pending == 0
+
+
+def test_stuck_transaction_is_replaced_with_a_higher_gas_price(chain):
+    w3, contract, accounts = chain
+    tm = manager(w3, accounts, replace_after=0.05)
+    w3.provider.drop_sends = 1
+    ptx = tm.send(contract.functions.startNewRound(), label="stuck")
+    receipt = ptx.wait(30)
+
+    assert receipt["status"] == 1
+    assert ptx.replacements == 1 and len(ptx.hashes) == 2
+    assert receipt["transactionHash"] == ptx.hashes[-1]
+    assert w3.eth.get_transaction(ptx.hashes[-1])["gasPrice"] >= int(tm.gas_price() * REPLACEMENT_BUMP) - 1
+    # The replacement reused the nonce: the next send follows it without a gap
+    assert tm.send(contract.functions.startNewRound()).wait(30)["status"] == 1
+    assert contract.functions.currentRound().call() == 2
+
+
+def test_given_up_transaction_releases_its_nonce(chain):
+    w3, contract, accounts = chain
+    tm = manager(w3, accounts, replace_after=0.02, max_replacements=1)
+    w3.provider.drop_sends = 2  # First broadcast and its replacement never reach the chain
+    lost = tm.send(contract.functions.startNewRound(), label="lost")
+    with pytest.raises(TimeoutError):
+        lost.wait(30)
+
+    nxt = tm.send(contract.functions.startNewRound())
+    assert nxt.wait(30)["status"] == 1
+    assert nxt.nonce == lost.nonce  # Re-read from the node, not queued behind the gap
+
+
+def test_validate_and_pay_many_skips_paid_and_missing_entries(chain):
+    w3, contract, accounts = chain
+    coordinator = accounts[0][0]
+    paid, unpaid, missing = (addr for addr, _ in accounts[1:4])
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    submit(w3, contract, paid, b"\x01" * 32)
+    submit(w3, contract, unpaid, b"\x02" * 32)
+    w3.eth.wait_for_transaction_receipt(
+        contract.functions.validateAndPay(paid).transact({"from": coordinator, "value": REWARD_WEI}))
+
+    balances = {addr: w3.eth.get_balance(addr) for addr in (coordinator, paid, unpaid, missing)}
+    tx_hash = contract.functions.validateAndPayMany([paid, unpaid, missing]).transact(
+        {"from": coordinator, "value": 3 * REWARD_WEI, "gasPrice": 10 ** 9})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    assert receipt["status"] == 1
+    rewarded = contract.events.RewardPaid().process_receipt(receipt, errors=DISCARD)
+    skipped = contract.events.PaymentSkipped().process_receipt(receipt, errors=DISCARD)
+    assert [e["args"]["participant"] for e in rewarded] == [unpaid]
+    assert {e["args"]["participant"] for e in skipped} == {paid, missing}
+    assert w3.eth.get_balance(unpaid) - balances[unpaid] == REWARD_WEI
+    assert w3.eth.get_balance(paid) == balances[paid] and w3.eth.get_balance(missing) == balances[missing]
+    # Only the paid share left the coordinator: the two skipped ones were refunded
+    assert balances[coordinator] - w3.eth.get_balance(coordinator) == REWARD_WEI + receipt["gasUsed"] * 10 ** 9
+
+
+def test_validate_and_pay_many_skips_rejected_transfers(chain):
+    w3, contract, accounts = chain
+    coordinator, honest = accounts[0][0], accounts[1][0]
+    rejecting = deploy_rejecting(w3, contract, coordinator)
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    submit(w3, contract, honest, b"\x01" * 32)
+    w3.eth.wait_for_transaction_receipt(w3.eth.send_transaction(
+        {"from": coordinator, "to": rejecting, "data": contract.encode_abi("submitUpdate", [b"\x02" * 32])}))
+    assert contract.functions.contributions(1, rejecting).call()[0] == b"\x02" * 32
+
+    # Alone, the transfer reverts the payment
+    receipt = w3.eth.wait_for_transaction_receipt(contract.functions.validateAndPay(rejecting).transact(
+        {"from": coordinator, "value": REWARD_WEI, "gas": 200000}))
+    assert receipt["status"] == 0
+
+    # In a batch it is skipped and refunded, the other participant is paid
+    balance = w3.eth.get_balance(coordinator)
+    receipt = w3.eth.wait_for_transaction_receipt(contract.functions.validateAndPayMany([honest, rejecting]).transact(
+        {"from": coordinator, "value": 2 * REWARD_WEI, "gasPrice": 10 ** 9}))
+    assert receipt["status"] == 1
+    skipped = contract.events.PaymentSkipped().process_receipt(receipt, errors=DISCARD)
+    assert [e["args"]["participant"] for e in skipped] == [rejecting]
+    assert contract.functions.contributions(1, honest).call()[1:] == (True, True)
+    assert contract.functions.contributions(1, rejecting).call()[1:] == (False, False)
+    assert w3.eth.get_balance(rejecting) == 0
+    assert balance - w3.eth.get_balance(coordinator) == REWARD_WEI + receipt["gasUsed"] * 10 ** 9
+
+
+def reverts(w3, call, sender):
+    tx_hash = call.transact({"from": sender, "gas": 300000})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)["status"] == 0
+
+
+def test_merkle_claims_and_sweep_of_unclaimed_rewards(chain):
+    w3, contract, accounts = chain
+    coordinator = accounts[0][0]
+    keys = dict(accounts[1:6])
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    commit = build_round_commit(1, {addr: "0x" + bytes([i + 1]).hex() * 32 for i, addr in enumerate(keys)})
+    receipt = w3.eth.wait_for_transaction_receipt(contract.functions.commitRoot(1, commit["root"], commit["count"]).transact(
+        {"from": coordinator, "value": commit["count"] * REWARD_WEI}))
+    assert receipt["status"] == 1
+    root, reward, leaf_count, claimed, deadline = contract.functions.roundCommits(1).call()
+    assert (Web3.to_hex(root), reward, leaf_count, claimed) == (commit["root"], REWARD_WEI, 5, 0)
+    assert deadline == w3.eth.get_block(receipt["blockNumber"])["timestamp"] + contract.functions.CLAIM_WINDOW().call()
+
+    # The proofs of build_round_commit are accepted on chain (odd leaf count: a lone node moves up)
+    claimants = sorted(keys)[:3]
+    for addr in claimants:
+        balance = w3.eth.get_balance(addr)
+        receipt = w3.eth.wait_for_transaction_receipt(
+            claim_reward(w3, contract, commit["proofs"][addr], addr, keys[addr], gas_price=10 ** 9))
+        assert receipt["status"] == 1
+        assert w3.eth.get_balance(addr) == balance + REWARD_WEI - receipt["gasUsed"] * 10 ** 9
+        assert contract.functions.isClaimed(1, commit["proofs"][addr]["index"]).call()
+    assert contract.functions.roundCommits(1).call()[3] == 3
+
+    # Replayed, tampered and another participant's proofs are refused
+    first, other = claimants[0], sorted(keys)[3]
+    proof = commit["proofs"][first]
+    args = (1, proof["index"], first, proof["model_hash"], proof["proof"])
+    assert reverts(w3, contract.functions.claimReward(*args), first)
+    assert reverts(w3, contract.functions.claimReward(1, proof["index"], other, proof["model_hash"], proof["proof"]), other)
+    assert reverts(w3, contract.functions.claimReward(1, proof["index"], first, "0x" + "ff" * 32, proof["proof"]), first)
+
+    # Only the coordinator sweeps, and only once the claim window is over
+    assert reverts(w3, contract.functions.sweepUnclaimed(1), coordinator)
+    w3.provider.ethereum_tester.time_travel(deadline + 1)
+    late = commit["proofs"][other]
+    assert reverts(w3, contract.functions.claimReward(1, late["index"], other, late["model_hash"], late["proof"]), other)
+    assert reverts(w3, contract.functions.sweepUnclaimed(1), other)
+    balance = w3.eth.get_balance(coordinator)
+    receipt = w3.eth.wait_for_transaction_receipt(contract.functions.sweepUnclaimed(1).transact(
+        {"from": coordinator, "gasPrice": 10 ** 9}))
+    assert receipt["status"] == 1
+    swept = contract.events.UnclaimedSwept().process_receipt(receipt, errors=DISCARD)[0]["args"]
+    assert (swept["leaves"], swept["amount"]) == (2, 2 * REWARD_WEI)
+    assert w3.eth.get_balance(coordinator) == balance + 2 * REWARD_WEI - receipt["gasUsed"] * 10 ** 9
+    assert w3.eth.get_balance(contract.address) == 0
+    assert reverts(w3, contract.functions.sweepUnclaimed(1), coordinator)
+
+
+@pytest.fixture
+def bot(chain):
+    """coordinator_bot wired to the test chain; notify_server records its calls."""
+    import coordinator_bot as bot
+
+    w3, contract, accounts = chain
+    notified = []
+    saved = {name: getattr(bot, name) for name in ("web3", "contract", "reader", "tx_manager", "notify_server")}
+    bot.web3, bot.contract = w3, contract
+    bot.reader = ContractReader(contract, ttl=0)
+    bot.tx_manager = manager(w3, accounts)
+    bot.notify_server = lambda addr, current_round, timeout=5: notified.append((current_round, addr))
+    while not bot.payment_outcomes.empty():
+        bot.payment_outcomes.get_nowait()
+    yield bot, notified
+    for name, value in saved.items():
+        setattr(bot, name, value)
+
+
+def settle(bot, matcher, ptx=None, outcomes=1):
+    """Waits for ptx (default: every queued payment) and outcomes receipt callbacks, then settles them."""
+    deadline = time.monotonic() + 30
+    if ptx is not None:
+        ptx.future.exception(30)
+    while (bot.tx_manager.pending or bot.payment_outcomes.qsize() < outcomes) and time.monotonic() < deadline:
+        time.sleep(0.01)  # The callback runs right after the future resolves
+    return bot.settle_payments(matcher)
+
+
+def expect_payments(bot, matcher, round_num, addrs):
+    for addr in addrs:
+        matcher.add_hash(round_num, addr, "0x00")
+        matcher.add_upload(round_num, addr, f"{addr}.flw")
+        matcher.begin_payment(matcher._key(round_num, addr))
+
+
+def test_bot_notifies_the_server_only_after_a_successful_receipt(chain, bot):
+    bot, notified = bot
+    w3, contract, accounts = chain
+    coordinator = accounts[0][0]
+    first, second, never_submitted = (addr for addr, _ in accounts[1:4])
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    submit(w3, contract, first, b"\x01" * 32)
+    submit(w3, contract, second, b"\x02" * 32)
+
+    matcher = bot.UploadHashMatcher()
+    expect_payments(bot, matcher, 1, (first, second, never_submitted))
+
+    # Batch payment: mined, both participants confirmed and notified
+    assert settle(bot, matcher, bot.pay_participants([first, second], 1)) == [first, second]
+    assert notified == [(1, first), (1, second)]
+    assert contract.functions.contributions(1, first).call()[2]
+
+    # Single payment of a participant without contribution: reverted, back to verification
+    assert settle(bot, matcher, bot.pay_participants([never_submitted], 1)) == []
+    assert notified == [(1, first), (1, second)]
+    assert [value[0] for _, value in matcher.ready_for(1)] == [never_submitted]
+    assert not matcher.paying
+
+
+def test_bot_gives_up_on_a_recipient_rejecting_payments(chain, bot):
+    bot, notified = bot
+    w3, contract, accounts = chain
+    coordinator, honest = accounts[0][0], accounts[1][0]
+    rejecting = deploy_rejecting(w3, contract, coordinator)
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    submit(w3, contract, honest, b"\x01" * 32)
+    w3.eth.wait_for_transaction_receipt(w3.eth.send_transaction(
+        {"from": coordinator, "to": rejecting, "data": contract.encode_abi("submitUpdate", [b"\x02" * 32])}))
+
+    matcher = bot.UploadHashMatcher()
+    expect_payments(bot, matcher, 1, (honest, rejecting))
+    # The batch pays the honest participant; the rejected transfer goes back to verification
+    assert settle(bot, matcher, bot.pay_participants([honest, rejecting], 1)) == [honest]
+    assert [value[0] for _, value in matcher.ready_for(1)] == [rejecting]
+
+    for attempt in range(2, bot.MAX_PAYMENT_ATTEMPTS + 1):
+        matcher.begin_payment(matcher._key(1, rejecting))
+        confirmed = settle(bot, matcher, bot.pay_participants([rejecting], 1))
+    # Given up: notified without reward, so the round can close
+    assert confirmed == [rejecting]
+    assert notified == [(1, honest), (1, rejecting)]
+    assert not matcher.ready and not matcher.paying and not matcher.failures
+
+
+def test_bot_retries_a_reverted_batch_one_participant_at_a_time(chain, bot):
+    bot, notified = bot
+    w3, contract, accounts = chain
+    coordinator = accounts[0][0]
+    participants = [addr for addr, _ in accounts[1:4]]
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    for i, addr in enumerate(participants[:2]):
+        submit(w3, contract, addr, bytes([i + 1]) * 32)
+
+    matcher = bot.UploadHashMatcher()
+    expect_payments(bot, matcher, 1, participants)
+    sent = []
+    pay = bot.pay_participants
+    bot.pay_participants = lambda addrs, current_round: sent.append(list(addrs)) or pay(addrs, current_round)
+    try:
+        # Sent by another account: the batch reverts, then every participant is paid alone
+        bot.tx_manager = manager(w3, accounts[5:])
+        assert settle(bot, matcher, pay(participants, 1)) == []
+        assert sent == [[addr] for addr in participants]
+        bot.tx_manager = manager(w3, accounts)
+    finally:
+        bot.pay_participants = pay
+    assert settle(bot, matcher, outcomes=len(participants)) == []
+    assert sorted(value[0] for _, value in matcher.ready_for(1)) == sorted(participants)
+    assert notified == []
+
+
+def test_bot_reads_submissions_from_logs_and_batched_views(chain, bot):
+    bot, _ = bot
+    w3, contract, accounts = chain
+    coordinator = accounts[0][0]
+    participants = [addr for addr, _ in accounts[1:5]]
+    start = w3.eth.block_number + 1
+    w3.eth.wait_for_transaction_receipt(contract.functions.startNewRound().transact({"from": coordinator}))
+    for i, addr in enumerate(participants):
+        submit(w3, contract, addr, bytes([i + 1]) * 32)
+
+    events = bot.fetch_contract_events(start, w3.eth.block_number, w3, contract)
+    assert [e["event"] for e in events] == ["TrainingStarted"] + ["HashSubmitted"] * len(participants)
+    assert [e["args"]["participant"] for e in events[1:]] == participants
+
+    reader = ContractReader(contract, ttl=60)
+    values = reader.contributions(1, participants)
+    assert [values[addr][0] for addr in participants] == [bytes([i + 1]) * 32 for i in range(len(participants))]
+    misses = reader.stats["misses"]
+    reader.contributions(1, participants)
+    assert reader.stats["misses"] == misses  # Second poll served from the cache
@@ -0,0 +1,132 @@
+"""
+Coordinator state (state_store.py): a store replayed from its JSON-lines log
+matches the one that wrote it (metrics, (round, participant) index, verified
+sets, aggregation lock, status), and query() pages match a plain filter.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import GLOBAL_PARTICIPANT, StateStore  # noqa: E402
+
+PARTICIPANTS = ["0xaaa", "0xbbb", "0xccc"]
+
+
+def run_session(store, rounds=3):
+    """A few rounds: uploads (one participant uploads twice), verifications, updates, global entries."""
+    store.update_session(training_active=True, current_round=1, target_rounds=rounds, expected_participants=3)
+    for round_num in range(1, rounds + 1):
+        for i, participant in enumerate(PARTICIPANTS):
+            entry = store.add_metric({"round": round_num, "participant": participant, "accuracy": 0.5 + i / 10,
+                                      "file": f"{participant}_r{round_num}.flw"})
+            if i < 2:
+                store.mark_verified(round_num, participant)
+        retry = store.add_metric({"round": round_num, "participant": PARTICIPANTS[2], "accuracy": 0.9,
+                                  "file": f"{PARTICIPANTS[2]}_r{round_num}_retry.flw"})
+        store.update_metric(entry, excluded_from_aggregate=True)
+        store.mark_verified(round_num, PARTICIPANTS[2])
+        assert store.try_mark_aggregated(round_num)
+        store.add_metric({"round": round_num, "participant": GLOBAL_PARTICIPANT, "accuracy": 0.8})
+        if round_num < rounds:
+            store.update_session(current_round=round_num + 1)
+    store.update_session(training_active=False)
+    return retry
+
+
+def all_pages(store, limit, **filters):
+    entries, since = [], filters.pop("since", 0)
+    while True:
+        page, since, has_more = store.query(since, limit=limit, **filters)
+        assert len(page) <= limit
+        entries += page
+        if not has_more:
+            return entries, since
+
+
+def expected(store, since=0, round_min=None, round_max=None, participant=None):
+    return [e for e in store.metrics
+            if e["seq"] > since and (participant is None or e["participant"] == participant)
+            and (round_min is None or e["round"] >= round_min) and (round_max is None or e["round"] <= round_max)]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "state.jsonl")
+
+
+def test_replayed_store_matches_the_writer(log_path):
+    writer = StateStore(log_path)
+    retry = run_session(writer)
+    reader = StateStore(log_path)
+
+    assert reader.metrics == writer.metrics
+    assert [e["seq"] for e in reader.metrics] == list(range(1, len(writer.metrics) + 1))
+    assert reader.status() == writer.status()
+    assert reader.session == writer.session
+    for round_num in (1, 2, 3):
+        assert reader.received_count(round_num) == writer.received_count(round_num) == 4
+        assert sorted(reader.verified_participants(round_num)) == PARTICIPANTS
+        assert sorted(reader.round_participants(round_num)) == PARTICIPANTS
+        assert reader.is_aggregated(round_num)
+    # "update" records land on the replayed entry, "verified" on the latest upload
+    assert reader.metrics[2]["excluded_from_aggregate"] is True
+    assert reader.get_metric(3, PARTICIPANTS[2]) == retry
+    assert reader.get_metric(3, PARTICIPANTS[2])["verified"] is True
+    assert "verified" not in reader.metrics[-3]  # First (replaced) upload of round 3
+    assert reader.get_metric(3, GLOBAL_PARTICIPANT) is None
+    assert reader.get_metric(4, PARTICIPANTS[0]) is None
+
+
+def test_aggregation_lock_is_idempotent_across_restarts(log_path):
+    store = StateStore(log_path)
+    assert store.try_mark_aggregated(1)
+    assert not store.try_mark_aggregated(1)
+    assert not StateStore(log_path).try_mark_aggregated(1)
+
+    restarted = StateStore(log_path)
+    assert restarted.try_mark_aggregated(2)
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    # One record per round: refused attempts are not logged
+    assert records == [{"op": "aggregated", "round": 1}, {"op": "aggregated", "round": 2}]
+
+
+def test_mark_verified_is_logged_once(log_path):
+    store = StateStore(log_path)
+    assert store.mark_verified(1, PARTICIPANTS[0]) == (None, False)  # No upload yet
+    entry = store.add_metric({"round": 1, "participant": PARTICIPANTS[0]})
+    assert store.mark_verified(1, PARTICIPANTS[0]) == (entry, True)
+    assert store.mark_verified(1, PARTICIPANTS[0]) == (entry, False)
+    with open(log_path, encoding="utf-8") as f:
+        assert sum(json.loads(line)["op"] == "verified" for line in f) == 1
+    assert StateStore(log_path).verified_count(1) == 1
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"since": 7}, {"round_min": 2}, {"round_max": 2}, {"round_min": 2, "round_max": 2},
+    {"round_min": 2, "since": 15}, {"round_min": 5}, {"participant": PARTICIPANTS[2]},
+    {"participant": PARTICIPANTS[2], "round_min": 2, "round_max": 3, "since": 4},
+    {"participant": GLOBAL_PARTICIPANT}, {"participant": "0xunknown"},
+])
+@pytest.mark.parametrize("limit", [1, 2, 5, 1000])
+def test_query_pages_match_a_plain_filter(log_path, filters, limit):
+    run_session(StateStore(log_path))
+    store = StateStore(log_path)
+    entries, cursor = all_pages(store, limit, **filters)
+    assert entries == expected(store, **filters)
+    # The final cursor covers the whole history: polling again returns nothing new
+    assert cursor == len(store.metrics)
+    assert store.query(cursor, **{k: v for k, v in filters.items() if k != "since"}) == ([], cursor, False)
+
+
+def test_truncated_last_line_is_ignored(log_path):
+    store = StateStore(log_path)
+    run_session(store, rounds=1)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"metric","entry":{"round":1,')
+    restored = StateStore(log_path)
+    assert restored.metrics == store.metrics
+    assert restored.status() == store.status()
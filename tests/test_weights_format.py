@@ -0,0 +1,116 @@
+"""
+.flw encoding (weights_format.py): full and delta round trips for every stored
+dtype, top-k deltas applied to their base, and the rejection of malformed
+payloads and of pickled files.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from weights_format import (DeltaUpdate, UpdateFormatError, WeightUpdate, decode_update, encode_delta,  # noqa: E402
+                            encode_update, load_any, read_header)
+
+CLASSES = [0, 1, 2]
+FEATURES = ["a", "b", "c", "d"]
+
+
+@pytest.fixture
+def weights():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(3, 4)), rng.normal(size=3)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_full_update_round_trip(weights, dtype):
+    coef, intercept = weights
+    payload = encode_update(coef, intercept, CLASSES, FEATURES, n_samples=120, dtype=dtype, extra={"n_iter": 7.0})
+    update = decode_update(payload)
+    assert isinstance(update, WeightUpdate)
+    assert update.coef.dtype == dtype and update.coef.shape == (3, 4)
+    np.testing.assert_array_equal(update.coef, coef.astype(dtype))
+    np.testing.assert_array_equal(update.intercept, intercept.astype(dtype))
+    assert (update.classes, update.feature_names, update.n_samples) == (CLASSES, FEATURES, 120)
+    assert update.header["n_iter"] == 7.0
+    # Canonical bytes: encoding the decoded weights gives the same payload (and hash)
+    assert encode_update(update.coef, update.intercept, CLASSES, FEATURES, 120, dtype, {"n_iter": 7.0}) == payload
+
+
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 0), (np.float32, 1e-6), (np.float16, 1e-3), (np.int8, 1 / 127)])
+def test_dense_delta_round_trip(weights, dtype, rtol):
+    coef, intercept = weights
+    delta = np.concatenate([coef.ravel(), intercept])
+    payload, sent = encode_delta(delta, coef.shape, base_round=4, classes=CLASSES, dtype=dtype)
+    update = decode_update(payload)
+    assert isinstance(update, DeltaUpdate)
+    assert (update.shape, update.base_round, update.indices) == ((3, 4), 4, None)
+    # The server sees exactly what the encoder reported as sent (error feedback relies on it)
+    np.testing.assert_array_equal(update.dequantized(), sent)
+    np.testing.assert_allclose(sent, delta, rtol=0, atol=rtol * np.abs(delta).max())
+
+
+def test_top_k_delta_applies_to_its_base(weights):
+    base_coef, base_intercept = weights
+    delta = np.zeros(15)
+    delta[[2, 9, 14]] = [5.0, -4.0, 3.0]
+    delta[[0, 5]] = [0.1, -0.2]  # Dropped by top-3
+    payload, sent = encode_delta(delta, base_coef.shape, 1, CLASSES, dtype=np.float64, top_k=3)
+    update = decode_update(payload)
+    assert update.header["nnz"] == 3
+    np.testing.assert_array_equal(update.indices, [2, 9, 14])
+    np.testing.assert_array_equal(update.dequantize_into(np.empty(15)), sent)
+
+    coef, intercept = update.apply(base_coef, base_intercept)
+    expected = np.concatenate([base_coef.ravel(), base_intercept])
+    expected[[2, 9, 14]] += [5.0, -4.0, 3.0]
+    np.testing.assert_array_equal(coef, expected[:12].reshape(3, 4))
+    np.testing.assert_array_equal(intercept, expected[12:])
+    # A fraction keeps ceil(fraction * size) entries
+    assert decode_update(encode_delta(delta, (3, 4), 1, CLASSES, top_k=0.2)[0]).header["nnz"] == 3
+
+
+@pytest.mark.parametrize("kind", ["full", "dense_delta", "sparse_delta"])
+def test_truncated_and_padded_payloads_are_rejected(weights, kind):
+    coef, intercept = weights
+    if kind == "full":
+        payload = encode_update(coef, intercept, CLASSES)
+    else:
+        delta = np.concatenate([coef.ravel(), intercept])
+        payload = encode_delta(delta, coef.shape, 1, CLASSES, top_k=4 if kind == "sparse_delta" else None)[0]
+    decode_update(payload)
+    for bad in (payload[:-1], payload + b"\x00" * 8, payload[:20], payload[:3]):
+        with pytest.raises(UpdateFormatError):
+            decode_update(bad)
+
+
+@pytest.mark.parametrize("shape", [[1], [1, 3, 1], [3, -1], [3, 1.5], [True, 4], "34", None])
+def test_invalid_shapes_are_format_errors(weights, shape):
+    coef, intercept = weights
+    payload = encode_update(coef, intercept, CLASSES, extra={"shape": shape})
+    with pytest.raises(UpdateFormatError, match="shape"):
+        read_header(payload)
+    with pytest.raises(UpdateFormatError, match="shape"):
+        decode_update(payload)
+
+
+def test_pickled_files_need_allow_pickle(tmp_path):
+    joblib = pytest.importorskip("joblib")
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(1)
+    X, y = rng.normal(size=(60, 4)), rng.integers(0, 3, size=60)
+    model = LogisticRegression(max_iter=200).fit(X, y)
+    path = tmp_path / "legacy.joblib"
+    joblib.dump(model, path)
+
+    with pytest.raises(UpdateFormatError, match="pickle"):
+        load_any(path)
+    update = load_any(path, allow_pickle=True)
+    np.testing.assert_array_equal(update.coef, model.coef_)
+    assert update.classes == [0, 1, 2]
+
+    flw = tmp_path / "update.flw"
+    flw.write_bytes(encode_update(model.coef_, model.intercept_, model.classes_))
+    np.testing.assert_array_equal(load_any(flw).coef, model.coef_.astype(np.float32))
@@ -0,0 +1,207 @@
+"""
+Shared transaction sender for the coordinator (server and bot).
+
+- local nonce allocator (one get_transaction_count at startup / after an error)
+- cached gas price, refreshed every `gas_price_ttl` seconds
+- pipelined sends: callers never wait for a receipt unless they ask to
+- background receipt tracking, with replacement (same nonce, higher gas price)
+  of transactions stuck longer than `replace_after` seconds
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from web3.exceptions import TransactionNotFound
+
+# Minimum bump accepted by geth/most nodes to replace a pending transaction is +10%
+REPLACEMENT_BUMP = 1.125
+
+
+class PendingTx:
+    """Handle on a transaction sent by the TransactionManager."""
+
+    def __init__(self, call, value, gas, label):
+        self.call = call
+        self.value = value
+        self.gas = gas
+        self.label = label
+        self.nonce = None
+        self.gas_price = None
+        self.tx_hash = None
+        self.queued_at = time.monotonic()
+        self.first_sent_at = None  # First broadcast (sent_at moves on replacements)
+        self.sent_at = None
+        self.replacements = 0
+        self.hashes = []  # every hash broadcast for this nonce (replacements included)
+        self.future = Future()
+
+    def wait(self, timeout=None):
+        """Blocks until the receipt is known. Raises on failure/timeout."""
+        return self.future.result(timeout)
+
+    @property
+    def done(self):
+        return self.future.done()
+
+
+class TransactionManager:
+    def __init__(self, w3, address, private_key, gas_price_multiplier=1.1, gas_price_ttl=15.0,
+                 replace_after=60.0, max_replacements=3, poll_interval=1.0):
+        self.w3 = w3
+        self.address = address
+        self.private_key = private_key
+        self.gas_price_multiplier = gas_price_multiplier
+        self.gas_price_ttl = gas_price_ttl
+        self.replace_after = replace_after
+        self.max_replacements = max_replacements
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._nonce = None
+        self._gas_price = None
+        self._gas_price_at = 0.0
+        self._send_queue = queue.Queue()
+        self._in_flight = []
+        self._worker = None
+
+    # --- Nonce and gas price -------------------------------------------------
+
+    def _next_nonce(self):
+        with self._lock:
+            if self._nonce is None:
+                self._nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+
+    def resync_nonce(self):
+        """Forgets the local nonce; the next send re-reads it from the node."""
+        with self._lock:
+            self._nonce = None
+
+    def gas_price(self):
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self.gas_price_ttl:
+            self._gas_price = int(self.w3.eth.gas_price * self.gas_price_multiplier)
+            self._gas_price_at = now
+        return self._gas_price
+
+    # --- Sending -------------------------------------------------------------
+
+    def _broadcast(self, ptx):
+        tx = ptx.call.build_transaction({
+            "from": self.address,
+            "nonce": ptx.nonce,
+            "gas": ptx.gas,
+            "gasPrice": ptx.gas_price,
+            "value": ptx.value,
+        })
+        signed = self.w3.eth.account.sign_transaction(tx, self.private_key)
+        ptx.tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+        ptx.hashes.append(ptx.tx_hash)
+        ptx.sent_at = time.monotonic()
+        if ptx.first_sent_at is None:
+            ptx.first_sent_at = ptx.sent_at
+
+    def _send_now(self, ptx):
+        ptx.nonce = self._next_nonce()
+        ptx.gas_price = self.gas_price()
+        try:
+            self._broadcast(ptx)
+        except Exception:
+            # Most likely a nonce gap/duplicate (another process used the key): resync once
+            self.resync_nonce()
+            ptx.nonce = self._next_nonce()
+            try:
+                self._broadcast(ptx)
+            except Exception:
+                # Nothing was sent with this nonce: do not leave a gap
+                self.resync_nonce()
+                raise
+
+    def send(self, call, value=0, gas=300000, label=""):
+        """
+        Queues a contract call (e.g. contract.functions.startNewRound()) and returns
+        a PendingTx immediately. Receipts are tracked in the background.
+        """
+        ptx = PendingTx(call, value, gas, label)
+        self._ensure_worker()
+        self._send_queue.put(ptx)
+        return ptx
+
+    def send_and_wait(self, call, value=0, gas=300000, label="", timeout=120):
+        return self.send(call, value, gas, label).wait(timeout)
+
+    @property
+    def pending(self):
+        """Transactions queued or waiting for their receipt."""
+        return self._send_queue.qsize() + len(self._in_flight)
+
+    # --- Background worker ---------------------------------------------------
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="tx-manager", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            # 1. Drain the send queue (sends are pipelined, nonces are consecutive)
+            try:
+                ptx = self._send_queue.get(timeout=self.poll_interval)
+                while True:
+                    try:
+                        self._send_now(ptx)
+                        self._in_flight.append(ptx)
+                    except Exception as e:
+                        ptx.future.set_exception(e)
+                    ptx = self._send_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            # 2. Poll receipts of in-flight transactions
+            if self._in_flight:
+                self._in_flight = [ptx for ptx in self._in_flight if not self._check_safely(ptx)]
+
+    def _check_safely(self, ptx):
+        """_check that survives RPC errors (timeout, reset): the transaction stays in flight."""
+        try:
+            return self._check(ptx)
+        except Exception as e:
+            print(f"⚠️ Suivi de la tx {ptx.label or ptx.nonce} impossible ({e}), nouvel essai...")
+            return False
+
+    def _check(self, ptx):
+        """Returns True once ptx is settled (mined, failed or given up)."""
+        for tx_hash in reversed(ptx.hashes):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            if receipt is None:
+                continue
+            ptx.tx_hash = tx_hash
+            ptx.future.set_result(receipt)
+            return True
+
+        if time.monotonic() - ptx.sent_at < self.replace_after:
+            return False
+        if ptx.replacements >= self.max_replacements:
+            # Give the nonce back: the next send re-reads it from the node instead of queuing behind a gap
+            self.resync_nonce()
+            ptx.future.set_exception(TimeoutError(f"Transaction {ptx.label or ptx.nonce} stuck"))
+            return True
+
+        # Stuck: same nonce, bumped gas price
+        ptx.replacements += 1
+        ptx.gas_price = max(int(ptx.gas_price * REPLACEMENT_BUMP), self.gas_price())
+        try:
+            self._broadcast(ptx)
+            print(f"⛽ Tx {ptx.label or ptx.nonce} remplacée (gasPrice {ptx.gas_price})")
+        except Exception as e:
+            # e.g. "nonce too low": one of the previous hashes got mined meanwhile
+            print(f"⚠️ Remplacement impossible ({e})")
+            ptx.sent_at = time.monotonic()
+        return False
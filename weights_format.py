@@ -0,0 +1,444 @@
+"""
+Compact, pickle-free binary format for Logistic Regression weight updates (.flw).
+
+Layout (little endian):
+    magic  b"FLWU"         4 bytes
+    version                uint16
+    dtype code             uint8   (1 = float32, 2 = float64)
+    reserved               uint8
+    header length          uint32
+    header                 UTF-8 JSON (shape, classes, feature names, n_samples, ...)
+    padding                up to an 8-byte boundary
+    coef                   n_rows * n_features values, C order
+    intercept              n_rows values
+
+Version 2 carries a delta against the global model of round header["base_round"],
+over the flattened [coef, intercept] vector, optionally quantized (float16, or int8
+with header["scale"]) and top-k sparsified (header["nnz"] entries):
+    indices                nnz uint32, ascending (absent when dense)
+    padding                up to an 8-byte boundary
+    values                 nnz (or n_rows * (n_features + 1)) values
+
+The SHA-256 anchored on chain is computed over these exact bytes.
+"""
+import hashlib
+import json
+import mmap
+import struct
+from dataclasses import dataclass, field
+
+import numpy as np
+
+MAGIC = b"FLWU"
+VERSION = 1
+DELTA_VERSION = 2
+FILE_EXTENSION = ".flw"
+
+_PREFIX = struct.Struct("<4sHBBI")
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f8"), 3: np.dtype("<f2"), 4: np.dtype("i1")}
+_DTYPE_CODES = {v: k for k, v in _DTYPES.items()}
+_FULL_DTYPES = (1, 2)
+_INDEX_DTYPE = np.dtype("<u4")
+
+
+class UpdateFormatError(ValueError):
+    """Raised when a buffer is not a valid weight update."""
+
+
+class StaleUpdateError(ValueError):
+    """Raised when a delta is based on another global model than the expected one."""
+
+
+@dataclass
+class WeightUpdate:
+    coef: np.ndarray
+    intercept: np.ndarray
+    classes: list
+    feature_names: list = None
+    n_samples: int = 0
+    header: dict = field(default_factory=dict)
+
+    def to_model(self):
+        """Builds a predict-ready sklearn LogisticRegression (no fit)."""
+        from sklearn.linear_model import LogisticRegression
+
+        model = LogisticRegression()
+        model.coef_ = np.asarray(self.coef, dtype=np.float64)
+        model.intercept_ = np.asarray(self.intercept, dtype=np.float64)
+        model.classes_ = np.asarray(self.classes)
+        model.n_features_in_ = self.coef.shape[1]
+        if self.feature_names:
+            model.feature_names_in_ = np.asarray(self.feature_names, dtype=object)
+        return model
+
+
+def _to_builtin(values):
+    return [v.item() if hasattr(v, "item") else v for v in values]
+
+
+def encode_update(coef, intercept, classes, feature_names=None, n_samples=0, dtype=np.float32, extra=None):
+    """Serializes weights into canonical .flw bytes."""
+    dt = np.dtype(dtype).newbyteorder("<")
+    if _DTYPE_CODES.get(dt) not in _FULL_DTYPES:
+        raise UpdateFormatError(f"Unsupported dtype {dtype}")
+    coef = np.ascontiguousarray(np.atleast_2d(coef), dtype=dt)
+    intercept = np.ascontiguousarray(np.ravel(intercept), dtype=dt)
+    if intercept.shape[0] != coef.shape[0]:
+        raise UpdateFormatError("intercept must have one value per coef row")
+
+    header = {
+        "shape": list(coef.shape),
+        "classes": _to_builtin(classes),
+        "feature_names": None if feature_names is None else [str(f) for f in feature_names],
+        "n_samples": int(n_samples),
+    }
+    if extra:
+        header.update(extra)
+    # sort_keys + compact separators so that equal weights give equal bytes (and hashes)
+    header_bytes = json.dumps(header, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    offset = _PREFIX.size + len(header_bytes)
+    padding = b"\x00" * (-offset % 8)
+
+    prefix = _PREFIX.pack(MAGIC, VERSION, _DTYPE_CODES[dt], 0, len(header_bytes))
+    return b"".join([prefix, header_bytes, padding, coef.tobytes(), intercept.tobytes()])
+
+
+def encode_model(model, n_samples=0, dtype=np.float32, extra=None):
+    """Serializes a fitted sklearn LogisticRegression."""
+    return encode_update(
+        model.coef_, model.intercept_, model.classes_,
+        getattr(model, "feature_names_in_", None), n_samples, dtype, extra,
+    )
+
+
+def is_update_bytes(buffer):
+    return bytes(buffer[:4]) == MAGIC
+
+
+def _parse_prefix(view):
+    """Validates the fixed prefix and header. Returns (version, dtype, header, data_start)."""
+    if len(view) < _PREFIX.size:
+        raise UpdateFormatError("Buffer too short")
+    magic, version, dtype_code, _, header_len = _PREFIX.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise UpdateFormatError("Bad magic, not a weight update")
+    if version not in (VERSION, DELTA_VERSION):
+        raise UpdateFormatError(f"Unsupported format version {version}")
+    if dtype_code not in (_FULL_DTYPES if version == VERSION else _DTYPES):
+        raise UpdateFormatError(f"Unknown dtype code {dtype_code}")
+
+    header_end = _PREFIX.size + header_len
+    if len(view) < header_end:
+        raise UpdateFormatError("Buffer too short")
+    try:
+        header = json.loads(bytes(view[_PREFIX.size:header_end]).decode("utf-8"))
+        shape = header["shape"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise UpdateFormatError(f"Invalid header: {e}")
+    # (n_rows, n_features): decoders unpack exactly two sizes
+    if not (isinstance(shape, list) and len(shape) == 2
+            and all(isinstance(x, int) and not isinstance(x, bool) and x >= 0 for x in shape)):
+        raise UpdateFormatError(f"Invalid header: shape must be two non-negative integers, got {shape!r}")
+    return version, _DTYPES[dtype_code], header, header_end + (-header_end % 8)
+
+
+def read_header(buffer):
+    """(version, header) of an update, from its first bytes only (e.g. the first upload chunk)."""
+    version, _, header, _ = _parse_prefix(memoryview(buffer))
+    return version, header
+
+
+def decode_update(buffer):
+    """
+    Parses .flw bytes without copying: coef/intercept are read-only views
+    (np.frombuffer) on the given buffer (bytes, memoryview or mmap).
+    Returns a WeightUpdate, or a DeltaUpdate for version 2 payloads.
+    """
+    view = memoryview(buffer)
+    version, dt, header, data_start = _parse_prefix(view)
+    if version == DELTA_VERSION:
+        return _decode_delta(view, dt, header, data_start)
+
+    n_rows, n_features = (int(x) for x in header["shape"])
+    n_coef = n_rows * n_features
+    expected = data_start + (n_coef + n_rows) * dt.itemsize
+    if len(view) != expected:
+        raise UpdateFormatError(f"Payload size {len(view)} does not match header ({expected})")
+
+    coef = np.frombuffer(view, dtype=dt, count=n_coef, offset=data_start).reshape(n_rows, n_features)
+    intercept = np.frombuffer(view, dtype=dt, count=n_rows, offset=data_start + n_coef * dt.itemsize)
+    if not (np.isfinite(coef).all() and np.isfinite(intercept).all()):
+        raise UpdateFormatError("Weights contain NaN or Inf")
+
+    return WeightUpdate(
+        coef=coef,
+        intercept=intercept,
+        classes=header.get("classes") or [],
+        feature_names=header.get("feature_names"),
+        n_samples=int(header.get("n_samples", 0)),
+        header=header,
+    )
+
+
+# --- Delta updates (version 2) ------------------------------------------------
+
+@dataclass
+class DeltaUpdate:
+    """
+    Compressed difference with the global model of base_round, over the
+    flattened [coef.ravel(), intercept] vector. indices is None for a dense delta.
+    """
+    shape: tuple
+    base_round: int
+    values: np.ndarray
+    indices: np.ndarray = None
+    scale: float = 1.0
+    classes: list = None
+    feature_names: list = None
+    n_samples: int = 0
+    header: dict = field(default_factory=dict)
+
+    @property
+    def size(self):
+        """Length of the flattened weight vector."""
+        n_rows, n_features = self.shape
+        return n_rows * (n_features + 1)
+
+    def dequantized(self):
+        """Delta values as float64 (same length as indices, or size when dense)."""
+        values = self.values.astype(np.float64)
+        if self.scale != 1.0:
+            values *= self.scale
+        return values
+
+    def dequantize_into(self, out):
+        """Writes the dense float64 delta into out (length size); entries dropped by top-k are 0."""
+        if self.indices is None:
+            np.multiply(self.values, self.scale, out=out)
+        else:
+            out[:] = 0.0
+            out[self.indices] = self.dequantized()
+        return out
+
+    def apply(self, base_coef, base_intercept):
+        """Dense (coef, intercept) = base + delta. Used for validation of a single update."""
+        n_rows, n_features = self.shape
+        flat = np.concatenate([np.ravel(base_coef), np.ravel(base_intercept)]).astype(np.float64)
+        if flat.shape[0] != self.size:
+            raise StaleUpdateError(f"Base model shape does not match the delta {self.shape}")
+        if self.indices is None:
+            flat += self.dequantized()
+        else:
+            flat[self.indices] += self.dequantized()
+        return flat[:n_rows * n_features].reshape(n_rows, n_features), flat[n_rows * n_features:]
+
+
+def _decode_delta(view, dt, header, data_start):
+    n_rows, n_features = (int(x) for x in header["shape"])
+    size = n_rows * (n_features + 1)
+    try:
+        base_round = int(header["base_round"])
+        nnz = header.get("nnz")
+        scale = float(header.get("scale", 1.0))
+    except (KeyError, TypeError, ValueError) as e:
+        raise UpdateFormatError(f"Invalid delta header: {e}")
+
+    indices = None
+    offset = data_start
+    if nnz is not None:
+        nnz = int(nnz)
+        if not 0 <= nnz <= size:
+            raise UpdateFormatError(f"Invalid nnz {nnz} for {size} weights")
+        index_bytes = nnz * _INDEX_DTYPE.itemsize
+        if len(view) < offset + index_bytes:
+            raise UpdateFormatError("Payload too short for its indices")
+        indices = np.frombuffer(view, dtype=_INDEX_DTYPE, count=nnz, offset=offset)
+        offset += index_bytes + (-index_bytes % 8)
+    count = size if nnz is None else nnz
+    expected = offset + count * dt.itemsize
+    if len(view) != expected:
+        raise UpdateFormatError(f"Payload size {len(view)} does not match header ({expected})")
+    values = np.frombuffer(view, dtype=dt, count=count, offset=offset)
+
+    if indices is not None and count and (indices[-1] >= size or np.any(np.diff(indices.astype(np.int64)) <= 0)):
+        raise UpdateFormatError("Delta indices must be strictly increasing and in range")
+    if not (np.isfinite(scale) and (dt.kind == "i" or np.isfinite(values).all())):
+        raise UpdateFormatError("Delta contains NaN or Inf")
+
+    return DeltaUpdate(
+        shape=(n_rows, n_features),
+        base_round=base_round,
+        values=values,
+        indices=indices,
+        scale=scale,
+        classes=header.get("classes") or [],
+        feature_names=header.get("feature_names"),
+        n_samples=int(header.get("n_samples", 0)),
+        header=header,
+    )
+
+
+def _quantize(values, dtype):
+    """Returns (stored values, scale). int8 is symmetric, per update."""
+    dt = np.dtype(dtype)
+    if dt == np.int8:
+        peak = float(np.max(np.abs(values))) if values.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        return np.clip(np.rint(values / scale), -127, 127).astype(np.int8), scale
+    return values.astype(dt.newbyteorder("<")), 1.0
+
+
+def encode_delta(delta, shape, base_round, classes, feature_names=None, n_samples=0,
+                 dtype=np.float16, top_k=None, extra=None):
+    """
+    Serializes a flattened [coef, intercept] delta as version-2 .flw bytes.
+    top_k: number (int) or fraction (float < 1) of largest-magnitude entries kept.
+    Returns (bytes, sent) where sent is the dense float64 delta the server will see
+    (used by DeltaEncoder for error feedback).
+    """
+    delta = np.ravel(np.asarray(delta, dtype=np.float64))
+    n_rows, n_features = (int(x) for x in shape)
+    if delta.shape[0] != n_rows * (n_features + 1):
+        raise UpdateFormatError(f"Delta has {delta.shape[0]} values, expected {n_rows * (n_features + 1)}")
+    dt = np.dtype(dtype).newbyteorder("<") if np.dtype(dtype).itemsize > 1 else np.dtype(dtype)
+    if dt not in _DTYPE_CODES:
+        raise UpdateFormatError(f"Unsupported dtype {dtype}")
+
+    indices = None
+    values = delta
+    if top_k is not None:
+        k = int(np.ceil(top_k * delta.shape[0])) if isinstance(top_k, float) and top_k < 1 else int(top_k)
+        k = max(1, min(k, delta.shape[0]))
+        if k < delta.shape[0]:
+            # Ascending indices: canonical bytes and sequential scatter on the server
+            indices = np.sort(np.argpartition(np.abs(delta), -k)[-k:]).astype(_INDEX_DTYPE)
+            values = delta[indices]
+    stored, scale = _quantize(values, dt)
+
+    header = {
+        "shape": [n_rows, n_features],
+        "classes": _to_builtin(classes),
+        "feature_names": None if feature_names is None else [str(f) for f in feature_names],
+        "n_samples": int(n_samples),
+        "base_round": int(base_round),
+        "nnz": None if indices is None else int(indices.shape[0]),
+        "scale": scale,
+    }
+    if extra:
+        header.update(extra)
+    header_bytes = json.dumps(header, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    offset = _PREFIX.size + len(header_bytes)
+    parts = [_PREFIX.pack(MAGIC, DELTA_VERSION, _DTYPE_CODES[dt], 0, len(header_bytes)),
+             header_bytes, b"\x00" * (-offset % 8)]
+    if indices is not None:
+        parts += [indices.tobytes(), b"\x00" * (-indices.nbytes % 8)]
+    parts.append(stored.tobytes())
+
+    sent = np.zeros_like(delta)
+    dequantized = stored.astype(np.float64) * scale
+    if indices is None:
+        sent[:] = dequantized
+    else:
+        sent[indices] = dequantized
+    return b"".join(parts), sent
+
+
+class DeltaEncoder:
+    """
+    Participant side: encodes local weights as a compressed delta against the
+    downloaded global model. With error_feedback, what compression dropped in
+    one round is added back to the next round's delta.
+    """
+
+    def __init__(self, dtype=np.float16, top_k=None, error_feedback=True):
+        self.dtype = dtype
+        self.top_k = top_k
+        self.error_feedback = error_feedback
+        self.residual = None
+
+    def encode(self, coef, intercept, base_coef, base_intercept, base_round, classes,
+               feature_names=None, n_samples=0, extra=None):
+        coef = np.atleast_2d(coef)
+        flat = np.concatenate([np.ravel(coef), np.ravel(intercept)]).astype(np.float64)
+        delta = flat - np.concatenate([np.ravel(base_coef), np.ravel(base_intercept)])
+        if self.error_feedback and self.residual is not None and self.residual.shape == delta.shape:
+            delta += self.residual
+        payload, sent = encode_delta(delta, coef.shape, base_round, classes, feature_names,
+                                     n_samples, self.dtype, self.top_k, extra)
+        if self.error_feedback:
+            self.residual = delta - sent
+        return payload
+
+    def encode_model(self, model, base_model, base_round, n_samples=0, extra=None):
+        return self.encode(model.coef_, model.intercept_, base_model.coef_, base_model.intercept_,
+                           base_round, model.classes_, getattr(model, "feature_names_in_", None),
+                           n_samples, extra)
+
+
+def load_update(path):
+    """Memory-maps a .flw file and decodes it (no copy, no unpickling)."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The returned arrays keep a reference to the mapping
+    return decode_update(mm)
+
+
+def load_any(path, allow_pickle=False):
+    """
+    Loads a .flw update (WeightUpdate or DeltaUpdate). Legacy joblib LogisticRegression
+    files are unpickled only with allow_pickle=True: unpickling runs code, keep it for trusted files.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return load_update(path)
+    if not allow_pickle:
+        raise UpdateFormatError(f"{path}: not a .flw update (pickle loading disabled)")
+
+    import joblib
+
+    model = joblib.load(path)
+    return WeightUpdate(
+        coef=np.asarray(model.coef_),
+        intercept=np.asarray(model.intercept_),
+        classes=_to_builtin(model.classes_),
+        feature_names=list(getattr(model, "feature_names_in_", [])) or None,
+        n_samples=0,
+        header={"n_iter": float(np.mean(getattr(model, "n_iter_", 0.0)))},
+    )
+
+
+def update_hash(buffer):
+    """On-chain hash of an update: "0x" + SHA-256 of its canonical bytes."""
+    return "0x" + hashlib.sha256(buffer).hexdigest()
+
+
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+class UpdateHasher:
+    """Incremental update_hash: feed the bytes as they stream (upload, write to disk)."""
+
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk):
+        self._sha.update(chunk)
+        self.size += len(chunk)
+
+    def hexdigest(self):
+        return "0x" + self._sha.hexdigest()
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """update_hash of a file, hashed in chunks from a memory map (never loaded whole)."""
+    hasher = UpdateHasher()
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return hasher.hexdigest()  # mmap refuses empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                for start in range(0, len(view), chunk_size):
+                    hasher.update(view[start:start + chunk_size])
+    return hasher.hexdigest()
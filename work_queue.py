@@ -0,0 +1,185 @@
+"""
+Bounded background job queue used by the coordinator so that request
+handlers never do validation, aggregation or blockchain work inline.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting (backpressure)."""
+
+
+class Job:
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Thread pool with a bounded number of pending jobs and queryable job status.
+    A single-worker queue also serializes its jobs (used for round transitions).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, max_workers=4, max_pending=256, history=10000):
+        self.name = name
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"jobs-{name}")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = 0
+
+    @property
+    def depth(self):
+        """Jobs queued or running."""
+        return self._pending
+
+    @property
+    def full(self):
+        return self._pending >= self.max_pending
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(f"{self.name} queue is full ({self.max_pending} pending jobs)")
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Schedules fn(*args, **kwargs). Returns the Job, or raises QueueFull."""
+        self._acquire()
+        return self._submit(kind, fn, args, kwargs)
+
+    @contextmanager
+    def reserve(self):
+        """
+        Takes a pending-job slot now (raises QueueFull) for work that must not be refused
+        later, e.g. once its side effects are done. Yields a Reservation whose submit()
+        cannot fail; the slot is given back if the block exits without submitting.
+        """
+        self._acquire()
+        reservation = Reservation(self)
+        try:
+            yield reservation
+        finally:
+            if not reservation.used:
+                self._slots.release()
+
+    def _submit(self, kind, fn, args, kwargs):
+        job = Job(f"{self.name}-{next(self._ids)}", kind)
+        with self._lock:
+            self._pending += 1
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "done"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"⚠️ Job {job.id} ({job.kind}) en échec : {e}")
+            raise
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def stats(self):
+        return {"name": self.name, "depth": self.depth, "max_pending": self.max_pending}
+
+
+class Reservation:
+    """One pending-job slot taken by JobQueue.reserve(), used by a single submit()."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.used = False
+
+    def submit(self, kind, fn, *args, **kwargs):
+        if self.used:
+            raise RuntimeError("Reservation already used")
+        self.used = True
+        return self.queue._submit(kind, fn, args, kwargs)
+
+
+class Scheduler:
+    """
+    Background thread running registered checks every `interval` seconds.
+    Checks only decide; the work they find is submitted to a JobQueue, so round
+    transitions stay serialized on the round worker.
+    """
+
+    def __init__(self, name, interval=0.5):
+        self.name = name
+        self.interval = interval
+        self._checks = []
+        self._pending = {}  # kind -> last Job submitted by schedule_once
+        self._stop = threading.Event()
+        self._thread = None
+
+    def every_tick(self, name, check):
+        self._checks.append((name, check))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=f"scheduler-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def schedule_once(self, queue, kind, fn, *args):
+        """Submits fn to queue unless the previous `kind` job is still pending. Returns the Job or None."""
+        job = self._pending.get(kind)
+        if job is not None and not job.future.done():
+            return None
+        try:
+            job = self._pending[kind] = queue.submit(kind, fn, *args)
+        except QueueFull:
+            return None  # Retried at the next tick
+        return job
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            for name, check in self._checks:
+                try:
+                    check()
+                except Exception as e:
+                    print(f"⚠️ Tâche planifiée {name} en échec : {e}")